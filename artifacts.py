@@ -0,0 +1,198 @@
+import argparse
+import hashlib
+import json
+import os
+from dataclasses import dataclass
+
+from config import parseConfig
+from input import Transform, visualizerVersion
+from planner import plan
+
+# Generated configurations are stored under the digest of what produced them,
+# so every host that asks for the same settings ends up with the same file
+ARTIFACT_DIR = "Configurations/generated"
+
+PRESETS = {
+    "best_range_res": "setDefaultRangeResConfig",
+    "best_vel_res": "setDefaultVelResConfig",
+    "best_range": "setDefaultRangeConfig",
+}
+
+
+@dataclass(frozen=True)
+class Artifact:
+    digest: str
+    lines: tuple
+    Input: dict
+    options: dict
+    sliders: dict
+    plan: dict
+    path: str
+
+    @property
+    def text(self):
+        return "\n".join(self.lines) + "\n"
+
+    @property
+    def radarConfig(self):
+        return parseConfig(self.text, hashlib.sha256(self.text.encode()).hexdigest())
+
+
+# ------------------------------------------------------------------
+
+# Artifacts already built or read in this process, keyed by digest
+_artifacts = {}
+
+
+def _normalize(value):
+    # Floats are cut to 12 significant digits so that round-off in the
+    # constraint math does not change the key, ints and floats stay apart
+    if isinstance(value, dict):
+        return {str(k): _normalize(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_normalize(v) for v in value]
+    if isinstance(value, float):
+        return float(f"{value:.12g}")
+    return value
+
+
+def artifactKey(transform, options):
+    # Canonical JSON of everything generateCfg reads
+    return json.dumps(
+        {
+            "visualizerVersion": visualizerVersion,
+            "Input": _normalize(transform.Input),
+            "options": _normalize(options),
+        },
+        sort_keys=True,
+        separators=(",", ":"),
+    )
+
+
+def artifactDigest(transform, options):
+    return hashlib.sha256(artifactKey(transform, options).encode()).hexdigest()
+
+
+def planSummary(radarConfig):
+    p = plan(radarConfig, benchmark=False)
+    return {
+        "bytesPerSecond": p.bytesPerSecond,
+        "uartLoad": p.uartLoad,
+        "frameBytes": [s.frameBytes for s in p.subFrames],
+        "problems": list(p.problems),
+    }
+
+
+def readArtifact(digest, directory=ARTIFACT_DIR):
+    path = os.path.join(directory, digest + ".cfg")
+    try:
+        with open(path) as f:
+            lines = tuple(f.read().splitlines())
+        with open(os.path.join(directory, digest + ".json")) as f:
+            meta = json.load(f)
+    except FileNotFoundError:
+        return None
+    return Artifact(
+        digest=digest,
+        lines=lines,
+        Input=meta["Input"],
+        options=meta["options"],
+        sliders=meta["sliders"],
+        plan=meta["plan"],
+        path=path,
+    )
+
+
+def writeArtifact(artifact, directory=ARTIFACT_DIR):
+    # The sidecar is written last and both files are renamed into place, a
+    # reader never sees half an artifact
+    os.makedirs(directory, exist_ok=True)
+    meta = {
+        "digest": artifact.digest,
+        "Input": artifact.Input,
+        "options": artifact.options,
+        "sliders": artifact.sliders,
+        "plan": artifact.plan,
+    }
+    for suffix, data in (
+        (".cfg", artifact.text),
+        (".json", json.dumps(meta, indent=1, sort_keys=True) + "\n"),
+    ):
+        path = os.path.join(directory, artifact.digest + suffix)
+        with open(path + ".tmp", "w") as f:
+            f.write(data)
+        os.replace(path + ".tmp", path)
+
+
+def generateArtifact(transform, directory=ARTIFACT_DIR, **generateCfgArgs):
+    # Configuration of a transform after updateInput, with the same arguments
+    # as Transform.generateCfg. Generated at most once per set of inputs.
+    options = dict(transform.options)
+    options["rangePeakGrouping"] = generateCfgArgs.get("rangePeakGrouping", True)
+    options["dopplerPeakGrouping"] = generateCfgArgs.get("dopplerPeakGrouping", True)
+    options["clutterRemoval"] = generateCfgArgs.get("clutterRemoval", False)
+    options.update(generateCfgArgs.get("plots") or {})
+
+    digest = artifactDigest(transform, options)
+    artifact = _artifacts.get(digest)
+    if artifact is None and directory:
+        artifact = readArtifact(digest, directory)
+    if artifact is None:
+        lines = tuple(transform.generateCfg(**generateCfgArgs))
+        text = "\n".join(lines) + "\n"
+        artifact = Artifact(
+            digest=digest,
+            lines=lines,
+            Input=_normalize(transform.Input),
+            options=options,
+            sliders=_normalize(transform.sliders),
+            plan=planSummary(parseConfig(text)),
+            path=os.path.join(directory, digest + ".cfg") if directory else "",
+        )
+        if directory:
+            writeArtifact(artifact, directory)
+    _artifacts[digest] = artifact
+    return artifact
+
+
+def presetArtifact(subprofile_type, changes=None, directory=ARTIFACT_DIR, **kwargs):
+    # Artifact of a dashboard preset with the widget changes applied
+    transform = Transform()
+    getattr(transform, PRESETS[subprofile_type])()
+    transform.updateInput(changes or {})
+    return generateArtifact(transform, directory, **kwargs)
+
+
+# ------------------------------------------------------------------
+
+
+def parseValue(text):
+    try:
+        return json.loads(text)
+    except json.JSONDecodeError:
+        return text
+
+
+def parseArg():
+    parser = argparse.ArgumentParser(
+        description="Generate a preset configuration once and print its path"
+    )
+    parser.add_argument("preset", choices=PRESETS)
+    parser.add_argument(
+        "changes",
+        nargs="*",
+        metavar="KEY=VALUE",
+        help="Transform inputs, e.g. platform=xWR16xx Frame_Rate=10",
+    )
+    parser.add_argument("--dir", default=ARTIFACT_DIR)
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parseArg()
+    changes = dict(change.split("=", 1) for change in args.changes)
+    changes = {key: parseValue(value) for key, value in changes.items()}
+    artifact = presetArtifact(args.preset, changes, args.dir)
+    print(artifact.path)
+    for problem in artifact.plan["problems"]:
+        print(f"! {problem}")
@@ -0,0 +1,453 @@
+import argparse
+import contextlib
+import csv
+import glob
+import io
+import json
+import os
+import platform
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import numpy as np
+
+import fft
+from config import loadConfig
+from planner import DECODERS, TLV_NAMES
+from synthetic import PacketGenerator, stream
+from tlv import TLV_HEADER, HeaderDecoder
+
+BENCH_DIR = "benchmarks"
+CONFIG_GLOB = "Configurations/*.cfg"
+NUM_OBJS = (0, 10, 50, 100, 250, 500)
+QUICK_NUM_OBJS = (0, 50, 500)
+# Every stage runs for at least this long, a Raspberry Pi gets through the
+# full suite in a few minutes with --quick
+MIN_SECONDS = 0.2
+QUICK_MIN_SECONDS = 0.05
+# Bytes handed to the assembler per serial read
+READ_CHUNK = 1024
+COLLECTOR_FRAMES = 50
+FFT_SIZES = (64, 256)
+# Entry points whose startup is timed in a fresh interpreter
+IMPORT_MODULES = ("only_read",)
+IMPORT_RUNS = 10
+QUICK_IMPORT_RUNS = 3
+# Desktop packages the headless collector must not import, each one costs
+# seconds on a Raspberry Pi
+GUI_PACKAGES = (
+    "matplotlib",
+    "tkinter",
+    "turtle",
+    "pandas",
+    "seaborn",
+    "cv2",
+    "msgspec",
+    "ttkthemes",
+)
+IMPORT_HEAVIEST = 8
+
+
+def timeStage(fn, minSeconds):
+    # Median us per call over batches that together last minSeconds
+    fn()
+    calls = 1
+    while True:
+        start = time.perf_counter_ns()
+        for _ in range(calls):
+            fn()
+        elapsed = time.perf_counter_ns() - start
+        if elapsed > 1e7 or calls >= 1 << 20:
+            break
+        calls *= 4
+    batches = []
+    deadline = time.perf_counter() + minSeconds
+    while len(batches) < 3 or time.perf_counter() < deadline:
+        start = time.perf_counter_ns()
+        for _ in range(calls):
+            fn()
+        batches.append((time.perf_counter_ns() - start) / calls / 1e3)
+    return statistics.median(batches)
+
+
+def peakBytes(fn):
+    # Peak Python allocations of one call, measured apart from the timing
+    tracemalloc.start()
+    try:
+        tracemalloc.reset_peak()
+        fn()
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def measure(fn, minSeconds):
+    return {"us": timeStage(fn, minSeconds), "peakBytes": peakBytes(fn)}
+
+
+# ------------------------------------------------------------------
+
+
+def splitTlvs(byteBuffer, headerDecoder):
+    header = headerDecoder.decode(byteBuffer)
+    idX = headerDecoder.size
+    tlvs = []
+    for _ in range(header[7]):
+        tlv_type, tlv_length = TLV_HEADER.unpack_from(byteBuffer, idX)
+        idX += TLV_HEADER.size
+        tlvs.append((tlv_type, idX))
+        idX += tlv_length
+    return tlvs
+
+
+def decoderStages(radarConfig, numObj, minSeconds):
+    # Header, every TLV decoder and the writers on one synthetic packet
+    generator = PacketGenerator(radarConfig, numObj, sdkVersion="02.00")
+    subFrame = radarConfig.subFrame(0)
+    byteBuffer = np.frombuffer(generator.packet(), dtype="uint8").copy()
+    headerDecoder = HeaderDecoder(radarConfig.platform)
+    tlvs = splitTlvs(byteBuffer, headerDecoder)
+
+    stages = {"header": measure(lambda: headerDecoder.decode(byteBuffer), minSeconds)}
+    finalObj = {}
+    for tlv_type, idX in tlvs:
+        decoder = DECODERS[tlv_type]
+        stages[TLV_NAMES[tlv_type]] = measure(
+            lambda: decoder(byteBuffer, idX, subFrame), minSeconds
+        )
+        finalObj.update(decoder(byteBuffer, idX, subFrame))
+
+    def writeCsv():
+        out = io.StringIO()
+        csv.DictWriter(out, fieldnames=list(finalObj)).writerow(finalObj)
+
+    stages["csv"] = measure(writeCsv, minSeconds)
+    stages["json"] = measure(lambda: json.dumps(finalObj), minSeconds)
+    return stages
+
+
+def collectorStage(radarConfig, numObj, minSeconds):
+    # readAndParseData16xx end to end, fed in serial-sized reads. Needs the
+    # collector's own dependencies.
+    try:
+        import only_read
+    except ImportError as e:
+        return {"skipped": f"only_read.py cannot be imported: {e}"}
+    from shedding import TlvShedder
+
+    data = stream(radarConfig, COLLECTOR_FRAMES, numObj=numObj, sdkVersion="02.00")
+    chunks = [data[i : i + READ_CHUNK] for i in range(0, len(data), READ_CHUNK)]
+
+    class Port:
+        def __init__(self):
+            self.chunks = list(chunks)
+
+        @property
+        def in_waiting(self):
+            return len(self.chunks[0]) if self.chunks else 0
+
+        def read(self, size):
+            return self.chunks.pop(0) if self.chunks else b""
+
+    only_read.headerDecoder = HeaderDecoder(radarConfig.platform)
+    only_read.tlvShedder = TlvShedder(radarConfig, highWater=float("inf"))
+    only_read.stageTimer = None
+    fd, filename = tempfile.mkstemp(suffix=".csv")
+    os.close(fd)
+
+    def run():
+        only_read.byteBufferLength = 0
+        only_read.readStamps.clear()
+        only_read.frameTracker.restart(len(radarConfig.subFrames))
+        port = Port()
+        while port.chunks:
+            only_read.readAndParseData16xx(port, radarConfig, filename)
+        # The last packets are still in the buffer
+        for _ in range(4):
+            only_read.readAndParseData16xx(port, radarConfig, filename)
+
+    try:
+        # The collector prints its alarms, they would bury the results
+        with contextlib.redirect_stdout(io.StringIO()):
+            result = measure(run, minSeconds)
+    finally:
+        os.remove(filename)
+    result["us"] /= COLLECTOR_FRAMES
+    return result
+
+
+def fftStages(minSeconds):
+    stages = {}
+    for n in FFT_SIZES:
+        rng = np.random.default_rng(n)
+        real, imag = rng.standard_normal(n), rng.standard_normal(n)
+        stages[f"fft{n}"] = measure(
+            lambda: fft.transform(real.copy(), imag.copy()), minSeconds
+        )
+    return stages
+
+
+def dashboardStages(radarConfig, minSeconds):
+    # The per-frame work of the dashboard: decoding a line of the JSON feed
+    # and updating the three plots. Needs tkinter, msgspec and ttkthemes.
+    try:
+        from msgspec.json import decode
+
+        import dashboard
+    except ImportError as e:
+        return {"dashboard": {"skipped": f"dashboard.py cannot be imported: {e}"}}
+    from multiprocessing import Event
+
+    subFrame = radarConfig.subFrame(0)
+    rng = np.random.default_rng(0)
+    line = json.dumps(
+        {
+            "x_coord": rng.uniform(-10, 10, 50).tolist(),
+            "y_coord": rng.uniform(0, 20, 50).tolist(),
+            "rp_y": rng.uniform(0, 150, 256).tolist(),
+            "noiserp_y": rng.uniform(0, 150, 256).tolist(),
+            "doppz": rng.integers(
+                0, 5000, (subFrame.numDopplerBins, subFrame.numRangeBins)
+            ).tolist(),
+        }
+    ).encode()
+
+    class Feed:
+        play = Event()
+
+    feed = Feed()
+    feed.play.set()
+    data = decode(line, type=dashboard.Schema)
+    for name in dashboard.Schema.__struct_fields__:
+        setattr(feed, name, getattr(data, name))
+    dashboard.read_data = feed
+    return {
+        "dashboardDecode": measure(
+            lambda: decode(line, type=dashboard.Schema), minSeconds
+        ),
+        "animatePos": measure(lambda: dashboard.animate_pos(0), minSeconds),
+        "animateDop": measure(lambda: dashboard.animate_dop(0), minSeconds),
+        "animateNoise": measure(lambda: dashboard.animate_noise(0), minSeconds),
+    }
+
+
+def parseImportTime(stderr):
+    # (name, depth, self us, cumulative us) for every line of -X importtime,
+    # a module is printed after everything it imports
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "[us]" in line:
+            continue
+        selfUs, cumulativeUs, name = line[len("import time:") :].split("|")
+        depth = len(name) - len(name.lstrip())
+        rows.append((name.strip(), depth, int(selfUs), int(cumulativeUs)))
+    return rows
+
+
+def importStage(module, runs):
+    # Wall time of python -c "import module" from the repository, with the
+    # import time of module and of its heaviest direct imports from the last
+    # run. Needs the module's own dependencies.
+    command = [sys.executable, "-X", "importtime", "-c", f"import {module}"]
+    cwd = os.path.dirname(os.path.abspath(__file__))
+    times = []
+    for _ in range(runs):
+        start = time.perf_counter_ns()
+        done = subprocess.run(command, cwd=cwd, capture_output=True, text=True)
+        times.append((time.perf_counter_ns() - start) / 1e3)
+        if done.returncode:
+            error = done.stderr.strip().splitlines()[-1]
+            return {"skipped": f"{module} cannot be imported: {error}"}
+
+    rows = parseImportTime(done.stderr)
+    idX = next(i for i, row in enumerate(rows) if row[0] == module)
+    depth = rows[idX][1]
+    children = []
+    for name, childDepth, _, cumulativeUs in reversed(rows[:idX]):
+        if childDepth <= depth:
+            break
+        if childDepth == depth + 2:
+            children.append((name, cumulativeUs))
+    children.sort(key=lambda child: -child[1])
+    packages = {name.split(".")[0] for name, *_ in rows}
+    return {
+        "us": statistics.median(times),
+        "importUs": rows[idX][3],
+        "heaviest": dict(children[:IMPORT_HEAVIEST]),
+        "guiPackages": sorted(packages.intersection(GUI_PACKAGES)),
+    }
+
+
+# ------------------------------------------------------------------
+
+
+def hostInfo():
+    info = {
+        "host": socket.gethostname(),
+        "machine": platform.machine(),
+        "platform": platform.platform(),
+        "python": sys.version.split()[0],
+        "numpy": np.__version__,
+        "cpus": os.cpu_count(),
+        # Without cached bytecode every import is compiled again
+        "dontWriteBytecode": bool(os.environ.get("PYTHONDONTWRITEBYTECODE")),
+    }
+    try:
+        import resource
+
+        info["maxRssKb"] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    except ImportError:
+        pass
+    return info
+
+
+def runSuite(
+    configFiles, numObjs, minSeconds, collector=True, importRuns=IMPORT_RUNS, log=print
+):
+    imports = {module: importStage(module, importRuns) for module in IMPORT_MODULES}
+    for module, stage in imports.items():
+        log(formatImport(module, stage))
+    results = []
+    for configFile in configFiles:
+        radarConfig = loadConfig(configFile)
+        for numObj in numObjs:
+            stages = decoderStages(radarConfig, numObj, minSeconds)
+            usPerFrame = sum(stage["us"] for stage in stages.values())
+            if collector:
+                stages["collector"] = collectorStage(radarConfig, numObj, minSeconds)
+            results.append(
+                {
+                    "config": os.path.basename(configFile),
+                    "numObj": numObj,
+                    "usPerFrame": usPerFrame,
+                    "framesPerSecond": 1e6 / usPerFrame,
+                    "stages": stages,
+                }
+            )
+            log(formatResult(results[-1]))
+
+    components = fftStages(minSeconds)
+    components.update(dashboardStages(loadConfig(configFiles[0]), minSeconds))
+    return {
+        "started": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "minSeconds": minSeconds,
+        "hostInfo": hostInfo(),
+        "imports": imports,
+        "results": results,
+        "components": components,
+    }
+
+
+def formatStage(name, stage):
+    if "skipped" in stage:
+        return f"{name} skipped"
+    return f"{name} {stage['us']:.1f} us {stage['peakBytes'] / 1024:.0f} KiB"
+
+
+def formatImport(module, stage):
+    if "skipped" in stage:
+        return f"import {module} skipped: {stage['skipped']}"
+    heaviest = ", ".join(
+        f"{name} {us / 1e3:.0f}" for name, us in stage["heaviest"].items()
+    )
+    gui = f", GUI packages {stage['guiPackages']}" if stage["guiPackages"] else ""
+    return (
+        f"import {module}: {stage['us'] / 1e3:.0f} ms startup, "
+        f"{stage['importUs'] / 1e3:.0f} ms import ({heaviest} ms){gui}"
+    )
+
+
+def formatResult(result):
+    stages = ", ".join(formatStage(n, s) for n, s in result["stages"].items())
+    return (
+        f"{result['config']} {result['numObj']:>3} obj: "
+        f"{result['framesPerSecond']:.0f} frames/s ({result['usPerFrame']:.1f} us), "
+        f"{stages}"
+    )
+
+
+def compare(new, old, threshold=0.1):
+    # Stages that moved by more than threshold between two runs
+    oldResults = {(r["config"], r["numObj"]): r for r in old["results"]}
+    lines = []
+    for module, stage in new.get("imports", {}).items():
+        before = old.get("imports", {}).get(module, {})
+        for key in ("us", "importUs"):
+            if key not in stage or key not in before:
+                continue
+            ratio = stage[key] / before[key]
+            if abs(ratio - 1) > threshold:
+                lines.append(
+                    f"import {module} {key}: {before[key] / 1e3:.0f} -> "
+                    f"{stage[key] / 1e3:.0f} ms ({ratio:.2f}x)"
+                )
+    for result in new["results"]:
+        previous = oldResults.get((result["config"], result["numObj"]))
+        if previous is None:
+            continue
+        for name, stage in result["stages"].items():
+            before = previous["stages"].get(name, {})
+            if "us" not in stage or "us" not in before:
+                continue
+            ratio = stage["us"] / before["us"]
+            if abs(ratio - 1) > threshold:
+                lines.append(
+                    f"{result['config']} {result['numObj']:>3} obj {name}: "
+                    f"{before['us']:.1f} -> {stage['us']:.1f} us ({ratio:.2f}x)"
+                )
+    return lines
+
+
+def parseArg():
+    parser = argparse.ArgumentParser(
+        description="Benchmark the parser over the configurations and point counts"
+    )
+    parser.add_argument("configs", nargs="*", help=f"Default {CONFIG_GLOB}")
+    parser.add_argument("--num-obj", type=int, nargs="+")
+    parser.add_argument(
+        "--quick", action="store_true", help="Fewer point counts and shorter runs"
+    )
+    parser.add_argument(
+        "--no-collector", action="store_true", help="Skip readAndParseData16xx"
+    )
+    parser.add_argument("--out", help=f"Results file, default in {BENCH_DIR}/")
+    parser.add_argument("--compare", help="Earlier results file to compare with")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parseArg()
+    configFiles = args.configs or sorted(glob.glob(CONFIG_GLOB))
+    numObjs = args.num_obj or (QUICK_NUM_OBJS if args.quick else NUM_OBJS)
+    minSeconds = QUICK_MIN_SECONDS if args.quick else MIN_SECONDS
+    suite = runSuite(
+        configFiles,
+        numObjs,
+        minSeconds,
+        not args.no_collector,
+        QUICK_IMPORT_RUNS if args.quick else IMPORT_RUNS,
+    )
+    for name, stage in suite["components"].items():
+        print(formatStage(name, stage))
+
+    out = args.out
+    if out is None:
+        os.makedirs(BENCH_DIR, exist_ok=True)
+        out = os.path.join(
+            BENCH_DIR,
+            f"bench_{suite['hostInfo']['host']}_{time.strftime('%Y%m%d_%H%M%S')}.json",
+        )
+    with open(out, "w") as f:
+        json.dump(suite, f, indent=1)
+        f.write("\n")
+    print(out)
+
+    if args.compare:
+        with open(args.compare) as f:
+            for line in compare(suite, json.load(f)) or ["no stage moved by 10%"]:
+                print(line)
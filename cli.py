@@ -0,0 +1,107 @@
+import time
+
+# Seconds to wait for the radar to acknowledge a command
+CLI_TIMEOUT = 0.5
+COMMAND_TIMEOUTS = {"sensorStart": 2.0, "sensorStop": 1.0}
+# Serial read timeout while polling for the acknowledgement
+CLI_POLL = 0.02
+
+
+class CliError(RuntimeError):
+    pass
+
+
+def sendCommand(CLIport, command, timeout=None):
+    # Writes one command and waits for its Done/Error line, returns the
+    # latency in ms and the lines the radar answered with
+    if timeout is None:
+        timeout = COMMAND_TIMEOUTS.get(command.split()[0], CLI_TIMEOUT)
+    start = time.perf_counter()
+    CLIport.write((command + "\n").encode())
+    response = []
+    while True:
+        line = CLIport.readline().decode(errors="replace").strip()
+        if line:
+            response.append(line)
+        if line.startswith("Done"):
+            return (time.perf_counter() - start) * 1e3, response
+        if line.startswith("Error") or "not recognized" in line:
+            raise CliError(f"{command!r} failed: {' / '.join(response)}")
+        if time.perf_counter() - start > timeout:
+            raise CliError(f"{command!r}: no acknowledgement after {timeout} s")
+
+
+def uploadConfig(CLIport, lines):
+    # Sends every command as soon as the previous one is acknowledged, comment
+    # and empty lines are skipped. Returns [(command, latency in ms)].
+    timeout = CLIport.timeout
+    CLIport.timeout = CLI_POLL
+    CLIport.reset_input_buffer()
+    latencies = []
+    try:
+        for line in lines:
+            command = line.strip()
+            if not command or command.startswith("%"):
+                continue
+            latency, _ = sendCommand(CLIport, command)
+            latencies.append((command, latency))
+    finally:
+        CLIport.timeout = timeout
+    return latencies
+
+
+def formatLatencies(latencies):
+    report = [f"{latency:7.1f} ms  {command}" for command, latency in latencies]
+    total = sum(latency for _, latency in latencies)
+    report.append(f"{total:7.1f} ms  total for {len(latencies)} commands")
+    return "\n".join(report)
+
+
+# ------------------------------------------------------------------
+
+# Commands that bracket an upload and are never diffed
+SESSION_COMMANDS = ("sensorStop", "flushCfg", "sensorStart")
+# Commands that add to a list on the radar instead of overwriting a setting.
+# Changing one of them needs a flushCfg and the whole list sent again.
+LIST_COMMANDS = ("profileCfg", "chirpCfg")
+
+
+def reconfigurationCommands(current, target, runningLines=()):
+    # CLI commands that take a stopped radar from the current configuration
+    # model to the target one, only the lines that differ are sent.
+    # runningLines were sent since the upload and replace the current lines
+    # of their commands, e.g. the guiMonitor lines of a TlvShedder.
+    lines = [line for line in target.lines if line.split()[0] not in SESSION_COMMANDS]
+    replaced = {line.split()[0] for line in runningLines}
+    currentLines = {line for line in current.lines if line.split()[0] not in replaced}
+    currentLines.update(runningLines)
+    listChanged = any(
+        current.commands.get(name) != target.commands.get(name)
+        for name in LIST_COMMANDS
+    )
+    if listChanged:
+        changed = ["flushCfg"] + [
+            line
+            for line in lines
+            if line.split()[0] in LIST_COMMANDS or line not in currentLines
+        ]
+    else:
+        changed = [line for line in lines if line not in currentLines]
+    return ["sensorStop"] + changed + ["sensorStart"]
+
+
+def switchConfig(CLIport, current, target, runningLines=(), stopped=None, log=print):
+    # Takes the running radar from the current configuration model to the
+    # target one, stopped is called once the sensor has stopped. A rejected
+    # difference falls back to the complete target configuration. The
+    # CliError of a rejected sensorStop or of a rejected fallback is raised,
+    # the radar then runs neither configuration reliably.
+    commands = reconfigurationCommands(current, target, runningLines)
+    uploadConfig(CLIport, commands[:1])
+    if stopped is not None:
+        stopped()
+    try:
+        return uploadConfig(CLIport, commands[1:])
+    except CliError as e:
+        log(e)
+        return uploadConfig(CLIport, target.lines)
@@ -0,0 +1,204 @@
+import json
+import time
+from collections import deque
+
+import numpy as np
+
+from platforms import Platform
+
+
+class SessionClock:
+    def __init__(self, wallNs=None, monotonicNs=None):
+        # Wall-clock anchor of a collection session. Arrival times are kept on
+        # the monotonic clock, which NTP cannot step, and only turned into
+        # dates when the data is exported.
+        if wallNs is None:
+            wallNs, monotonicNs = time.time_ns(), time.monotonic_ns()
+        self.wallNs = wallNs
+        self.monotonicNs = monotonicNs
+
+    def toWallNs(self, monotonicNs):
+        # Works on single values and on int64 arrays alike
+        return self.wallNs + (monotonicNs - self.monotonicNs)
+
+    def save(self, path):
+        with open(path, "w") as f:
+            json.dump({"wallNs": self.wallNs, "monotonicNs": self.monotonicNs}, f)
+            f.write("\n")
+
+    @classmethod
+    def load(cls, path):
+        with open(path) as f:
+            anchor = json.load(f)
+        return cls(anchor["wallNs"], anchor["monotonicNs"])
+
+
+def sessionPath(filename):
+    # Sidecar that carries the anchor of a csv written by the collectors
+    return filename.rsplit(".", 1)[0] + ".session.json"
+
+
+def readableTimes(arrivalNs, sessionClock):
+    # datetime64[ns] wall-clock times of an arrivalNs column, in UTC
+    wallNs = sessionClock.toWallNs(np.asarray(arrivalNs, dtype=np.int64))
+    return wallNs.astype("datetime64[ns]")
+
+
+# ------------------------------------------------------------------
+
+
+class ReadStamps:
+    def __init__(self):
+        # Monotonic time of every serial read whose bytes are still in the
+        # assembler buffer, with the buffer offset that read ended at
+        self.stamps = deque()
+
+    def add(self, endOffset, monotonicNs):
+        self.stamps.append([endOffset, monotonicNs])
+
+    def arrival(self, packetEnd):
+        # Time of the read that completed a packet ending at packetEnd
+        for endOffset, monotonicNs in self.stamps:
+            if endOffset >= packetEnd:
+                return monotonicNs
+        return self.stamps[-1][1] if self.stamps else time.monotonic_ns()
+
+    def shift(self, numBytes):
+        # The first numBytes of the buffer were consumed
+        for stamp in self.stamps:
+            stamp[0] -= numBytes
+        while self.stamps and self.stamps[0][0] <= 0:
+            self.stamps.popleft()
+
+    def clear(self):
+        self.stamps.clear()
+
+
+# ------------------------------------------------------------------
+
+# timeCpuCycles counts the cycles of the core that sends the packet, a 32-bit
+# counter: the 600 MHz C674x DSP on xWR16xx and xWR18xx, which wraps about
+# every 7 s, and the 200 MHz R4F on xWR14xx, every 21 s
+CPU_CLOCK_HZ = {
+    Platform.xWR14xx: 200e6,
+    Platform.xWR16xx: 600e6,
+    Platform.xWR18xx: 600e6,
+}
+CYCLE_COUNTER_WRAP = 2**32
+
+
+def platformClockHz(platform):
+    # An unknown platform is read as xWR16xx, as HeaderDecoder does
+    return CPU_CLOCK_HZ.get(platform, CPU_CLOCK_HZ[Platform.xWR16xx])
+
+
+class ClockModel:
+    def __init__(self, platform=None, blockFrames=8, numBlocks=16, resetNs=500e6):
+        # Maps the device cycle counter onto the host monotonic clock. Host
+        # arrivals are the device time plus a transport latency that is never
+        # below some minimum, so the fit follows the lower envelope: the
+        # earliest arrival of every block of frames, regressed over the last
+        # numBlocks blocks. Latency spikes then do not bend it, and the slope
+        # tracks the drift between the two oscillators.
+        self.blockFrames = blockFrames
+        self.resetNs = resetNs
+        self.minima = deque(maxlen=numBlocks)
+        self.select(platform)
+
+    def select(self, platform):
+        # The counter rate of the platform, the fit starts over
+        self.platform = platform
+        self.cpuClockHz = platformClockHz(platform)
+        self.reset()
+
+    def reset(self):
+        self.minima.clear()
+        self.lastCycles = None
+        self.lastArrivalNs = None
+        self.deviceNs = 0.0
+        self.baseNs = None
+        self.blockMin = None
+        self.blockCount = 0
+        self.slope = 1.0
+        self.offset = 0.0
+        self.latencyMean = 0.0
+        self.latencyVar = 0.0
+        self.frames = 0
+        self.resets = 0
+
+    @property
+    def driftPpm(self):
+        # How fast the device oscillator runs against the host clock
+        return (1.0 / self.slope - 1.0) * 1e6
+
+    @property
+    def jitterNs(self):
+        return self.latencyVar**0.5
+
+    def unwrap(self, timeCpuCycles, arrivalNs):
+        # Device ns since the first frame. The number of counter wraps in a
+        # gap is taken from the host clock, so lost frames do not break it.
+        if self.lastCycles is not None:
+            delta = (timeCpuCycles - self.lastCycles) % CYCLE_COUNTER_WRAP
+            hostCycles = (arrivalNs - self.lastArrivalNs) * self.cpuClockHz / 1e9
+            wraps = round((hostCycles - delta) / CYCLE_COUNTER_WRAP)
+            self.deviceNs += (
+                (delta + wraps * CYCLE_COUNTER_WRAP) / self.cpuClockHz * 1e9
+            )
+        self.lastCycles = timeCpuCycles
+        self.lastArrivalNs = arrivalNs
+        return self.deviceNs
+
+    def fit(self):
+        # Least squares line through the block minima
+        if len(self.minima) < 2:
+            x, y = self.minima[0]
+            self.slope, self.offset = 1.0, y - x
+            return
+        x = np.array([m[0] for m in self.minima])
+        y = np.array([m[1] for m in self.minima])
+        xMean, yMean = x.mean(), y.mean()
+        sxx = np.sum((x - xMean) ** 2)
+        self.slope = np.sum((x - xMean) * (y - yMean)) / sxx if sxx else 1.0
+        self.offset = yMean - self.slope * xMean
+
+    def update(self, timeCpuCycles, arrivalNs, transmitNs=0):
+        # Called once per packet with the header's cycle count, the host
+        # arrival time and the time the packet takes on the wire. Returns the
+        # host-clock acquisition time of the frame and its transport latency.
+        if self.baseNs is None:
+            self.baseNs = arrivalNs
+        x = self.unwrap(timeCpuCycles, arrivalNs)
+        # Relative to the first arrival to keep the float precision
+        y = arrivalNs - transmitNs - self.baseNs
+
+        if self.frames and abs(y - (self.offset + self.slope * x)) > self.resetNs:
+            # The counter restarted, the sensor was power cycled or reset
+            resets = self.resets
+            self.reset()
+            self.resets = resets + 1
+            return self.update(timeCpuCycles, arrivalNs, transmitNs)
+
+        # Extend the envelope, with the current block minimum as provisional point
+        if self.blockMin is None or y - x < self.blockMin[1] - self.blockMin[0]:
+            self.blockMin = (x, y)
+        self.blockCount += 1
+        if self.blockCount >= self.blockFrames or not self.frames:
+            self.minima.append(self.blockMin)
+            self.blockMin = None
+            self.blockCount = 0
+            self.fit()
+        elif y < self.offset + self.slope * x:
+            # An arrival below the line moves the envelope down at once
+            self.offset = y - self.slope * x
+
+        acquisitionNs = int(self.baseNs + self.offset + self.slope * x)
+        latencyNs = arrivalNs - acquisitionNs
+
+        # Jitter is the spread of the latency over about the fitted window
+        alpha = 1.0 / min(self.frames + 1, self.blockFrames * self.minima.maxlen)
+        delta = latencyNs - self.latencyMean
+        self.latencyMean += alpha * delta
+        self.latencyVar = (1 - alpha) * (self.latencyVar + alpha * delta * delta)
+        self.frames += 1
+        return acquisitionNs, latencyNs
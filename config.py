@@ -0,0 +1,400 @@
+import hashlib
+from dataclasses import dataclass, field, fields
+
+import numpy as np
+
+from tlv import (
+    MMWDEMO_OUTPUT_MSG_AZIMUT_STATIC_HEAT_MAP,
+    MMWDEMO_OUTPUT_MSG_NOISE_PROFILE,
+    MMWDEMO_OUTPUT_MSG_RANGE_DOPPLER_HEAT_MAP,
+    MMWDEMO_OUTPUT_MSG_STATS,
+    MMWDEMO_UART_MSG_DETECTED_POINTS,
+    MMWDEMO_UART_MSG_RANGE_PROFILE,
+    POINT_DESCRIPTOR_DTYPE,
+    POINT_DTYPE_V2,
+    TLV_HEADER,
+    headerStruct,
+)
+
+# Every packet is padded to a multiple of this many bytes by the firmware
+PACKET_ALIGNMENT = 32
+
+# ------------------------------------------------------------------
+
+# Records for the CLI commands, fields in the order the CLI expects them
+
+
+@dataclass(frozen=True)
+class ChannelCfg:
+    rxChannelEn: int
+    txChannelEn: int
+    cascading: int
+
+    @property
+    def numRxAnt(self):
+        return bin(self.rxChannelEn).count("1")
+
+    @property
+    def numTxAnt(self):
+        return bin(self.txChannelEn).count("1")
+
+
+@dataclass(frozen=True)
+class ProfileCfg:
+    profileId: int
+    startFreq: float
+    idleTime: float
+    adcStartTime: float
+    rampEndTime: float
+    txOutPower: int
+    txPhaseShifter: int
+    freqSlopeConst: float
+    txStartTime: float
+    numAdcSamples: int
+    digOutSampleRate: int
+    hpfCornerFreq1: int
+    hpfCornerFreq2: int
+    rxGain: int
+
+
+@dataclass(frozen=True)
+class ChirpCfg:
+    startIdx: int
+    endIdx: int
+    profileId: int
+    startFreq: float
+    freqSlopeVar: float
+    idleTime: float
+    adcStartTime: float
+    txEnable: int
+
+
+@dataclass(frozen=True)
+class FrameCfg:
+    chirpStartIdx: int
+    chirpEndIdx: int
+    numLoops: int
+    numFrames: int
+    framePeriodicity: float
+    triggerSelect: int
+    frameTriggerDelay: float
+
+
+@dataclass(frozen=True)
+class AdvFrameCfg:
+    numOfSubFrames: int
+    forceProfile: int
+    numFrames: int
+    triggerSelect: int
+    frameTrigDelay: float
+
+
+@dataclass(frozen=True)
+class SubFrameCfg:
+    subFrameNum: int
+    forceProfileIdx: int
+    chirpStartIdx: int
+    numOfChirps: int
+    numLoops: int
+    burstPeriodicity: float
+    chirpStartIdxOffset: int
+    numOfBurst: int
+    numOfBurstLoops: int
+    subFramePeriodicity: float
+
+
+@dataclass(frozen=True)
+class GuiMonitor:
+    subFrameIdx: int
+    detectedObjects: int
+    logMagRange: int
+    noiseProfile: int
+    rangeAzimuthHeatMap: int
+    rangeDopplerHeatMap: int
+    statsInfo: int
+
+
+@dataclass(frozen=True)
+class CfarCfg:
+    subFrameIdx: int
+    procDirection: int
+    averageMode: int
+    winLen: int
+    guardLen: int
+    noiseDiv: int
+    cyclicMode: int
+    thresholdScale: float
+
+
+# Commands that gained a leading subFrameIdx in SDK 2.x
+SUBFRAME_COMMANDS = {"guiMonitor": GuiMonitor, "cfarCfg": CfarCfg}
+
+RECORDS = {
+    "channelCfg": ChannelCfg,
+    "profileCfg": ProfileCfg,
+    "chirpCfg": ChirpCfg,
+    "frameCfg": FrameCfg,
+    "advFrameCfg": AdvFrameCfg,
+    "subFrameCfg": SubFrameCfg,
+    **SUBFRAME_COMMANDS,
+}
+
+
+def parseRecord(cls, words):
+    if cls in SUBFRAME_COMMANDS.values() and len(words) < len(fields(cls)):
+        words = ["-1"] + words
+    values = []
+    for f, word in zip(fields(cls), words):
+        values.append(int(float(word)) if f.type is int else f.type(word))
+    return cls(*values)
+
+
+# ------------------------------------------------------------------
+
+
+# Everything the decoders need for one (sub)frame, computed once per config
+@dataclass(frozen=True)
+class SubFrame:
+    index: int
+    profile: ProfileCfg
+    guiMonitor: GuiMonitor
+    numRxAnt: int
+    numTxAnt: int
+    numChirpsPerFrame: int
+    numDopplerBins: int
+    numRangeBins: int
+    rangeResolutionMeters: float
+    rangeIdxToMeters: float
+    dopplerResolutionMps: float
+    maxRange: float
+    maxVelocity: float
+    framePeriodicity: float
+    rangeArray: np.ndarray = field(repr=False)
+    dopplerArray: np.ndarray = field(repr=False)
+    rangeDopplerBuffer: np.ndarray = field(repr=False)
+    tlvBytes: dict = field(repr=False)
+
+    @property
+    def numVirtualAnt(self):
+        return self.numRxAnt * self.numTxAnt
+
+    def enabledTlvs(self):
+        gui = self.guiMonitor
+        enabled = {
+            MMWDEMO_UART_MSG_DETECTED_POINTS: gui.detectedObjects,
+            MMWDEMO_UART_MSG_RANGE_PROFILE: gui.logMagRange,
+            MMWDEMO_OUTPUT_MSG_NOISE_PROFILE: gui.noiseProfile,
+            MMWDEMO_OUTPUT_MSG_AZIMUT_STATIC_HEAT_MAP: gui.rangeAzimuthHeatMap,
+            MMWDEMO_OUTPUT_MSG_RANGE_DOPPLER_HEAT_MAP: gui.rangeDopplerHeatMap,
+            MMWDEMO_OUTPUT_MSG_STATS: gui.statsInfo,
+        }
+        return [tlv_type for tlv_type, on in enabled.items() if on]
+
+    def pointBytes(self, numObj):
+        return POINT_DESCRIPTOR_DTYPE.itemsize + numObj * POINT_DTYPE_V2.itemsize
+
+    def frameBytes(self, numObj, platform=None):
+        # Expected size of a packet of this subframe, padding included
+        totalBytes = headerStruct(platform).size
+        for tlv_type in self.enabledTlvs():
+            if tlv_type == MMWDEMO_UART_MSG_DETECTED_POINTS:
+                # The firmware skips the points TLV for empty frames
+                if numObj:
+                    totalBytes += TLV_HEADER.size + self.pointBytes(numObj)
+            else:
+                totalBytes += TLV_HEADER.size + self.tlvBytes[tlv_type]
+        return -(-totalBytes // PACKET_ALIGNMENT) * PACKET_ALIGNMENT
+
+
+def deriveSubFrame(
+    index, profile, guiMonitor, channelCfg, numChirpsPerFrame, framePeriodicity
+):
+    numRxAnt = channelCfg.numRxAnt
+    numTxAnt = channelCfg.numTxAnt
+    numRangeBins = 1 << (profile.numAdcSamples - 1).bit_length()
+    numDopplerBins = 1 << (numChirpsPerFrame // numTxAnt - 1).bit_length()
+    chirpTime = (profile.idleTime + profile.rampEndTime) * 1e-6
+    slope = profile.freqSlopeConst * 1e12
+    rangeIdxToMeters = (3e8 * profile.digOutSampleRate * 1e3) / (
+        2 * slope * numRangeBins
+    )
+    dopplerResolutionMps = 3e8 / (
+        2 * profile.startFreq * 1e9 * chirpTime * numDopplerBins * numTxAnt
+    )
+    return SubFrame(
+        index=index,
+        profile=profile,
+        guiMonitor=guiMonitor,
+        numRxAnt=numRxAnt,
+        numTxAnt=numTxAnt,
+        numChirpsPerFrame=numChirpsPerFrame,
+        numDopplerBins=numDopplerBins,
+        numRangeBins=numRangeBins,
+        rangeResolutionMeters=(3e8 * profile.digOutSampleRate * 1e3)
+        / (2 * slope * profile.numAdcSamples),
+        rangeIdxToMeters=rangeIdxToMeters,
+        dopplerResolutionMps=dopplerResolutionMps,
+        maxRange=(300 * 0.9 * profile.digOutSampleRate)
+        / (2 * profile.freqSlopeConst * 1e3),
+        maxVelocity=3e8 / (4 * profile.startFreq * 1e9 * chirpTime * numTxAnt),
+        framePeriodicity=framePeriodicity,
+        rangeArray=np.arange(numRangeBins) * rangeIdxToMeters,
+        dopplerArray=np.arange(-numDopplerBins // 2, numDopplerBins // 2)
+        * dopplerResolutionMps,
+        rangeDopplerBuffer=np.zeros((numDopplerBins, numRangeBins), dtype="uint16"),
+        tlvBytes={
+            MMWDEMO_UART_MSG_RANGE_PROFILE: 2 * numRangeBins,
+            MMWDEMO_OUTPUT_MSG_NOISE_PROFILE: 2 * numRangeBins,
+            MMWDEMO_OUTPUT_MSG_AZIMUT_STATIC_HEAT_MAP: 4
+            * numRangeBins
+            * numRxAnt
+            * numTxAnt,
+            MMWDEMO_OUTPUT_MSG_RANGE_DOPPLER_HEAT_MAP: 2
+            * numRangeBins
+            * numDopplerBins,
+            MMWDEMO_OUTPUT_MSG_STATS: 24,
+        },
+    )
+
+
+# ------------------------------------------------------------------
+
+
+@dataclass(frozen=True)
+class RadarConfig:
+    digest: str
+    lines: tuple
+    commands: dict = field(repr=False)
+    platform: str
+    sdkVersion: str
+    channelCfg: ChannelCfg
+    profiles: dict
+    chirps: tuple
+    frameCfg: FrameCfg
+    advFrameCfg: AdvFrameCfg
+    subFrames: tuple
+    framePeriodicity: float
+
+    def subFrame(self, subFrameNumber):
+        if subFrameNumber < len(self.subFrames):
+            return self.subFrames[subFrameNumber]
+        return self.subFrames[0]
+
+    def records(self, name):
+        return [
+            parseRecord(RECORDS[name], words) for words in self.commands.get(name, ())
+        ]
+
+
+def forSubFrame(records, subFrameIdx):
+    # The last command addressed to this subframe or to all of them (-1) wins
+    selected = None
+    for record in records:
+        if record.subFrameIdx in (-1, subFrameIdx):
+            selected = record
+    return selected
+
+
+def parseConfig(text, digest=""):
+    lines = []
+    commands = {}
+    platform = None
+    sdkVersion = None
+    for line in text.splitlines():
+        line = line.strip()
+        # The visualizer records the target platform and SDK in the header comment
+        if line.startswith("% Platform:"):
+            platform = line.split(":", 1)[1].strip()
+        elif line.startswith("% Created for SDK ver:"):
+            sdkVersion = line.split(":", 1)[1].strip()
+        if not line or line.startswith("%"):
+            continue
+        lines.append(line)
+        splitWords = line.split()
+        commands.setdefault(splitWords[0], []).append(tuple(splitWords[1:]))
+
+    def single(name):
+        words = commands.get(name)
+        return parseRecord(RECORDS[name], list(words[-1])) if words else None
+
+    channelCfg = single("channelCfg")
+    profiles = {}
+    for words in commands.get("profileCfg", ()):
+        profile = parseRecord(ProfileCfg, list(words))
+        profiles[profile.profileId] = profile
+    chirps = tuple(parseRecord(ChirpCfg, list(w)) for w in commands.get("chirpCfg", ()))
+    frameCfg = single("frameCfg")
+    advFrameCfg = single("advFrameCfg")
+    guiMonitors = [
+        parseRecord(GuiMonitor, list(w)) for w in commands.get("guiMonitor", ())
+    ]
+
+    def chirpProfile(chirpIdx):
+        for chirp in chirps:
+            if chirp.startIdx <= chirpIdx <= chirp.endIdx:
+                return profiles[chirp.profileId]
+        return next(iter(profiles.values()))
+
+    # A legacy frameCfg is a single subframe
+    subFrames = []
+    if advFrameCfg is not None:
+        subFrameCfgs = {}
+        for words in commands.get("subFrameCfg", ()):
+            subFrameCfg = parseRecord(SubFrameCfg, list(words))
+            subFrameCfgs[subFrameCfg.subFrameNum] = subFrameCfg
+        for index in range(advFrameCfg.numOfSubFrames):
+            subFrameCfg = subFrameCfgs[index]
+            subFrames.append(
+                deriveSubFrame(
+                    index,
+                    chirpProfile(subFrameCfg.chirpStartIdx),
+                    forSubFrame(guiMonitors, index),
+                    channelCfg,
+                    subFrameCfg.numOfChirps * subFrameCfg.numLoops,
+                    subFrameCfg.subFramePeriodicity,
+                )
+            )
+    else:
+        numChirpsPerFrame = (
+            frameCfg.chirpEndIdx - frameCfg.chirpStartIdx + 1
+        ) * frameCfg.numLoops
+        subFrames.append(
+            deriveSubFrame(
+                0,
+                chirpProfile(frameCfg.chirpStartIdx),
+                forSubFrame(guiMonitors, 0),
+                channelCfg,
+                numChirpsPerFrame,
+                frameCfg.framePeriodicity,
+            )
+        )
+
+    return RadarConfig(
+        digest=digest,
+        lines=tuple(lines),
+        commands={name: tuple(words) for name, words in commands.items()},
+        platform=platform,
+        sdkVersion=sdkVersion,
+        channelCfg=channelCfg,
+        profiles=profiles,
+        chirps=chirps,
+        frameCfg=frameCfg,
+        advFrameCfg=advFrameCfg,
+        subFrames=tuple(subFrames),
+        framePeriodicity=sum(s.framePeriodicity for s in subFrames),
+    )
+
+
+# Parsed configurations, keyed by the SHA-256 of the file content
+_configCache = {}
+
+
+def loadConfig(configFileName):
+    with open(configFileName, "rb") as f:
+        data = f.read()
+    digest = hashlib.sha256(data).hexdigest()
+    radarConfig = _configCache.get(digest)
+    if radarConfig is None:
+        radarConfig = parseConfig(data.decode(), digest)
+        _configCache[digest] = radarConfig
+    return radarConfig
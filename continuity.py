@@ -0,0 +1,129 @@
+FRAME_NUMBER_WRAP = 2**32
+
+# Causes of a gap, from the assembler counters that moved during it
+LOSS_OVERFLOW = "overflow"
+LOSS_RESYNC = "resync"
+LOSS_DEVICE = "device"
+# The ports were lost and reopened, the gap is estimated from the time
+LOSS_RECONNECT = "reconnect"
+
+
+class FrameTracker:
+    def __init__(self, numSubFrames=1, maxGap=100000):
+        # Follows the frameNumber of every packet. Each subframe of an advanced
+        # frame has its own packet with the same frameNumber, so the sequence
+        # is counted in packets. A step back, or forward by more than maxGap,
+        # is taken as a restart of the sensor.
+        self.maxGap = maxGap
+        self.packets = 0
+        self.lostPackets = 0
+        self.duplicates = 0
+        self.resets = 0
+        self.losses = dict.fromkeys(
+            [LOSS_OVERFLOW, LOSS_RESYNC, LOSS_DEVICE, LOSS_RECONNECT], 0
+        )
+        self.interruption = None
+        self.lastDroppedBytes = 0
+        self.lastSkippedBytes = 0
+        self.restart(numSubFrames)
+
+    def restart(self, numSubFrames=None):
+        # The sensor was stopped and started again, the count starts over
+        if numSubFrames is not None:
+            self.numSubFrames = numSubFrames
+        self.lastSequence = None
+        self.lastArrivalNs = None
+        self.interruption = None
+
+    def interrupt(self, cause, packetPeriodNs):
+        # The stream broke off and the sensor was started again, its frames are
+        # numbered anew. The packets missing in between are counted from the
+        # time that passed until the next one.
+        self.lastSequence = None
+        self.interruption = (cause, packetPeriodNs)
+
+    def update(
+        self, frameNumber, subFrameNumber, arrivalNs, droppedBytes, skippedBytes
+    ):
+        # Called once per packet with the assembler counters, returns the
+        # columns that describe the continuity of the stream up to it
+        sequence = frameNumber * self.numSubFrames + subFrameNumber
+        row = {
+            "frameNumber": frameNumber,
+            "frameEvent": "",
+            "lostPackets": 0,
+            "lossCause": "",
+            "lossStartNs": "",
+        }
+
+        if self.interruption is not None and self.lastArrivalNs is not None:
+            cause, packetPeriodNs = self.interruption
+            delta = max(1, round((arrivalNs - self.lastArrivalNs) / packetPeriodNs))
+            row["frameEvent"] = cause
+        elif self.lastSequence is None:
+            # Frames are numbered from 1 after sensorStart, a stream that was
+            # already running is taken as it is
+            delta = sequence - self.numSubFrames + 1
+            if delta > self.maxGap:
+                delta = 1
+            row["frameEvent"] = "start"
+        else:
+            delta = (sequence - self.lastSequence) % (
+                FRAME_NUMBER_WRAP * self.numSubFrames
+            )
+            if delta == 0:
+                self.duplicates += 1
+                row["frameEvent"] = "duplicate"
+                return row
+            if delta > self.maxGap:
+                self.resets += 1
+                delta = sequence - self.numSubFrames + 1
+                row["frameEvent"] = "reset"
+
+        if delta > 1:
+            if self.interruption is not None:
+                cause = self.interruption[0]
+            elif droppedBytes > self.lastDroppedBytes:
+                cause = LOSS_OVERFLOW
+            elif skippedBytes > self.lastSkippedBytes:
+                cause = LOSS_RESYNC
+            else:
+                cause = LOSS_DEVICE
+            row["frameEvent"] = row["frameEvent"] or "gap"
+            row["lostPackets"] = delta - 1
+            row["lossCause"] = cause
+            # The data is missing between the previous packet and this one
+            if self.lastArrivalNs is not None:
+                row["lossStartNs"] = self.lastArrivalNs
+            self.lostPackets += delta - 1
+            self.losses[cause] += delta - 1
+
+        self.packets += 1
+        self.interruption = None
+        self.lastSequence = sequence
+        self.lastArrivalNs = arrivalNs
+        self.lastDroppedBytes = droppedBytes
+        self.lastSkippedBytes = skippedBytes
+        return row
+
+    @property
+    def lossRatio(self):
+        total = self.packets + self.lostPackets
+        return self.lostPackets / total if total else 0.0
+
+    def summary(self):
+        causes = ", ".join(f"{n} {cause}" for cause, n in self.losses.items() if n)
+        return (
+            f"{self.packets} packets, {self.lostPackets} lost "
+            f"({100 * self.lossRatio:.2f}%{': ' + causes if causes else ''}), "
+            f"{self.duplicates} duplicates, {self.resets} resets"
+        )
+
+
+def lossIntervals(df):
+    # Rows of a collector csv that follow missing data, with the interval of
+    # arrival times the data is missing from
+    gaps = df[df.lostPackets > 0]
+    return gaps.assign(lossEndNs=gaps.arrivalNs)[
+        ["lossStartNs", "lossEndNs", "lostPackets", "lossCause", "frameEvent"]
+    ]
@@ -4,6 +4,7 @@ from multiprocessing import Event, Manager, Process
 from tkinter import ttk
 
 import numpy as np
+import serial
 from matplotlib.animation import FuncAnimation
 from matplotlib.backends.backend_tkagg import (FigureCanvasTkAgg,
                                                NavigationToolbar2Tk)
@@ -12,6 +13,11 @@ from msgspec import Struct
 from msgspec.json import decode
 from ttkthemes import ThemedTk
 
+from artifacts import generateArtifact
+from cli import CliError, formatLatencies, uploadConfig
+from input import Transform
+from ports import PortError, findPorts
+
 
 class Schema(Struct):
     x_coord: list[float]
@@ -121,6 +127,21 @@ def animate_noise(_):
     return (obj_rp, obj_noiserp)
 
 
+# Dashboard choices as the Transform engine names them
+SUBPROFILE_TYPES = {
+    "Best Range Resolution": "best_range_res",
+    "Best Velocity Resolution": "best_vel_res",
+    "Best Range": "best_range",
+}
+AZIMUTH_RESOLUTIONS = {
+    "4Rx,3Tx(15 deg + Elevation)": "15 + Elevation",
+    "4Rx,2Tx(15 deg)": "15",
+    "4Rx,1Tx(30 deg)": "30",
+    "2Rx,1Tx(60 deg)": "60",
+    "1Rx,1Tx(None)": "None (1Rx/1Tx)",
+}
+
+
 class ConfigureFrame(ttk.Frame):
     def __init__(self, container):
         super().__init__(container)
@@ -319,10 +340,54 @@ class ConfigureFrame(ttk.Frame):
         for widget in plot.winfo_children():
             widget.grid(padx=5, pady=5)
 
+    def generate_config(self):
+        # Run the headless Transform engine on the current selections, returns
+        # the .cfg lines and the slider ranges the engine derived. A selection
+        # seen before is served from the artifact cache.
+        transform = Transform()
+        subprofile_type = SUBPROFILE_TYPES[self._subprofile_type.get()]
+        if subprofile_type == "best_range_res":
+            transform.setDefaultRangeResConfig()
+        elif subprofile_type == "best_vel_res":
+            transform.setDefaultVelResConfig()
+        else:
+            transform.setDefaultRangeConfig()
+
+        sdk_major, sdk_minor = str(self._sdk_version.get()).split(".")
+        changes = {
+            "platform": self._platform.get(),
+            "sdkVersionUint16": (int(sdk_major) << 8) | int(sdk_minor),
+            "Azimuth_Resolution": AZIMUTH_RESOLUTIONS[self._antenna_conf.get()],
+            "Frequency_band": 77 if self._freq_band.get() == "77-81" else 76,
+            "Frame_Rate": self._frame_rate.get(),
+            "Maximum_range": self._max_range.get(),
+            "Maximum_radial_velocity": self._max_rad_vel.get(),
+        }
+        transform.updateInput(changes)
+        artifact = generateArtifact(
+            transform,
+            plots={
+                "scatterPlot": self._scatter_plot.get(),
+                "rangeProfile": self._range_profile.get(),
+                "noiseProfile": self._noise_profile.get(),
+                "azimuthHeatmap": self._range_azimuth_heat_map.get(),
+                "dopplerHeatmap": self._range_doppler_heat_map.get(),
+                "statistics": self._statistics.get(),
+            },
+        )
+        return list(artifact.lines), artifact.sliders
+
     def send_config(self):
+        # The plots pause while the radar is configured over its CLI port
         global read_data
+        cfg_lines, _ = self.generate_config()
         read_data.play.clear()
-        time.sleep(2)
+        try:
+            cli_port_name, _ = findPorts()
+            with serial.Serial(cli_port_name, 115200) as cli_port:
+                print(formatLatencies(uploadConfig(cli_port, cfg_lines)))
+        except (PortError, CliError, serial.SerialException) as e:
+            print(e)
         read_data.play.set()
 
 
@@ -0,0 +1,132 @@
+from collections import deque
+
+from tlv import STATS_FIELDS
+
+# Alarms raised from the statistics TLV, with the field each one watches
+MARGIN_ALARMS = {
+    "interFrameMarginNegative": "interFrameProcessingMargin",
+    "interChirpMarginNegative": "interChirpProcessingMargin",
+}
+LOAD_ALARMS = {
+    "activeFrameCPULoadHigh": "activeFrameCPULoad",
+    "interFrameCPULoadHigh": "interFrameCPULoad",
+}
+
+
+class RollingWindow:
+    def __init__(self, size):
+        # Last size values with their min, max and mean in amortized O(1): the
+        # candidates for min and max are kept in monotonic deques
+        self.size = size
+        self.values = deque()
+        self.minima = deque()
+        self.maxima = deque()
+        self.total = 0
+        self.pushed = 0
+
+    def push(self, value):
+        self.values.append(value)
+        self.total += value
+        while self.minima and self.minima[-1][1] > value:
+            self.minima.pop()
+        self.minima.append((self.pushed, value))
+        while self.maxima and self.maxima[-1][1] < value:
+            self.maxima.pop()
+        self.maxima.append((self.pushed, value))
+        self.pushed += 1
+
+        if len(self.values) > self.size:
+            self.total -= self.values.popleft()
+            oldest = self.pushed - self.size
+            if self.minima[0][0] < oldest:
+                self.minima.popleft()
+            if self.maxima[0][0] < oldest:
+                self.maxima.popleft()
+
+    @property
+    def min(self):
+        return self.minima[0][1]
+
+    @property
+    def max(self):
+        return self.maxima[0][1]
+
+    @property
+    def mean(self):
+        return self.total / len(self.values)
+
+    def __len__(self):
+        return len(self.values)
+
+
+class DeviceStats:
+    def __init__(self, window=100, loadAlarm=90, clearFrames=10):
+        # Rolling series of the statistics TLV, window frames long. An alarm is
+        # raised on the first frame that breaks its limit and cleared after
+        # clearFrames good frames in a row, so a flapping margin does not flood
+        # the console.
+        self.window = window
+        self.loadAlarm = loadAlarm
+        self.clearFrames = clearFrames
+        self.alarmFrames = dict.fromkeys([*MARGIN_ALARMS, *LOAD_ALARMS], 0)
+        self.clear()
+
+    def clear(self):
+        # The limits change with the configuration, the series start over
+        self.windows = {field: RollingWindow(self.window) for field in STATS_FIELDS}
+        self.active = dict.fromkeys(self.alarmFrames, False)
+        self.goodFrames = dict.fromkeys(self.alarmFrames, 0)
+
+    def update(self, statisticsObj):
+        # Called with the decoded TLV of every frame that has one, returns the
+        # alarms raised and cleared by it as (name, raised) pairs
+        for field, window in self.windows.items():
+            window.push(statisticsObj[field])
+
+        changes = []
+        for alarms, broken in (
+            (MARGIN_ALARMS, lambda value: value < 0),
+            (LOAD_ALARMS, lambda value: value >= self.loadAlarm),
+        ):
+            for alarm, field in alarms.items():
+                if broken(statisticsObj[field]):
+                    self.alarmFrames[alarm] += 1
+                    self.goodFrames[alarm] = 0
+                    if not self.active[alarm]:
+                        self.active[alarm] = True
+                        changes.append((alarm, True))
+                elif self.active[alarm]:
+                    self.goodFrames[alarm] += 1
+                    if self.goodFrames[alarm] >= self.clearFrames:
+                        self.active[alarm] = False
+                        changes.append((alarm, False))
+        return changes
+
+    def formatAlarm(self, alarm, raised):
+        field = {**MARGIN_ALARMS, **LOAD_ALARMS}[alarm]
+        window = self.windows[field]
+        state = "raised" if raised else "cleared"
+        return (
+            f"device alarm {alarm} {state}: {field} min {window.min} "
+            f"avg {window.mean:.1f} max {window.max} over {len(window)} frames"
+        )
+
+    def export(self, stageTimer):
+        # Next to the host metrics, times in us and loads in percent
+        for field, window in self.windows.items():
+            if not len(window):
+                continue
+            name = (
+                "device_cpu_load_percent"
+                if field.endswith("CPULoad")
+                else "device_time_microseconds"
+            )
+            for aggregate in ("min", "mean", "max"):
+                stageTimer.gauge(
+                    name, getattr(window, aggregate), stat=field, window=aggregate
+                )
+        for alarm, active in self.active.items():
+            stageTimer.gauge("device_alarm", int(active), alarm=alarm)
+            stageTimer.counter(
+                "device_alarm_frames_total", self.alarmFrames[alarm], alarm=alarm
+            )
@@ -0,0 +1,364 @@
+import argparse
+import os
+import threading
+import time
+import tty
+
+import numpy as np
+
+from cli import LIST_COMMANDS
+from config import parseConfig
+from planner import UART_BAUD_RATE
+from synthetic import MAGIC_WORD, PacketGenerator
+
+# Commands of the out-of-box demo CLI, anything else is not recognized
+KNOWN_COMMANDS = {
+    "sensorStart",
+    "sensorStop",
+    "flushCfg",
+    "dfeDataOutputMode",
+    "channelCfg",
+    "adcCfg",
+    "adcbufCfg",
+    "profileCfg",
+    "chirpCfg",
+    "frameCfg",
+    "advFrameCfg",
+    "subFrameCfg",
+    "lowPower",
+    "guiMonitor",
+    "cfarCfg",
+    "cfarRangeCfg",
+    "cfarDopplerCfg",
+    "peakGrouping",
+    "cfarFovCfg",
+    "aoaFovCfg",
+    "multiObjBeamForming",
+    "calibDcRangeSig",
+    "extendedMaxVelocity",
+    "clutterRemoval",
+    "bpmCfg",
+    "lvdsStreamCfg",
+    "nearFieldCfg",
+    "compRangeBiasAndRxChanPhase",
+    "measureRangeBiasAndRxChanPhase",
+    "CQRxSatMonitor",
+    "CQSigImgMonitor",
+    "analogMonitor",
+    "calibData",
+}
+PROMPT = "mmwDemo:/>"
+BANNER = "\r\n" + "*" * 40 + "\r\n{platform} MMW Demo {sdkVersion}\r\n" + "*" * 40
+# Bytes put on the emulated UART at once
+WRITE_CHUNK = 256
+
+
+def openPty(linkPath=None):
+    # Raw pty pair, the slave end stays open here so that the port survives
+    # the collector closing and reopening it
+    master, slave = os.openpty()
+    tty.setraw(slave)
+    os.set_blocking(master, False)
+    path = os.ttyname(slave)
+    if linkPath:
+        if os.path.lexists(linkPath):
+            os.remove(linkPath)
+        os.symlink(path, linkPath)
+        path = linkPath
+    return master, slave, path
+
+
+def splitPackets(data):
+    # Packets of a recorded data port stream, cut at the magic words
+    starts = []
+    idX = data.find(MAGIC_WORD)
+    while idX >= 0:
+        starts.append(idX)
+        idX = data.find(MAGIC_WORD, idX + 1)
+    return [data[a:b] for a, b in zip(starts, starts[1:] + [len(data)])]
+
+
+class Emulator:
+    def __init__(
+        self,
+        platform="xWR16xx",
+        sdkVersion="02.00",
+        numObj=20,
+        noise=0.5,
+        seed=0,
+        replay=None,
+        baudRate=UART_BAUD_RATE,
+        dropRate=0.0,
+        stallEvery=0.0,
+        stallFor=0.0,
+        resetEvery=0.0,
+        rebootEvery=0.0,
+        linkDir=None,
+    ):
+        # An AWR1642 running the out-of-box demo behind two pseudo-terminals.
+        # The CLI port answers commands as the firmware does, sensorStart
+        # streams packets on the data port at the frame rate of the uploaded
+        # configuration and no faster than the baud rate. Faults:
+        #   dropRate     fraction of bytes lost on the wire
+        #   stallEvery   the UART goes quiet for stallFor s, frames are lost
+        #   resetEvery   the frame and cycle counters restart
+        #   rebootEvery  the device reboots, configuration and stream are gone
+        # Bytes the collector does not read in time are dropped, as by the
+        # host's serial driver.
+        self.platform = platform
+        self.sdkVersion = sdkVersion
+        self.numObj = numObj
+        self.noise = noise
+        self.seed = seed
+        self.replay = splitPackets(open(replay, "rb").read()) if replay else None
+        self.bytesPerSecond = baudRate / 10
+        self.dropRate = dropRate
+        self.stallEvery = stallEvery
+        self.stallFor = stallFor
+        self.resetEvery = resetEvery
+        self.rebootEvery = rebootEvery
+        self.rng = np.random.default_rng(seed)
+
+        if linkDir:
+            os.makedirs(linkDir, exist_ok=True)
+        self.cliMaster, self.cliSlave, self.cliPath = openPty(
+            linkDir and os.path.join(linkDir, "cli")
+        )
+        self.dataMaster, self.dataSlave, self.dataPath = openPty(
+            linkDir and os.path.join(linkDir, "data")
+        )
+
+        self.lines = []
+        self.lock = threading.Lock()
+        self.halt = threading.Event()
+        self.stopped = threading.Event()
+        self.streamer = None
+        self.generator = None
+        self.counters = {
+            "frames": 0,
+            "bytes": 0,
+            "overflowBytes": 0,
+            "droppedBytes": 0,
+            "stalls": 0,
+            "resets": 0,
+            "reboots": 0,
+        }
+
+    # -------------------------------------------------------------- CLI
+
+    def respond(self, text):
+        data = (text + "\r\n").encode()
+        while data:
+            try:
+                data = data[os.write(self.cliMaster, data) :]
+            except BlockingIOError:
+                time.sleep(0.001)
+
+    def radarConfig(self):
+        text = f"% Platform:{self.platform}\n% Created for SDK ver:{self.sdkVersion}\n"
+        return parseConfig(text + "\n".join(self.lines))
+
+    def command(self, line):
+        words = line.split()
+        name = words[0]
+        if name not in KNOWN_COMMANDS:
+            return f"'{name}' is not recognized as a CLI command"
+        if name == "sensorStop":
+            self.stopStream()
+        elif name == "flushCfg":
+            self.lines = [l for l in self.lines if l.split()[0] not in LIST_COMMANDS]
+        elif name == "sensorStart":
+            try:
+                radarConfig = self.radarConfig()
+            except Exception as e:
+                return f"Error -1: {e}"
+            self.startStream(radarConfig)
+        else:
+            # The last line of a command wins, as in parseConfig
+            if line in self.lines and name not in LIST_COMMANDS:
+                self.lines.remove(line)
+            self.lines.append(line)
+        return "Done"
+
+    def serveCli(self):
+        pending = b""
+        while not self.stopped.is_set():
+            try:
+                chunk = os.read(self.cliMaster, 4096)
+            except BlockingIOError:
+                time.sleep(0.002)
+                continue
+            pending += chunk
+            while b"\n" in pending:
+                raw, pending = pending.split(b"\n", 1)
+                line = raw.decode(errors="replace").strip()
+                if not line or line.startswith("%"):
+                    continue
+                with self.lock:
+                    answer = self.command(line)
+                self.respond(f"{line}\r\n{answer}\r\n{PROMPT}")
+
+    # ----------------------------------------------------------- stream
+
+    def startStream(self, radarConfig):
+        self.stopStream()
+        self.halt.clear()
+        self.streamer = threading.Thread(
+            target=self.stream, args=(radarConfig,), daemon=True
+        )
+        self.streamer.start()
+
+    def stopStream(self):
+        self.halt.set()
+        if self.streamer is not None:
+            self.streamer.join()
+        self.streamer = None
+
+    def reboot(self):
+        # Everything uploaded is lost, the collector has to configure again.
+        # Runs on the streamer, which the CLI may be joining under the lock.
+        self.halt.set()
+        self.lines = []
+        self.counters["reboots"] += 1
+        self.respond(BANNER.format(platform=self.platform, sdkVersion=self.sdkVersion))
+        self.respond(PROMPT)
+
+    def packets(self, radarConfig):
+        # (packet, ms until the next one) forever
+        if self.replay:
+            period = radarConfig.framePeriodicity / len(radarConfig.subFrames)
+            while True:
+                for packet in self.replay:
+                    yield packet, period
+        generator = PacketGenerator(
+            radarConfig, self.numObj, self.noise, self.seed, sdkVersion=self.sdkVersion
+        )
+        self.generator = generator
+        while True:
+            for subFrame in radarConfig.subFrames:
+                numObj = int(self.rng.poisson(self.numObj)) if self.numObj else 0
+                yield generator.packet(
+                    subFrame.index, numObj
+                ), subFrame.framePeriodicity
+
+    def transmit(self, packet, wireFree):
+        # Paced at the baud rate, returns when the UART is free again
+        if self.dropRate:
+            keep = self.rng.random(len(packet)) >= self.dropRate
+            self.counters["droppedBytes"] += len(packet) - int(keep.sum())
+            packet = np.frombuffer(packet, dtype="uint8")[keep].tobytes()
+        for idX in range(0, len(packet), WRITE_CHUNK):
+            chunk = packet[idX : idX + WRITE_CHUNK]
+            delay = wireFree - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+            wireFree = (
+                max(wireFree, time.monotonic()) + len(chunk) / self.bytesPerSecond
+            )
+            try:
+                written = os.write(self.dataMaster, chunk)
+            except BlockingIOError:
+                written = 0
+            self.counters["bytes"] += written
+            self.counters["overflowBytes"] += len(chunk) - written
+        return wireFree
+
+    def stream(self, radarConfig):
+        start = nextPacket = wireFree = time.monotonic()
+        nextStall = start + self.stallEvery if self.stallEvery else None
+        nextReset = start + self.resetEvery if self.resetEvery else None
+        nextReboot = start + self.rebootEvery if self.rebootEvery else None
+        stallUntil = 0.0
+        for packet, periodMs in self.packets(radarConfig):
+            if self.halt.is_set():
+                return
+            now = time.monotonic()
+            if nextStall is not None and now >= nextStall:
+                stallUntil = now + self.stallFor
+                nextStall += self.stallEvery
+                self.counters["stalls"] += 1
+            if nextReset is not None and now >= nextReset and not self.replay:
+                self.generator.frameNumber = 0
+                nextReset += self.resetEvery
+                self.counters["resets"] += 1
+            if nextReboot is not None and now >= nextReboot:
+                self.reboot()
+                return
+
+            # The device keeps framing through a stall, its packets are lost
+            if now >= stallUntil:
+                wireFree = self.transmit(packet, wireFree)
+            self.counters["frames"] += 1
+            nextPacket += periodMs / 1e3
+            delay = nextPacket - time.monotonic()
+            if delay > 0:
+                self.halt.wait(delay)
+
+    # -------------------------------------------------------------- run
+
+    def summary(self):
+        return ", ".join(f"{value} {name}" for name, value in self.counters.items())
+
+    def run(self):
+        cli = threading.Thread(target=self.serveCli, daemon=True)
+        cli.start()
+        return cli
+
+    def close(self):
+        self.stopped.set()
+        self.stopStream()
+        for fd in (self.cliMaster, self.cliSlave, self.dataMaster, self.dataSlave):
+            os.close(fd)
+
+
+def parseArg():
+    parser = argparse.ArgumentParser(
+        description="Emulate an AWR1642 with the out-of-box demo on two pseudo-terminals"
+    )
+    parser.add_argument("--platform", default="xWR16xx")
+    parser.add_argument("--sdk", default="02.00", help="SDK version of the packets")
+    parser.add_argument("--num-obj", type=int, default=20, help="Mean points per frame")
+    parser.add_argument("--noise", type=float, default=0.5)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--replay", help="Stream a recorded data port capture instead")
+    parser.add_argument("--baud", type=int, default=UART_BAUD_RATE)
+    parser.add_argument("--drop-rate", type=float, default=0.0)
+    parser.add_argument("--stall-every", type=float, default=0.0, metavar="SECONDS")
+    parser.add_argument("--stall-for", type=float, default=1.0, metavar="SECONDS")
+    parser.add_argument("--reset-every", type=float, default=0.0, metavar="SECONDS")
+    parser.add_argument("--reboot-every", type=float, default=0.0, metavar="SECONDS")
+    parser.add_argument(
+        "--link-dir", help="Create stable cli and data links to the ports here"
+    )
+    parser.add_argument("--report-every", type=float, default=10.0, metavar="SECONDS")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parseArg()
+    emulator = Emulator(
+        args.platform,
+        args.sdk,
+        args.num_obj,
+        args.noise,
+        args.seed,
+        args.replay,
+        args.baud,
+        args.drop_rate,
+        args.stall_every,
+        args.stall_for,
+        args.reset_every,
+        args.reboot_every,
+        args.link_dir,
+    )
+    emulator.run()
+    print(f"CLI port {emulator.cliPath}, data port {emulator.dataPath}")
+    print(
+        f"python only_read.py --cli-port {emulator.cliPath} --data-port {emulator.dataPath}"
+    )
+    try:
+        while True:
+            time.sleep(args.report_every)
+            print(emulator.summary())
+    except KeyboardInterrupt:
+        emulator.close()
@@ -3,6 +3,8 @@ import time
 import numpy as np
 import serial
 
+from ports import findPorts
+
 configFileName = "sensor_out_of_box_demo.cfg"
 CLIport = {}
 Dataport = {}
@@ -34,9 +36,9 @@ def serialConfig(configFileName):
     global Dataport
     # Open the serial ports for the configuration and the data ports
 
-    # Raspberry pi
-    CLIport = serial.Serial("/dev/ttyACM1", 115200)
-    Dataport = serial.Serial("/dev/ttyACM2", 921600)
+    cliPortName, dataPortName = findPorts()
+    CLIport = serial.Serial(cliPortName, 115200)
+    Dataport = serial.Serial(dataPortName, 921600)
     config = [line.rstrip("\r\n") for line in open(configFileName)]
     for i in config:
         CLIport.write((i + "\n").encode())
@@ -1,10 +1,11 @@
 import math
+import statistics
+import time
 
+from platforms import Platform
 
-class Platform:
-    xWR14xx = "xWR14xx"
-    xWR16xx = "xWR16xx"
-    xWR18xx = "xWR18xx"
+# Version of the TI mmWave Demo Visualizer this engine was ported from
+visualizerVersion = "2.1.0"
 
 
 class Transform:
@@ -30,14 +31,29 @@ class Transform:
             "lines": [],
         }
 
+        # Slider and droplist ranges that the visualizer kept in its widgets
+        self.sliders = {}
+        # Plot and processing checkboxes of the visualizer
+        self.options = {
+            "scatterPlot": True,
+            "rangeProfile": True,
+            "noiseProfile": False,
+            "azimuthHeatmap": False,
+            "dopplerHeatmap": False,
+            "statistics": True,
+            "rangePeakGrouping": True,
+            "dopplerPeakGrouping": True,
+            "clutterRemoval": False,
+        }
+
     def toLabels(self, nums, p):
         return ", ".join([f"{v:.{p}f}" if p else str(v) for i, v in enumerate(nums)])
 
     def toCeil(self, x, p):
-        return round((x + 0.5) / 10**p, p)
+        return math.ceil(x * 10**p) / 10**p
 
     def toFloor(self, x, p):
-        return round((x - 0.5) / 10**p, p)
+        return math.floor(x * 10**p) / 10**p
 
     def isRR(self):
         return self.Input["subprofile_type"] == "best_range_res"
@@ -144,14 +160,17 @@ class Transform:
                 5000, self.Input["platform"], 8
             )
 
-    def setSliderRange(self, widget, minVal, maxVal):
-        # work around slider bug
-        if maxVal < widget.minValue:
-            widget.minValue = minVal
-            widget.maxValue = maxVal
-        else:
-            widget.maxValue = maxVal
-            widget.minValue = minVal
+    def setSliderRange(self, name, minVal, maxVal, increment, labels):
+        # Headless stand-in for the visualizer's slider widgets, the state is
+        # kept in self.sliders for the GUI or a script to read
+        slider = {
+            "minValue": minVal,
+            "maxValue": maxVal,
+            "increment": increment,
+            "labels": labels,
+        }
+        self.sliders[name] = slider
+        return slider
 
     def rangeResolutionConstraints1(
         self,
@@ -174,35 +193,24 @@ class Transform:
             3,
         )
 
-        self.setSliderRange(
-            templateObj.tiWidgetSliderRangeResolution, rampSlopeLo, rampSlopeHi
-        )
-        templateObj.tiWidgetSliderRangeResolution.increment = 5
-        templateObj.tiWidgetSliderRangeResolution.labels = self.toLabels(
-            [
-                rangeResLo,
-                rangeResHi,
-            ]
+        return self.setSliderRange(
+            "rangeResolution",
+            rampSlopeLo,
+            rampSlopeHi,
+            5,
+            self.toLabels([rangeResLo, rangeResHi], 3),
         )
 
     def rangeResolutionConstraints2(
         self, lightSpeed, sweepBw, minBandwidth, maxBandwidth
     ):
         # for VR
-        # var tmp = round( lightSpeed / ( 2* ( total_bw - ramp_slope * (chirp_start_time + chirp_end_time) ) ), 3);
-        rangeResLo = round(lightSpeed / (2 * sweepBw), 3)
-        rangeResHi = round(lightSpeed / (2 * sweepBw), 3)
-
-        self.setSliderRange(
-            templateObj.tiWidgetSliderRangeResolution, minBandwidth, maxBandwidth
-        )
-        templateObj.tiWidgetSliderRangeResolution.increment = 0.5
-        # templateObj.ti_widget_slider_range_resolution.labels = self.toLabels([range_res_lo, range_res_hi]);
-        templateObj.tiWidgetSliderRangeResolution.labels = self.toLabels(
-            [
-                "coarse",
-                "fine",
-            ]
+        return self.setSliderRange(
+            "rangeResolution",
+            minBandwidth,
+            maxBandwidth,
+            0.5,
+            self.toLabels(["coarse", "fine"], 0),
         )
 
     def rangeResolutionConstraints3(self, maximumRange, adcSamplesLo, maxNumAdcSamples):
@@ -213,15 +221,12 @@ class Transform:
         if adcSamplesLo == maxNumAdcSamples:
             maxNumAdcSamples = maxNumAdcSamples + 1  # hack
 
-        self.setSliderRange(
-            templateObj.tiWidgetSliderRangeResolution, adcSamplesLo, maxNumAdcSamples
-        )
-        templateObj.tiWidgetSliderRangeResolution.increment = 16
-        templateObj.tiWidgetSliderRangeResolution.labels = self.toLabels(
-            [
-                rangeResHi,
-                rangeResLo,
-            ]
+        return self.setSliderRange(
+            "rangeResolution",
+            adcSamplesLo,
+            maxNumAdcSamples,
+            16,
+            self.toLabels([rangeResHi, rangeResLo], 3),
         )
 
     def maxRangeConstraints1(self, maxRangeLo, maxRangeHi, inc):
@@ -229,37 +234,35 @@ class Transform:
         if maxRangeLo + inc > maxRangeHi:
             maxRangeHi = maxRangeLo
 
-        templateObj.tiWidgetSliderMaxRange.labels = self.toLabels(
-            [
-                maxRangeLo,
-                maxRangeHi,
-            ]
+        return self.setSliderRange(
+            "maxRange",
+            maxRangeLo,
+            maxRangeHi,
+            inc,
+            self.toLabels([maxRangeLo, maxRangeHi], 2),
         )
-        self.setSliderRange(templateObj.tiWidgetSliderMaxRange, maxRangeLo, maxRangeHi)
-        templateObj.tiWidgetSliderMaxRange.increment = inc
 
     def maxRangeConstraints2(
         self, max_range_lo, max_range_hi, adc_samples_lo, max_num_adc_samples
     ):
         # for VR
-        # templateObj.ti_widget_slider_max_range.labels = self.toLabels([max_range_lo, max_range_hi]);
-        self.setSliderRange(
-            templateObj.ti_widget_slider_max_range, adc_samples_lo, max_num_adc_samples
+        return self.setSliderRange(
+            "maxRange",
+            adc_samples_lo,
+            max_num_adc_samples,
+            16,
+            self.toLabels(["min", "max"], 0),
         )
-        templateObj.ti_widget_slider_max_range.increment = 16
-        templateObj.ti_widget_slider_max_range.labels = self.toLabels(["min", "max"])
 
     def radialVelocityConstraints1(self, max_radial_vel_lo, max_radial_vel_hi, inc):
         # for RR, best range
-        templateObj.ti_widget_slider_max_radial_vel.labels = self.toLabels(
-            [max_radial_vel_lo, max_radial_vel_hi]
-        )
-        self.setSliderRange(
-            templateObj.ti_widget_slider_max_radial_vel,
+        return self.setSliderRange(
+            "maxRadialVelocity",
             max_radial_vel_lo,
             max_radial_vel_hi,
+            inc,
+            self.toLabels([max_radial_vel_lo, max_radial_vel_hi], 2),
         )
-        templateObj.ti_widget_slider_max_radial_vel.increment = inc
 
     def radialVelocityConstraints2(
         self, max_radial_vel_lo, max_radial_vel_hi, N_fft2d_lo, N_fft2d_hi
@@ -267,11 +270,13 @@ class Transform:
         # for VR
         lo = math.log2(N_fft2d_lo)
         hi = math.log2(N_fft2d_hi)
-        templateObj.ti_widget_slider_max_radial_vel.labels = self.toLabels(
-            [max_radial_vel_lo, max_radial_vel_hi]
+        return self.setSliderRange(
+            "maxRadialVelocity",
+            lo,
+            hi,
+            1,
+            self.toLabels([max_radial_vel_lo, max_radial_vel_hi], 2),
         )
-        self.setSliderRange(templateObj.ti_widget_slider_max_radial_vel, lo, hi)
-        templateObj.ti_widget_slider_max_radial_vel.increment = 1
 
     def velocityResolutionConstraints1(
         self,
@@ -284,56 +289,57 @@ class Transform:
         # for RR, best range
         radial_vel_res_values = []
         radial_vel_res_labels = []
-        tmp = max_number_of_chirps / Number_of_TX
+        tmp = int(max_number_of_chirps / Number_of_TX)
         while tmp >= N_fft2d_lo:
             radial_vel_res_values.append(tmp)
             radial_vel_res_labels.append(
                 self.toCeil(Maximum_radial_velocity / (tmp / 2), 2)
             )
             tmp = tmp >> 1
-        templateObj.ti_widget_droplist_radial_vel_resolution.disabled = False
-        templateObj.ti_widget_droplist_radial_vel_resolution.values = "|".join(
-            str(x) for x in radial_vel_res_values
-        )
-        templateObj.ti_widget_droplist_radial_vel_resolution.labels = "|".join(
-            str(x) for x in radial_vel_res_labels
-        )
 
         # hack
-        value = int(
-            templateObj.ti_widget_droplist_radial_vel_resolution.selectedValue, 10
-        )
-        if math.isnan(value) == True:
-            value = Doppler_FFT_size
-        idx = (
-            radial_vel_res_values.index(value) if value in radial_vel_res_values else -1
-        )
-        if idx >= 0:
-            if (
-                templateObj.ti_widget_droplist_radial_vel_resolution.selectedValue
-                != radial_vel_res_values[idx]
-            ):
-                templateObj.ti_widget_droplist_radial_vel_resolution.selectedValue = (
-                    radial_vel_res_values[idx]
-                )
-        else:
-            templateObj.ti_widget_droplist_radial_vel_resolution.selectedValue = (
-                radial_vel_res_values[0] if len(radial_vel_res_values) > 0 else None
-            )
+        droplist = self.sliders.get("radialVelocityResolution", {})
+        value = droplist.get("selectedValue")
+        if value is None:
+            value = int(Doppler_FFT_size)
+        if value not in radial_vel_res_values:
+            value = radial_vel_res_values[0] if radial_vel_res_values else None
+
+        droplist = {
+            "disabled": False,
+            "values": radial_vel_res_values,
+            "labels": radial_vel_res_labels,
+            "selectedValue": value,
+        }
+        self.sliders["radialVelocityResolution"] = droplist
+        return droplist
 
     def velocityResolutionConstraints2(self, radial_velocity_resolution):
         # for VR
-        templateObj.ti_widget_droplist_radial_vel_resolution.disabled = True
-        templateObj.ti_widget_droplist_radial_vel_resolution.labels = str(
-            radial_velocity_resolution
-        )
-        templateObj.ti_widget_droplist_radial_vel_resolution.selectedIndex = 0
+        droplist = {
+            "disabled": True,
+            "values": [],
+            "labels": [radial_velocity_resolution],
+            "selectedValue": None,
+        }
+        self.sliders["radialVelocityResolution"] = droplist
+        return droplist
 
     def updateInput(self, changes):
+        # The derived values are computed in stages, each only reads what the
+        # stages before it and the widgets set
         for k in changes:
             if k in self.Input:
                 self.Input[k] = changes[k]
 
+        self.updatePlatform()
+        self.updateAntennas()
+        self.updateRangeConstraints()
+        self.updateVelocityConstraints()
+        return self.sliders
+
+    def updatePlatform(self):
+        # Memory sizes and sampling limits of the device
         if self.Input["platform"] == "xWR14xx":
             self.Input["L3_Memory_size"] = 256
             self.Input["CFAR_memory_size"] = 32768  # Bytes
@@ -388,14 +394,16 @@ class Transform:
             self.Input["max_number_of_rx"] = 4
             self.Input["max_number_of_tx"] = 3
 
+    def updateAntennas(self):
+        # Antenna layout, chirp timing constants and link budget
         if self.Input["Azimuth_Resolution"] == "15 + Elevation":
-            if self.Input["platform"] == "Platform.xWR14xx":
+            if self.Input["platform"] == Platform.xWR14xx:
                 self.Input["Number_of_RX"] = 4
                 self.Input["Number_of_TX"] = 3
-            elif self.Input["platform"] == "Platform.xWR16xx":
+            elif self.Input["platform"] == Platform.xWR16xx:
                 self.Input["Number_of_RX"] = 4
                 self.Input["Number_of_TX"] = 2
-            elif self.Input["platform"] == "Platform.xWR18xx":
+            elif self.Input["platform"] == Platform.xWR18xx:
                 self.Input["Number_of_RX"] = 4
                 self.Input["Number_of_TX"] = 3
         elif self.Input["Azimuth_Resolution"] == "15":
@@ -419,7 +427,7 @@ class Transform:
         self.Input["Min_Allowable_Bandwidth"] = 0.5
         self.Input["Chirp_end_guard_time"] = 1
         if (
-            self.Input["platform"] == "Platform.xWR16xx"
+            self.Input["platform"] == Platform.xWR16xx
             and self.Input["sdkVersionUint16"] >= 0x0101
         ):
             self.Input["chirps_per_interrupt"] = 0
@@ -428,8 +436,6 @@ class Transform:
         self.Input["Chirp_Start_Time"] = 7
         self.Input["Min_Interchirp_dur"] = 7
         self.Input["Doppler_FFT_list"] = [16, 32, 64, 128, 256]
-        N_fft2d_lo = self.Input["Doppler_FFT_list"][0]
-        adc_samples_lo = 64
         self.Input["Max_Slope"] = 100
         self.Input["Maximum_range_list"] = [5, 10, 15, 20, 25, 30, 35, 40, 45, 50]
         self.Input["Gr"] = 8
@@ -469,8 +475,12 @@ class Transform:
         self.Input["Max_Allowable_Bandwidth"] = (
             4 if self.Input["Frequency_band"] == 77 else 1
         )  # GHz
+
+    def updateRangeConstraints(self):
+        # Chirp design, memory limits and the range widgets
+        N_fft2d_lo = self.Input["Doppler_FFT_list"][0]
+        adc_samples_lo = 64
         self.Input["Total_BW"] = None
-        tmp = self.isRR()
         if self.Input["subprofile_type"] == "best_range_res":
             if self.Input["Frequency_band"] == 77:
                 self.Input["Bandwidth"] = 4
@@ -480,9 +490,9 @@ class Transform:
             self.Input["min_Ramp_Slope"] = 20
             if self.Input["platform"] == Platform.xWR14xx:
                 self.Input["min_Ramp_Slope"] = 35  # max ADC samples is 256
-            if not self.Input["Ramp_Slope"]:
+            if not self.Input.get("Ramp_Slope"):
                 self.Input["Ramp_Slope"] = self.Input["min_Ramp_Slope"]  # preset
-            if not self.Input["Number_of_chirps"]:
+            if not self.Input.get("Number_of_chirps"):
                 self.Input["Number_of_chirps"] = 16  # preset
             self.Input["Max_Slope"] = min(
                 self.Input["Max_Slope"],
@@ -512,19 +522,20 @@ class Transform:
                 self.Input["Chirp_end_guard_time"],
             )
         elif self.Input["subprofile_type"] == "best_vel_res":
-            if not self.Input["Bandwidth"]:
+            if not self.Input.get("Bandwidth"):
                 self.Input["Bandwidth"] = 0.5  # preset
-            if not self.Input["Num_ADC_Samples"]:
+            if not self.Input.get("Num_ADC_Samples"):
                 self.Input["Num_ADC_Samples"] = adc_samples_lo
-            if not self.Input["Doppler_FFT_size"]:
+            if not self.Input.get("Doppler_FFT_size"):
                 self.Input["Doppler_FFT_size"] = N_fft2d_lo
             self.Input["Total_BW"] = self.Input["Bandwidth"] * 1000
         elif self.Input["subprofile_type"] == "best_range":
-            if not self.Input["Number_of_chirps"]:
+            if not self.Input.get("Number_of_chirps"):
                 self.Input["Number_of_chirps"] = 16  # preset
         self.Input["Frame_duration"] = round(1000 / self.Input["Frame_Rate"], 3)
+        # best_range leaves the bandwidth to the ramp slope, bound it by the band
         max_Ramp_Slope1 = int(
-            self.Input["Bandwidth"]
+            (self.Input.get("Bandwidth") or self.Input["Max_Allowable_Bandwidth"])
             * 1000
             / (
                 32 / self.Input["Max_Sampling_Rate"]
@@ -1038,12 +1049,15 @@ class Transform:
                 self.Input["max_num_adc_samples"],
             )
 
+    def updateVelocityConstraints(self):
+        # Detection range and the velocity widgets
+        N_fft2d_lo = self.Input["Doppler_FFT_list"][0]
         self.Input["Wavelength"] = (
             self.Input["lightSpeed"] / self.Input["Frequency_band"]
         )
 
         # self.Input['Range_Sensitivity'] = 5000
-        self.Input["RCS_des_max"] = self.Input["RCS_Rmax"]
+        self.Input["RCS_des_max"] = self.Input.get("RCS_Rmax")
         # self.Input['RCS_desired']
         max_range_exp_4 = self.Input["Maximum_range"] ** 4
         wavelength_exp_2 = self.Input["Wavelength"] ** 2
@@ -1165,12 +1179,10 @@ class Transform:
                 self.Input["Maximum_radial_velocity"],
                 self.Input["Doppler_FFT_size"],
             )  # RR, best range
-        valueN2d = int(
-            templateObj.ti_widget_droplist_radial_vel_resolution.selectedValue
-        )
-        if not math.isnan(valueN2d):
+        valueN2d = self.sliders.get("radialVelocityResolution", {}).get("selectedValue")
+        if valueN2d is not None:
             self.Input["N_fft2d"] = valueN2d
-        if self.Input["N_fft2d"]:
+        if self.Input.get("N_fft2d"):
             # RR, best range
             # radial velocity resolution derived values
             self.Input["Doppler_FFT_size"] = self.Input["N_fft2d"]
@@ -1344,8 +1356,8 @@ class Transform:
         chirpCfg["adcStartTime"] = 0
 
         if (
-            self.Input["platform"] == "Platform.xWR14xx"
-            or self.Input["platform"] == "Platform.xWR18xx"
+            self.Input["platform"] == Platform.xWR14xx
+            or self.Input["platform"] == Platform.xWR18xx
         ):
             if self.Input["Number_of_TX"] == 3:
                 chirpCfg["txEnable"] = 1
@@ -1353,7 +1365,7 @@ class Transform:
                 chirpCfg["txEnable"] = 1
             else:
                 chirpCfg["txEnable"] = 1
-        elif self.Input["platform"] == "Platform.xWR16xx":
+        elif self.Input["platform"] == Platform.xWR16xx:
             if self.Input["Number_of_TX"] == 2:
                 chirpCfg["txEnable"] = 1
             else:
@@ -1381,7 +1393,7 @@ class Transform:
                 chirpCfg["txEnable"] = 4
             else:
                 chirpCfg["txEnable"] = 0
-        elif self.Input["platform"] == "Platform.xWR16xx":
+        elif self.Input["platform"] == Platform.xWR16xx:
             if self.Input["Number_of_TX"] == 2:
                 chirpCfg["txEnable"] = 2
             else:
@@ -1407,7 +1419,21 @@ class Transform:
 
         for idx in range(len(self.P["chirpCfg"])):
             chirpCfg = self.P["chirpCfg"][idx]
-            self.P["lines"].append(" ")
+            self.P["lines"].append(
+                " ".join(
+                    [
+                        "chirpCfg",
+                        str(chirpCfg["startIdx"]),
+                        str(chirpCfg["endIdx"]),
+                        str(chirpCfg["profileId"]),
+                        str(chirpCfg["startFreq"]),
+                        str(chirpCfg["freqSlopeVar"]),
+                        str(chirpCfg["idleTime"]),
+                        str(chirpCfg["adcStartTime"]),
+                        str(chirpCfg["txEnable"]),
+                    ]
+                )
+            )
 
     def generate_frameCfg(self):
         self.P["frameCfg"]["chirpStartIdx"] = 0
@@ -1436,33 +1462,27 @@ class Transform:
 
     def generate_guiMonitorCfg(self):
         self.P["guiMonitor"]["detectedObjects"] = (
-            1 if templateObj.ti_widget_checkbox_scatter_plot.checked else 0
-        )
-        self.P["guiMonitor"]["logMagRange"] = (
-            1 if templateObj.ti_widget_checkbox_range_profile.checked else 0
-        )
-        self.P["guiMonitor"]["noiseProfile"] = (
-            1 if templateObj.ti_widget_checkbox_noise_profile.checked else 0
+            1 if self.options["scatterPlot"] else 0
         )
+        self.P["guiMonitor"]["logMagRange"] = 1 if self.options["rangeProfile"] else 0
+        self.P["guiMonitor"]["noiseProfile"] = 1 if self.options["noiseProfile"] else 0
         self.P["guiMonitor"]["rangeAzimuthHeatMap"] = (
-            1 if templateObj.ti_widget_checkbox_azimuth_heatmap.checked else 0
+            1 if self.options["azimuthHeatmap"] else 0
         )
         self.P["guiMonitor"]["rangeDopplerHeatMap"] = (
-            1 if templateObj.ti_widget_checkbox_doppler_heatmap.checked else 0
-        )
-        self.P["guiMonitor"]["statsInfo"] = (
-            1 if templateObj.ti_widget_checkbox_statistics.checked else 0
+            1 if self.options["dopplerHeatmap"] else 0
         )
+        self.P["guiMonitor"]["statsInfo"] = 1 if self.options["statistics"] else 0
         if (
             self.Input["platform"] in [Platform.xWR16xx, Platform.xWR18xx]
             and self.Input["sdkVersionUint16"] >= 0x0101
         ):
             self.P["lines"].append(
-                f'"guiMonitor -1" {self.P["guiMonitor"]["detectedObjects"]} {self.P["guiMonitor"]["logMagRange"]} {self.P["guiMonitor"]["noiseProfile"]} {self.P["guiMonitor"]["rangeAzimuthHeatMap"]} {self.P["guiMonitor"]["rangeDopplerHeatMap"]} {self.P["guiMonitor"]["statsInfo"]}'
+                f'guiMonitor -1 {self.P["guiMonitor"]["detectedObjects"]} {self.P["guiMonitor"]["logMagRange"]} {self.P["guiMonitor"]["noiseProfile"]} {self.P["guiMonitor"]["rangeAzimuthHeatMap"]} {self.P["guiMonitor"]["rangeDopplerHeatMap"]} {self.P["guiMonitor"]["statsInfo"]}'
             )
         else:
             self.P["lines"].append(
-                f'"guiMonitor" {self.P["guiMonitor"]["detectedObjects"]} {self.P["guiMonitor"]["logMagRange"]} {self.P["guiMonitor"]["noiseProfile"]} {self.P["guiMonitor"]["rangeAzimuthHeatMap"]} {self.P["guiMonitor"]["rangeDopplerHeatMap"]} {self.P["guiMonitor"]["statsInfo"]}'
+                f'guiMonitor {self.P["guiMonitor"]["detectedObjects"]} {self.P["guiMonitor"]["logMagRange"]} {self.P["guiMonitor"]["noiseProfile"]} {self.P["guiMonitor"]["rangeAzimuthHeatMap"]} {self.P["guiMonitor"]["rangeDopplerHeatMap"]} {self.P["guiMonitor"]["statsInfo"]}'
             )
 
     def generate_cfarCfg(self):
@@ -1577,12 +1597,8 @@ class Transform:
     def generate_peakGroupingCfg(self):
         peakGrouping = {}
         peakGrouping["groupingMode"] = 1
-        peakGrouping["rangeDimEn"] = (
-            1 if templateObj.ti_widget_checkbox_grouppeak_rangedir.checked else 0
-        )
-        peakGrouping["dopplerDimEn"] = (
-            1 if templateObj.ti_widget_checkbox_grouppeak_dopplerdir.checked else 0
-        )
+        peakGrouping["rangeDimEn"] = 1 if self.options["rangePeakGrouping"] else 0
+        peakGrouping["dopplerDimEn"] = 1 if self.options["dopplerPeakGrouping"] else 0
         peakGrouping["startRangeIdx"] = 1
         if (
             self.Input["platform"] == Platform.xWR16xx
@@ -1648,7 +1664,7 @@ class Transform:
     def generate_clutterCfg(self):
         if self.Input["sdkVersionUint16"] >= 0x0101:
             self.P["clutterRemoval"]["enabled"] = (
-                1 if templateObj.ti_widget_checkbox_clutter_removal.checked else 0
+                1 if self.options["clutterRemoval"] else 0
             )
             if (
                 self.Input["platform"] == Platform.xWR16xx
@@ -1867,7 +1883,32 @@ class Transform:
                 f"analogMonitor {analogMon['rxSatMonEn']} {analogMon['sigImgMonEn']}"
             )
 
-    def generateCfg(self):
+    def generateCfg(
+        self,
+        rangePeakGrouping=True,
+        dopplerPeakGrouping=True,
+        clutterRemoval=False,
+        plots=None,
+    ):
+        # plots overrides the guiMonitor checkboxes in self.options by name,
+        # the flags and overrides only hold for this call
+        options = self.options
+        self.options = {
+            **options,
+            "rangePeakGrouping": rangePeakGrouping,
+            "dopplerPeakGrouping": dopplerPeakGrouping,
+            "clutterRemoval": clutterRemoval,
+            **(plots or {}),
+        }
+        try:
+            return self.generateLines()
+        finally:
+            self.options = options
+
+    def generateLines(self):
+        # Every call produces a complete configuration of its own
+        self.P["lines"] = []
+        self.P["chirpCfg"] = []
         self.P["lines"].append(
             "% ***************************************************************"
         )
@@ -1905,13 +1946,13 @@ class Transform:
                 f"% Doppler Detection Threshold (dB):{self.Input['Doppler_Sensitivity']}"
             )
         self.P["lines"].append(
-            f"% Range Peak Grouping:{'enabled' if templateObj.ti_widget_checkbox_grouppeak_rangedir.checked else 'disabled'}"
+            f"% Range Peak Grouping:{'enabled' if self.options['rangePeakGrouping'] else 'disabled'}"
         )
         self.P["lines"].append(
-            f"% Doppler Peak Grouping:{'enabled' if templateObj.ti_widget_checkbox_grouppeak_dopplerdir.checked else 'disabled'}"
+            f"% Doppler Peak Grouping:{'enabled' if self.options['dopplerPeakGrouping'] else 'disabled'}"
         )
         self.P["lines"].append(
-            f"% Static clutter removal:{'enabled' if templateObj.ti_widget_checkbox_clutter_removal.checked else 'disabled'}"
+            f"% Static clutter removal:{'enabled' if self.options['clutterRemoval'] else 'disabled'}"
         )
         self.P["lines"].append(
             "% ***************************************************************"
@@ -1944,3 +1985,59 @@ class Transform:
         self.generate_CQSigImg()
         self.generate_analogMon()
         self.P["lines"].append("sensorStart")
+        return self.P["lines"]
+
+
+# ------------------------------------------------------------------
+
+# Widgets of the dashboard and the Input key each one sets
+DRAG_SLIDERS = {
+    "maxRange": "Maximum_range",
+    "maxRadialVelocity": "Maximum_radial_velocity",
+}
+
+
+def benchmarkSliderDrag(preset="setDefaultRangeResConfig", passes=3, steps=50):
+    # updateInput latencies in us, one list per pass, while the frame rate and
+    # every slider of a preset are dragged from one end to the other and back
+    transform = Transform()
+    getattr(transform, preset)()
+    transform.updateInput({})
+    drags = [("Frame_Rate", [float(v) for v in range(1, 31)])]
+    for name, key in DRAG_SLIDERS.items():
+        slider = transform.sliders.get(name)
+        if slider:
+            lo, hi = slider["minValue"], slider["maxValue"]
+            drags.append(
+                (key, [round(lo + (hi - lo) * i / steps, 2) for i in range(steps + 1)])
+            )
+
+    passLatencies = []
+    for _ in range(passes):
+        latencies = []
+        for key, values in drags:
+            start = transform.Input[key]
+            for value in values + values[::-1] + [start]:
+                t0 = time.perf_counter()
+                transform.updateInput({key: value})
+                latencies.append((time.perf_counter() - t0) * 1e6)
+        passLatencies.append(latencies)
+    return passLatencies
+
+
+def formatLatencies(latencies):
+    latencies = sorted(latencies)
+    return (
+        f"median {statistics.median(latencies):4.0f} us, "
+        f"p95 {latencies[int(0.95 * len(latencies))]:5.0f} us"
+    )
+
+
+if __name__ == "__main__":
+    for preset in (
+        "setDefaultRangeResConfig",
+        "setDefaultVelResConfig",
+        "setDefaultRangeConfig",
+    ):
+        passLatencies = benchmarkSliderDrag(preset)
+        print(f"{preset:<26} {formatLatencies(sum(passLatencies, []))}")
@@ -0,0 +1,165 @@
+import os
+import time
+
+# Histogram buckets are powers of two of ns, from about 1 us to about 8.6 s. The
+# bucket of a span is then the bit length of its duration, no search needed.
+MIN_BUCKET_BITS = 10
+MAX_BUCKET_BITS = 33
+BUCKET_BOUNDS_NS = [2**bits for bits in range(MIN_BUCKET_BITS, MAX_BUCKET_BITS + 1)]
+
+QUANTILES = (0.5, 0.9, 0.99)
+METRIC_PREFIX = "mmwave"
+
+
+class Histogram:
+    def __init__(self):
+        # counts[i] holds the spans of at most BUCKET_BOUNDS_NS[i] ns, the last
+        # slot everything above
+        self.counts = [0] * (len(BUCKET_BOUNDS_NS) + 1)
+        self.count = 0
+        self.sumNs = 0
+
+    def observe(self, ns):
+        bucket = ns.bit_length() - MIN_BUCKET_BITS
+        if (ns & (ns - 1)) == 0:
+            # A power of two sits on the bound of the bucket below
+            bucket -= 1
+        self.counts[min(max(bucket, 0), len(BUCKET_BOUNDS_NS))] += 1
+        self.count += 1
+        self.sumNs += ns
+
+    def quantile(self, q):
+        # Linear within the bucket that holds the q-th span, as Prometheus
+        # histogram_quantile does
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for i, n in enumerate(self.counts):
+            if n and seen + n >= rank:
+                if i == len(BUCKET_BOUNDS_NS):
+                    return float(BUCKET_BOUNDS_NS[-1])
+                lower = BUCKET_BOUNDS_NS[i - 1] if i else 0
+                return lower + (BUCKET_BOUNDS_NS[i] - lower) * (rank - seen) / n
+            seen += n
+        return float(BUCKET_BOUNDS_NS[-1])
+
+
+class StageTimer:
+    def __init__(self, path, interval=10.0):
+        # Times the stages of the collector as consecutive laps on
+        # perf_counter_ns and writes them to path in Prometheus text format
+        # every interval seconds. Collectors keep None instead of a timer when
+        # timing is off, each stage then costs a single test.
+        self.path = path
+        self.interval = interval
+        self.histograms = {}
+        self.gauges = {}
+        self.counters = {}
+        self.lastNs = time.perf_counter_ns()
+        self.startNs = self.lastNs
+        self.pending = []
+        # Polls that did not complete a packet, their laps are not kept
+        self.idlePolls = 0
+        self.nextDump = time.monotonic() + interval
+
+    def start(self):
+        self.lastNs = self.startNs = time.perf_counter_ns()
+        self.pending = []
+
+    def lap(self, stage, pending=False):
+        # Time since the previous lap, or since start, goes to stage. A pending
+        # lap waits for commit, for the stages that run on every poll of the
+        # port but only matter on the polls that complete a packet.
+        now = time.perf_counter_ns()
+        if pending:
+            self.pending.append((stage, now - self.lastNs))
+        else:
+            self.observe(stage, now - self.lastNs)
+        self.lastNs = now
+
+    def commit(self, keep=True):
+        # The pending laps go to their stages, or count as one idle poll
+        if keep:
+            for stage, ns in self.pending:
+                self.observe(stage, ns)
+        else:
+            self.idlePolls += 1
+        self.pending = []
+
+    def finish(self, stage="frame"):
+        # Whole span since start, for the stages that make up one frame
+        now = time.perf_counter_ns()
+        self.observe(stage, now - self.startNs)
+        self.lastNs = now
+
+    def observe(self, stage, ns):
+        histogram = self.histograms.get(stage)
+        if histogram is None:
+            histogram = self.histograms[stage] = Histogram()
+        histogram.observe(ns)
+
+    def gauge(self, name, value, **labels):
+        self.gauges[name, tuple(sorted(labels.items()))] = value
+
+    def counter(self, name, value, **labels):
+        # Running totals kept elsewhere, exported as they are
+        self.counters[name, tuple(sorted(labels.items()))] = value
+
+    def text(self):
+        name = f"{METRIC_PREFIX}_stage_seconds"
+        lines = [
+            f"# HELP {name} Time spent per collector stage.",
+            f"# TYPE {name} histogram",
+        ]
+        for stage, histogram in sorted(self.histograms.items()):
+            cumulative = 0
+            for bound, n in zip(BUCKET_BOUNDS_NS, histogram.counts):
+                cumulative += n
+                lines.append(
+                    f'{name}_bucket{{stage="{stage}",le="{bound / 1e9:.9g}"}} {cumulative}'
+                )
+            lines.append(
+                f'{name}_bucket{{stage="{stage}",le="+Inf"}} {histogram.count}'
+            )
+            lines.append(f'{name}_sum{{stage="{stage}"}} {histogram.sumNs / 1e9:.9g}')
+            lines.append(f'{name}_count{{stage="{stage}"}} {histogram.count}')
+
+        # The quantiles estimated from the buckets, for reading the file as is
+        name = f"{METRIC_PREFIX}_stage_quantile_seconds"
+        lines += [
+            f"# HELP {name} Stage time quantiles estimated from the histogram.",
+            f"# TYPE {name} gauge",
+        ]
+        for stage, histogram in sorted(self.histograms.items()):
+            for q in QUANTILES:
+                lines.append(
+                    f'{name}{{stage="{stage}",quantile="{q}"}} '
+                    f"{histogram.quantile(q) / 1e9:.9g}"
+                )
+
+        for kind, values in (("counter", self.counters), ("gauge", self.gauges)):
+            typed = None
+            for (key, labels), value in sorted(values.items()):
+                name = f"{METRIC_PREFIX}_{key}"
+                if name != typed:
+                    lines.append(f"# TYPE {name} {kind}")
+                    typed = name
+                if labels:
+                    name += "{" + ",".join(f'{k}="{v}"' for k, v in labels) + "}"
+                lines.append(f"{name} {value}")
+        return "\n".join(lines) + "\n"
+
+    def dump(self):
+        # Renamed into place, a scraper never reads half a file
+        with open(self.path + ".tmp", "w") as f:
+            f.write(self.text())
+        os.replace(self.path + ".tmp", self.path)
+        self.nextDump = time.monotonic() + self.interval
+
+    def summary(self):
+        return "\n".join(
+            f"{stage:>20}: p50 {h.quantile(0.5) / 1e3:9.1f} us, "
+            f"p99 {h.quantile(0.99) / 1e3:9.1f} us, {h.count} spans"
+            for stage, h in sorted(self.histograms.items())
+        )
@@ -1,44 +1,100 @@
 import argparse
+import contextlib
 import csv
-import math
 import os
 import time
-from inspect import trace
-from operator import add
-from time import sleep
-from turtle import pd
 
-import matplotlib.pyplot as plt
 import numpy as np
 import serial
-from dotenv import load_dotenv
 
-import fft
-
-load_dotenv(".env")
+from cli import CliError, formatLatencies, switchConfig, uploadConfig
+from clock import ClockModel, ReadStamps, SessionClock, sessionPath
+from config import loadConfig
+from continuity import LOSS_RECONNECT, FrameTracker
+from devicestats import DeviceStats
+from metrics import StageTimer
+from planner import TLV_NAMES, UART_BYTES_PER_SECOND, formatPlan, planFile
+from ports import SENSOR_MAP, findPorts
+from profiling import PROFILE_DIR, PROFILE_MODES, TRACEMALLOC_INTERVAL, ProfilingHooks
+from scheduler import ActivityScheduler
+from shedding import TlvShedder
+from supervisor import PortSupervisor
+from tlv import (
+    MMWDEMO_OUTPUT_MSG_AZIMUT_STATIC_HEAT_MAP,
+    MMWDEMO_OUTPUT_MSG_DETECTED_POINTS_SIDE_INFO,
+    MMWDEMO_OUTPUT_MSG_NOISE_PROFILE,
+    MMWDEMO_OUTPUT_MSG_RANGE_DOPPLER_HEAT_MAP,
+    MMWDEMO_OUTPUT_MSG_STATS,
+    MMWDEMO_UART_MSG_DETECTED_POINTS,
+    MMWDEMO_UART_MSG_RANGE_PROFILE,
+    TLV_HEADER,
+    HeaderDecoder,
+    processAzimuthHeatMap,
+    processDetectedPoints,
+    processDetectedPointsV3,
+    processRangeDopplerHeatMap,
+    processRangeNoiseProfile,
+    processStatistics,
+    sdkMajorVersion,
+)
+
+# The collector runs headless and restarts often, it imports nothing beyond
+# numpy, pyserial and the parser. python-dotenv is only needed when OS is not
+# already set in the environment.
+if "OS" not in os.environ and os.path.exists(".env"):
+    from dotenv import load_dotenv
+
+    load_dotenv(".env")
 os_name = os.environ.get("OS")
-framePeriodicity = 0
 configs = {
     "pointcloud": "Configurations/pointcloud_configuration.cfg",
     "macro": "Configurations/macro_7fps.cfg",
     "micro": "Configurations/micro_2fps.cfg",
 }
 configFileName = configs["pointcloud"]
+# Sensor ID of the mapping, set when one collector runs per sensor
+sensorId = None
+sensorMapPath = SENSOR_MAP
+# (cli, data) port names given on the command line instead of discovery
+portNames = None
 # CLIport = {}
 # Dataport = {}
 byteBuffer = np.zeros(2**15, dtype="uint8")
 byteBufferLength = 0
-rangeAzimuthHeatMapGridInit = 0
-xlin, ylin = [], []
-NUM_ANGLE_BINS = 64
-range_depth = 10
-range_width = 5
 changes_happening = 0
 change_conf = False
+droppedBytes = 0
+# Bytes thrown away while looking for the next magic word
+skippedBytes = 0
+tlvShedder = None
+scheduler = None
+scheduledConf = None
+headerDecoder = HeaderDecoder()
+# Arrival times are monotonic ns, the anchor turns them into dates at export
+sessionClock = SessionClock()
+readStamps = ReadStamps()
+# Device cycle counter mapped onto the arrival clock
+clockModel = ClockModel()
+frameTracker = FrameTracker()
+# Rolling view of the statistics TLV, with alarms when the radar overruns
+deviceStats = DeviceStats()
+# Reopens the ports when the radar's USB link resets
+portSupervisor = PortSupervisor()
+# Per-stage timing, None unless --metrics is given
+stageTimer = None
 
 header = [
-    "Date",
-    "Time",
+    "arrivalNs",
+    "acquisitionNs",
+    "latencyNs",
+    "clockJitterNs",
+    "clockDriftPpm",
+    "frameNumber",
+    "frameEvent",
+    "lostPackets",
+    "lossCause",
+    "lossStartNs",
+    "subFrameNumber",
     "numObj",
     "rangeIdx",
     "range",
@@ -48,6 +104,8 @@ header = [
     "x",
     "y",
     "z",
+    "snr",
+    "noise",
     "rp",
     "noiserp",
     "zi",
@@ -69,9 +127,13 @@ def file_create():
         filename += time.strftime("\%Y%m%d_%H%M%S")
     elif os_name == "Ubuntu":
         filename += time.strftime("/%Y%m%d_%H%M%S")
+    # Collectors of several sensors start in the same second
+    if sensorId is not None:
+        filename += f"_{sensorId}"
     filename += ".csv"
     with open(filename, "w") as f:
         csv.DictWriter(f, fieldnames=header).writeheader()
+    sessionClock.save(sessionPath(filename))
 
     return filename
 
@@ -79,6 +141,29 @@ def file_create():
 # ------------------------------------------------------------------
 
 
+# Function to find the ports of the sensor, they can come back under other
+# names after the USB link resets
+def resolvePorts():
+    if portNames:
+        return portNames
+    return findPorts(sensorId, sensorMapPath)
+
+
+# Function to open the serial ports and send the configuration lines to the
+# radar, nothing is left open if either fails
+def connectPorts(lines):
+    cliPortName, dataPortName = resolvePorts()
+    with contextlib.ExitStack() as stack:
+        cliPort = stack.enter_context(serial.Serial(cliPortName, 115200))
+        dataPort = stack.enter_context(serial.Serial(dataPortName, 921600))
+        # Every command waits for the radar's acknowledgement and a failing
+        # one stops the upload
+        print(f"CLI port {cliPortName}, data port {dataPortName}")
+        print(formatLatencies(uploadConfig(cliPort, lines)))
+        stack.pop_all()
+    return cliPort, dataPort
+
+
 # Function to configure the serial ports and send the data from
 # the configuration file to the radar
 def serialConfig(configFileName):
@@ -87,397 +172,184 @@ def serialConfig(configFileName):
 
     CLIport = ""
     Dataport = ""
-    # Open the serial ports for the configuration and the data ports
 
-    # Raspberry pi
-    if os_name == "Ubuntu":
-        CLIport = serial.Serial("/dev/ttyACM0", 115200)
-        Dataport = serial.Serial("/dev/ttyACM1", 921600)
+    # Warn before anything is sent if the board cannot deliver every frame
+    configPlan = planFile(configFileName)
+    if not configPlan.feasible:
+        print(formatPlan(configPlan))
 
-    elif os_name == "Windows_NT":
-        CLIport = serial.Serial("COM3", 115200)
-        Dataport = serial.Serial("COM4", 921600)
-
-    # Read the configuration file and send it to the board
-    config = [line.rstrip("\r\n") for line in open(configFileName)]
-    for i in config:
-        print(i)
-        # CLIport.write((i + "\n").encode())
-        time.sleep(0.01)
+    # Open the serial ports for the configuration and the data ports, at
+    # boot the radar may still be enumerating
+    lines = loadConfig(configFileName).lines
+    CLIport, Dataport = portSupervisor.connect(lambda: connectPorts(lines))
 
     return CLIport, Dataport
 
 
-# ------------------------------------------------------------------
-
-
-# Function to parse the data inside the configuration file
-def parseConfigFile(configFileName):
-    global framePeriodicity
-    configParameters = (
-        {}
-    )  # Initialize an empty dictionary to store the configuration parameters
-
-    # Read the configuration file and send it to the board
-    config = [line.rstrip("\r\n") for line in open(configFileName)]
-    for i in config:
-        # Split the line
-        splitWords = i.split(" ")
-
-        # Hard code the number of antennas, change if other configuration is used
-        numRxAnt = 4
-        numTxAnt = 2
-
-        # Get the information about the profile configuration
-        if "profileCfg" in splitWords[0]:
-            startFreq = int(float(splitWords[2]))
-            idleTime = int(splitWords[3])
-            rampEndTime = float(splitWords[5])
-            freqSlopeConst = float(splitWords[8])
-            numAdcSamples = int(splitWords[10])
-            numAdcSamplesRoundTo2 = 1
-
-            while numAdcSamples > numAdcSamplesRoundTo2:
-                numAdcSamplesRoundTo2 = numAdcSamplesRoundTo2 * 2
-
-            digOutSampleRate = int(splitWords[11])
-
-        # Get the information about the frame configuration
-        elif "frameCfg" in splitWords[0]:
-            chirpStartIdx = int(splitWords[1])
-            chirpEndIdx = int(splitWords[2])
-            numLoops = int(splitWords[3])
-            numFrames = int(splitWords[4])
-            framePeriodicity = int(float(splitWords[5]))
-
-    # Combine the read data to obtain the configuration parameters
-    numChirpsPerFrame = (chirpEndIdx - chirpStartIdx + 1) * numLoops
-    configParameters["numDopplerBins"] = numChirpsPerFrame / numTxAnt
-    configParameters["numRangeBins"] = numAdcSamplesRoundTo2
-    configParameters["rangeResolutionMeters"] = (3e8 * digOutSampleRate * 1e3) / (
-        2 * freqSlopeConst * 1e12 * numAdcSamples
-    )
-    configParameters["rangeIdxToMeters"] = (3e8 * digOutSampleRate * 1e3) / (
-        2 * freqSlopeConst * 1e12 * configParameters["numRangeBins"]
-    )
-    configParameters["dopplerResolutionMps"] = 3e8 / (
-        2
-        * startFreq
-        * 1e9
-        * (idleTime + rampEndTime)
-        * 1e-6
-        * configParameters["numDopplerBins"]
-        * numTxAnt
-    )
-    configParameters["maxRange"] = (300 * 0.9 * digOutSampleRate) / (
-        2 * freqSlopeConst * 1e3
+# Function to bring the radar back after its ports failed: they are reopened
+# once the probe is enumerated again and the running configuration is sent
+# again, the packets go on to the same csv with the outage marked as a gap
+def reconnect(error):
+    global CLIport, Dataport, byteBufferLength, tlvShedder, changes_happening
+    print(f"######## ports lost: {error} ########")
+    for port in (CLIport, Dataport):
+        try:
+            port.close()
+        except (serial.SerialException, OSError):
+            pass
+    frameTracker.interrupt(
+        LOSS_RECONNECT, radarConfig.framePeriodicity * 1e6 / len(radarConfig.subFrames)
     )
-    configParameters["maxVelocity"] = 3e8 / (
-        4 * startFreq * 1e9 * (idleTime + rampEndTime) * 1e-6 * numTxAnt
+    CLIport, Dataport = portSupervisor.reconnect(
+        lambda: connectPorts(radarConfig.lines)
     )
 
-    return configParameters
-
-
-# ------------------------------------------------------------------
-
-# Helper methods for processing
-
-
-def tensor_f(vec1, vec2):
-    t = []
-    for r in range(0, len(vec1)):
-        t.append(np.multiply(np.array(vec2), vec1[r]))
-    return t
-
-
-def meshgrid(xvec, yvec):
-    x = []
-    y = []
-    for r in range(0, len(yvec)):
-        for c in range(0, len(xvec)):
-            x.append(xvec[c])
-            y.append(yvec[r])
-    return [x, y]
-
-
-def reshape_rowbased(vec, rows, cols):
-    t = []
-    start = 0
-    for r in range(0, rows):
-        row = vec[start : start + cols]
-        t.append(row)
-        start += cols
-    return t
-
-
-def change_conf_callback():
-    global CLIport, Dataport, configParameters, configFileName, byteBuffer, byteBufferLength
-    byteBuffer = np.zeros(2**15, dtype="uint8")
+    # Nothing in the buffer belongs to the new stream, and the full
+    # configuration brought back every TLV that was shed
+    byteBuffer[:byteBufferLength] = 0
     byteBufferLength = 0
+    readStamps.clear()
+    tlvShedder = TlvShedder(radarConfig)
+    deviceStats.clear()
+    changes_happening += 1
     print(
-        "############################ changing configuration to macro ##########################"
+        f"######## ports back after {portSupervisor.lastDowntimeNs / 1e9:.3f} s ########"
     )
-    time.sleep(2)
-    configFileName = "Configurations/macro_7fps.cfg"
-    CLIport, Dataport = serialConfig(configFileName)
-    configParameters = parseConfigFile(configFileName)
-
-
-def processDetectedPoints(byteBuffer, idX, configParameters):
-    global configFileName
-
-    # word array to convert 4 bytes to a 16-bit number
-    word = [1, 2**8]
-    tlv_numObj = np.matmul(byteBuffer[idX : idX + 2], word)
-    idX += 2
-    tlv_xyzQFormat = 2 ** np.matmul(byteBuffer[idX : idX + 2], word)
-    idX += 2
-
-    # Initialize the arrays
-    rangeIdx = np.zeros(tlv_numObj, dtype="int16")
-    dopplerIdx = np.zeros(tlv_numObj, dtype="int16")
-    peakVal = np.zeros(tlv_numObj, dtype="int16")
-    x = np.zeros(tlv_numObj, dtype="int16")
-    y = np.zeros(tlv_numObj, dtype="int16")
-    z = np.zeros(tlv_numObj, dtype="int16")
-
-    for objectNum in range(tlv_numObj):
-        # Read the data for each object
-        rangeIdx[objectNum] = np.matmul(byteBuffer[idX : idX + 2], word)
-        idX += 2
-        dopplerIdx[objectNum] = np.matmul(byteBuffer[idX : idX + 2], word)
-        idX += 2
-        peakVal[objectNum] = np.matmul(byteBuffer[idX : idX + 2], word)
-        idX += 2
-        x[objectNum] = np.matmul(byteBuffer[idX : idX + 2], word)
-        idX += 2
-        y[objectNum] = np.matmul(byteBuffer[idX : idX + 2], word)
-        idX += 2
-        z[objectNum] = np.matmul(byteBuffer[idX : idX + 2], word)
-        idX += 2
-
-    # Make the necessary corrections and calculate the rest of the data
-    rangeVal = rangeIdx * configParameters["rangeIdxToMeters"]
-    dopplerIdx[dopplerIdx > (configParameters["numDopplerBins"] / 2 - 1)] = (
-        dopplerIdx[dopplerIdx > (configParameters["numDopplerBins"] / 2 - 1)] - 65535
-    )
-    dopplerVal = dopplerIdx * configParameters["dopplerResolutionMps"]
-    x = x / tlv_xyzQFormat
-    y = y / tlv_xyzQFormat
-    z = z / tlv_xyzQFormat
-
-    # Store the data in the detObj dictionary
-    detObj = {
-        "numObj": tlv_numObj,
-        "rangeIdx": list(rangeIdx),
-        "range": list(rangeVal),
-        "dopplerIdx": list(dopplerIdx),
-        "doppler": list(dopplerVal),
-        "peakVal": list(peakVal),
-        "x": list(x),
-        "y": list(y),
-        "z": list(z),
-    }
-    return detObj
-
-
-def processRangeNoiseProfile(byteBuffer, idX, detObj, configParameters, isRangeProfile):
-    traceidX = 0
-    if isRangeProfile:
-        traceidX = 0
-    else:
-        traceidX = 2
-    numrp = 2 * configParameters["numRangeBins"]
-    rp = byteBuffer[idX : idX + numrp]
-
-    rp = list(map(add, rp[0:numrp:2], list(map(lambda x: 256 * x, rp[1:numrp:2]))))
-    rp_x = (
-        np.array(range(configParameters["numRangeBins"]))
-        * configParameters["rangeIdxToMeters"]
-    )
-    idX += numrp
-    if traceidX == 0:
-        noiseObj = {"rp": rp}
-        return noiseObj
-    elif traceidX == 2:
-        noiseObj = {"noiserp": rp}
-        return noiseObj
-
-
-def processAzimuthHeatMap(byteBuffer, idX, configParameters):
-    numTxAnt = 2
-    numRxAnt = 4
-    numBytes = numRxAnt * numTxAnt * configParameters["numRangeBins"] * 4
-    q = byteBuffer[idX : idX + numBytes]
-    idX += numBytes
-    q_rows = numTxAnt * numRxAnt
-    q_cols = configParameters["numRangeBins"]
-    q_idx = 0
-    QQ = []
-    NUM_ANGLE_BINS = 64
-    for i in range(0, q_cols):
-        real = np.zeros(NUM_ANGLE_BINS)
-        img = np.zeros(NUM_ANGLE_BINS)
-        for j in range(0, q_rows):
-            real[j] = q[q_idx + 1] * 256 + q[q_idx]
-            if real[j] > 32767:
-                real[j] = real[j] - 65536
-            img[j] = q[q_idx + 3] * 256 + q[q_idx + 2]
-            if img[j] > 32767:
-                img[j] = img[j] - 65536
-            q_idx = q_idx + 4
-        fft.transform(real, img)
-        for ri in range(0, NUM_ANGLE_BINS):
-            real[ri] = int(math.sqrt(real[ri] * real[ri] + img[ri] * img[ri]))
-
-        QQ.append(
-            [
-                y
-                for x in [
-                    real[int(NUM_ANGLE_BINS / 2) :],
-                    real[0 : int(NUM_ANGLE_BINS / 2)],
-                ]
-                for y in x
-            ]
-        )
-    fliplrQQ = []
-    for tmpr in range(0, len(QQ)):
-        fliplrQQ.append(QQ[tmpr][1:].reverse())
-    global rangeAzimuthHeatMapGridInit
-    if rangeAzimuthHeatMapGridInit == 0:
-        angles_rad = np.multiply(
-            np.arange(-NUM_ANGLE_BINS / 2 + 1, NUM_ANGLE_BINS / 2, 1),
-            2 / NUM_ANGLE_BINS,
-        )
-        theta = []
-        for ang in angles_rad:
-            theta.append(math.asin(ang))
-        range_val = np.multiply(
-            np.arange(0, configParameters["numRangeBins"], 1),
-            configParameters["rangeIdxToMeters"],
-        )
-        sin_theta = []
-        cos_theta = []
-        for t in theta:
-            sin_theta.append(math.sin(t))
-            cos_theta.append(math.cos(t))
-        posX = tensor_f(range_val, sin_theta)
-        posY = tensor_f(range_val, cos_theta)
-
-        global xlin, ylin
-        xlin = np.arange(-range_width, range_width, 2 * range_width / 99)
-        if len(xlin) < 100:
-            xlin = np.append(xlin, range_width)
-        ylin = np.arange(0, range_depth, 1.0 * range_depth / 99)
-        if len(ylin) < 100:
-            ylin = np.append(ylin, range_depth)
-
-        xiyi = meshgrid(xlin, ylin)
-        rangeAzimuthHeatMapGridInit = 1
-
-    zi = fliplrQQ
-    zi = reshape_rowbased(zi, len(ylin), len(xlin))
-    heatObj = {"zi": zi}
-    return heatObj
-
-
-def processRangeDopplerHeatMap(byteBuffer, idX):
-    # Get the number of bytes to read
-    numBytes = (
-        int(configParameters["numDopplerBins"])
-        * int(configParameters["numRangeBins"])
-        * 2
-    )
-    # Convert the raw data to int16 array
-    payload = byteBuffer[idX : idX + numBytes]
-    idX += numBytes
-    # rangeDoppler = math.add(
-    #     math.subset(rangeDoppler, math.index(math.range(0, numBytes, 2))),
-    #     math.multiply(math.subset(rangeDoppler, math.index(math.range(1, numBytes, 2))), 256)
-    # );
-
-    rangeDoppler = list(
-        map(
-            add,
-            payload[0:numBytes:2],
-            list(map(lambda x: 256 * x, payload[1:numBytes:2])),
+
+
+# Function to send CLI commands to the radar while it is running
+def sendCliCommands(commands):
+    print(formatLatencies(uploadConfig(CLIport, commands)))
+
+
+# Function to read the bytes waiting on a port. pyserial reports a vanished
+# device as a bare OSError there, it is raised as the SerialException the
+# main loop reconnects on, while errors of the csv and metrics files are not.
+def bytesWaiting(port):
+    try:
+        return port.in_waiting
+    except serial.SerialException:
+        raise
+    except OSError as e:
+        raise serial.SerialException(f"in_waiting failed: {e}") from e
+
+
+# Function to shed the heaviest TLVs when the parser falls behind the UART,
+# and to restore them once there is headroom again
+def shedTlvs(Dataport):
+    global changes_happening
+    backlogBytes = byteBufferLength + bytesWaiting(Dataport)
+    shedCommands = tlvShedder.update(backlogBytes, droppedBytes)
+    if shedCommands:
+        print(
+            f"######## {backlogBytes} bytes behind, shedding TLVs {tlvShedder.shedTlvs()} ########"
         )
-    )  # wrong implementation. Need to update the range doppler at range index
-
-    # rangeDoppler = payload.view(dtype=np.int16)
-    # Some frames have strange values, skip those frames
-    # TO DO: Find why those strange frames happen
-    # if np.max(rangeDoppler) > 10000:
-    #     return 0
-
-    # Convert the range doppler array to a matrix
-    rangeDoppler = np.reshape(
-        rangeDoppler,
-        (int(configParameters["numDopplerBins"]), configParameters["numRangeBins"]),
-        "F",
-    )  # Fortran-like reshape
-    rangeDoppler = np.append(
-        rangeDoppler[int(len(rangeDoppler) / 2) :],
-        rangeDoppler[: int(len(rangeDoppler) / 2)],
-        axis=0,
-    )
+        try:
+            sendCliCommands(shedCommands)
+        except CliError as e:
+            # The shedder goes back to the level the radar still runs, which
+            # is restarted with its guiMonitor lines, the ports are reopened
+            # when even those are rejected
+            print(e)
+            tlvShedder.rollback()
+            try:
+                sendCliCommands(tlvShedder.commands())
+            except CliError as e:
+                reconnect(e)
+                return
+        frameTracker.restart()
+        changes_happening += 1
+
+
+# Function to drop the bytes in flight and in the buffer, the parser then
+# resynchronises on the next magic word
+def flushStream():
+    global byteBufferLength
+    Dataport.reset_input_buffer()
+    byteBuffer[:byteBufferLength] = 0
+    byteBufferLength = 0
+    readStamps.clear()
 
-    dopplerM = []
-    rangeDoppler_list = list(rangeDoppler)
-    for e in rangeDoppler_list:
-        dopplerM.append(list(e))
 
-    #
-    # # Generate the range and doppler arrays for the plot
-    rangeArray = (
-        np.array(range(configParameters["numRangeBins"]))
-        * configParameters["rangeIdxToMeters"]
+# Function to switch the running radar to another configuration without
+# reopening the serial ports, only the CLI lines that differ are sent
+def change_conf_callback(configName="macro"):
+    global radarConfig, configFileName, headerDecoder, tlvShedder
+    global change_conf, changes_happening
+    print(
+        f"############################ changing configuration to {configName} ##########################"
     )
-    dopplerArray = np.multiply(
-        np.arange(
-            -configParameters["numDopplerBins"] / 2,
-            configParameters["numDopplerBins"] / 2,
-        ),
-        configParameters["dopplerResolutionMps"],
-    )  # This is dopplermps from js.
-    dopplerObj = {
-        "rangeDoppler": dopplerM,
-        "rangeArray": list(rangeArray),
-        "dopplerArray": list(dopplerArray),
-    }
-    return dopplerObj
-
-
-def processStatistics(byteBuffer, idX):
-    word = [1, 2**8, 2**16, 2**24]
-    interFrameProcessingTime = np.matmul(byteBuffer[idX : idX + 4], word)
-    idX += 4
-    transmitOutputTime = np.matmul(byteBuffer[idX : idX + 4], word)
-    idX += 4
-    interFrameProcessingMargin = np.matmul(byteBuffer[idX : idX + 4], word)
-    idX += 4
-    interChirpProcessingMargin = np.matmul(byteBuffer[idX : idX + 4], word)
-    idX += 4
-    activeFrameCPULoad = np.matmul(byteBuffer[idX : idX + 4], word)
-    idX += 4
-
-    interFrameCPULoad = np.matmul(byteBuffer[idX : idX + 4], word)
-    idX += 4
-
-    statisticsObj = {
-        "interFrameProcessingTime": interFrameProcessingTime,
-        "transmitOutputTime": transmitOutputTime,
-        "interFrameProcessingMargin": interFrameProcessingMargin,
-        "interChirpProcessingMargin": interChirpProcessingMargin,
-        "activeFrameCPULoad": activeFrameCPULoad,
-        "interFrameCPULoad": interFrameCPULoad,
-    }
-    return statisticsObj
+    targetFileName = configs[configName]
+    target = loadConfig(targetFileName)
+    # The host costs were measured at startup, nothing is timed mid-stream
+    configPlan = planFile(targetFileName)
+    if not configPlan.feasible:
+        print(formatPlan(configPlan))
+    # The radar runs the guiMonitor lines of the shedder, not the uploaded
+    # ones. Whatever the old configuration left in flight is dropped once the
+    # sensor has stopped.
+    try:
+        latencies = switchConfig(
+            CLIport, radarConfig, target, tlvShedder.guiMonitorLines(), flushStream
+        )
+    except CliError as e:
+        print(e)
+        keepConfig()
+        return
+    print(formatLatencies(latencies))
+
+    # Swap the configuration model, the next packet is parsed with it
+    configFileName = targetFileName
+    radarConfig = target
+    headerDecoder = HeaderDecoder(target.platform)
+    tlvShedder = TlvShedder(target)
+    frameTracker.restart(len(target.subFrames))
+    deviceStats.clear()
+    changes_happening += 1
+    change_conf = False
+
+
+# Function to put the radar back on the running configuration after it
+# rejected a switch: the complete configuration is sent again, and the ports
+# are reopened when even that is rejected. The scheduler tries again after its
+# dwell time.
+def keepConfig():
+    global tlvShedder, change_conf, changes_happening
+    print(f"######## staying on {configFileName} ########")
+    change_conf = False
+    if scheduler is not None:
+        runningConfs = {fileName: name for name, fileName in configs.items()}
+        scheduler.conf = runningConfs.get(configFileName, scheduler.conf)
+    try:
+        print(formatLatencies(uploadConfig(CLIport, radarConfig.lines)))
+    except CliError as e:
+        reconnect(e)
+        return
+    flushStream()
+    tlvShedder = TlvShedder(radarConfig)
+    frameTracker.restart()
+    deviceStats.clear()
+    changes_happening += 1
+
+
+# Function to write the stage timings and the stream health to the metrics file
+def dumpMetrics():
+    stageTimer.gauge("clock_latency_seconds", clockModel.latencyMean / 1e9)
+    stageTimer.gauge("clock_jitter_seconds", clockModel.jitterNs / 1e9)
+    stageTimer.gauge("clock_drift_ppm", clockModel.driftPpm)
+    stageTimer.counter("packets_total", frameTracker.packets)
+    stageTimer.counter("lost_packets_total", frameTracker.lostPackets)
+    stageTimer.counter("duplicate_packets_total", frameTracker.duplicates)
+    stageTimer.counter("dropped_bytes_total", droppedBytes)
+    stageTimer.counter("skipped_bytes_total", skippedBytes)
+    stageTimer.counter("idle_polls_total", stageTimer.idlePolls)
+    deviceStats.export(stageTimer)
+    portSupervisor.export(stageTimer)
+    stageTimer.dump()
 
 
 def buffer_flush(idX, byteBufferLength, totalPacketLen):
-    if 0 < idX < byteBufferLength:
+    if 0 < idX <= byteBufferLength:
         shiftSize = totalPacketLen
 
         byteBuffer[: byteBufferLength - shiftSize] = byteBuffer[
@@ -493,18 +365,14 @@ def buffer_flush(idX, byteBufferLength, totalPacketLen):
             byteBufferLength = 0
 
 
-def readAndParseData16xx(Dataport, configParameters, filename):
-    global byteBuffer, byteBufferLength, framePeriodicity, changes_happening, change_conf, configFileName
-    finalObj = {"Date": time.strftime("%d/%m/%Y"), "Time": time.strftime("%H%M%S")}
+def readAndParseData16xx(Dataport, radarConfig, filename):
+    global byteBuffer, byteBufferLength, droppedBytes, skippedBytes, changes_happening, change_conf, configFileName, scheduledConf
+    finalObj = {}
+    if stageTimer:
+        stageTimer.start()
     # Constants
     OBJ_STRUCT_SIZE_BYTES = 12
     BYTE_VEC_ACC_MAX_SIZE = 2**15
-    MMWDEMO_UART_MSG_DETECTED_POINTS = 1
-    MMWDEMO_UART_MSG_RANGE_PROFILE = 2
-    MMWDEMO_OUTPUT_MSG_NOISE_PROFILE = 3
-    MMWDEMO_OUTPUT_MSG_AZIMUT_STATIC_HEAT_MAP = 4
-    MMWDEMO_OUTPUT_MSG_RANGE_DOPPLER_HEAT_MAP = 5
-    MMWDEMO_OUTPUT_MSG_STATS = 6
     maxBufferSize = 2**15
     magicWord = [2, 1, 4, 3, 6, 5, 8, 7]
 
@@ -515,7 +383,8 @@ def readAndParseData16xx(Dataport, configParameters, filename):
     detObj = {}
     tlv_type = 0
 
-    readBuffer = Dataport.read(Dataport.in_waiting)
+    readBuffer = Dataport.read(bytesWaiting(Dataport))
+    readNs = time.monotonic_ns()
     byteVec = np.frombuffer(readBuffer, dtype="uint8")
     byteCount = len(byteVec)
     # Check that the buffer is not full, and then add the data to the buffer
@@ -524,6 +393,12 @@ def readAndParseData16xx(Dataport, configParameters, filename):
             :byteCount
         ]
         byteBufferLength = byteBufferLength + byteCount
+        if byteCount:
+            readStamps.add(byteBufferLength, readNs)
+    else:
+        droppedBytes += byteCount
+    if stageTimer:
+        stageTimer.lap("read", pending=True)
 
     # Check that the buffer has some data
     if byteBufferLength > 16:
@@ -548,6 +423,8 @@ def readAndParseData16xx(Dataport, configParameters, filename):
                     len(byteBuffer[byteBufferLength - startIdx[0] :]), dtype="uint8"
                 )
                 byteBufferLength = byteBufferLength - startIdx[0]
+                readStamps.shift(startIdx[0])
+                skippedBytes += int(startIdx[0])
 
             # Check that there have no errors with the byte buffer length
             if byteBufferLength < 0:
@@ -563,75 +440,130 @@ def readAndParseData16xx(Dataport, configParameters, filename):
             if (byteBufferLength >= totalPacketLen) and (byteBufferLength != 0):
                 magicOK = 1
 
+    # Most polls read nothing or part of a packet, only the read and sync of
+    # the polls that complete one are timed
+    if stageTimer:
+        stageTimer.lap("sync", pending=True)
+        stageTimer.commit(magicOK)
+
     # If magicOK is equal to 1 then process the message
     if magicOK:
-        # word array to convert 4 bytes to a 32-bit number
-        word = [1, 2**8, 2**16, 2**24]
-
-        # Initialize the pointer index
-        idX = 0
-
-        # Read the header
-        magicNumber = byteBuffer[idX : idX + 8]
-        idX += 8
-        version = format(np.matmul(byteBuffer[idX : idX + 4], word), "x")
-        idX += 4
-        totalPacketLen = np.matmul(byteBuffer[idX : idX + 4], word)
-        idX += 4
-        platform = format(np.matmul(byteBuffer[idX : idX + 4], word), "x")
-        idX += 4
-        frameNumber = np.matmul(byteBuffer[idX : idX + 4], word)
-        idX += 4
-        timeCpuCycles = np.matmul(byteBuffer[idX : idX + 4], word)
-        idX += 4
-        numDetectedObj = np.matmul(byteBuffer[idX : idX + 4], word)
-        idX += 4
-        numTLVs = np.matmul(byteBuffer[idX : idX + 4], word)
-        idX += 4
-        subFrameNumber = np.matmul(byteBuffer[idX : idX + 4], word)
-        idX += 4
-        # Read the TLV messages
+        # Read the header, its layout was selected once for this session
+        (
+            magicNumber,
+            version,
+            totalPacketLen,
+            platform,
+            frameNumber,
+            timeCpuCycles,
+            numDetectedObj,
+            numTLVs,
+            subFrameNumber,
+        ) = headerDecoder.decode(byteBuffer)
+        idX = headerDecoder.size
+        # The cycle counter rate follows the platform, which the header
+        # decoder may only have detected on this packet
+        if clockModel.platform != headerDecoder.platform:
+            clockModel.select(headerDecoder.platform)
+        # Stamped with the read that brought in the last byte of the packet
+        finalObj["arrivalNs"] = readStamps.arrival(totalPacketLen)
+        # The cycle count is taken when the packet starts going out
+        finalObj["acquisitionNs"], finalObj["latencyNs"] = clockModel.update(
+            timeCpuCycles,
+            finalObj["arrivalNs"],
+            totalPacketLen * 1_000_000_000 // UART_BYTES_PER_SECOND,
+        )
+        finalObj["clockJitterNs"] = int(clockModel.jitterNs)
+        finalObj["clockDriftPpm"] = round(clockModel.driftPpm, 3)
+        # Lost and repeated packets are marked on the packet that follows them
+        finalObj.update(
+            frameTracker.update(
+                frameNumber,
+                subFrameNumber,
+                finalObj["arrivalNs"],
+                droppedBytes,
+                skippedBytes,
+            )
+        )
+        finalObj["subFrameNumber"] = subFrameNumber
+
+        # Every subframe of an advanced frame has its own dimensions
+        subFrame = radarConfig.subFrame(subFrameNumber)
+        if stageTimer:
+            stageTimer.lap("header")
+
+        # Index the TLV messages first, so that the SDK 3.x side info (TLV 7)
+        # can be joined onto the detected points (TLV 1) that precede it
+        tlvs = {}
         for tlvIdx in range(numTLVs):
-            # word array to convert 4 bytes to a 32 bit number
-            word = [1, 2**8, 2**16, 2**24]
+            # Check the header of the TLV message, a packet that lost bytes on
+            # the wire can announce TLVs beyond its end
+            if idX + TLV_HEADER.size > totalPacketLen:
+                break
+            tlv_type, tlv_length = TLV_HEADER.unpack_from(byteBuffer, idX)
+            idX += TLV_HEADER.size
+            if idX + tlv_length > totalPacketLen:
+                break
+            tlvs[tlv_type] = (idX, tlv_length)
+            idX += tlv_length
 
-            # Check the header of the TLV message
-            tlv_type = np.matmul(byteBuffer[idX : idX + 4], word)
-            idX += 4
-            tlv_length = np.matmul(byteBuffer[idX : idX + 4], word)
-            idX += 4
-            # Read the data depending on the TLV message
+        # Read the data depending on the TLV message
+        for tlv_type, (tlvIdX, tlv_length) in tlvs.items():
             if tlv_type == MMWDEMO_UART_MSG_DETECTED_POINTS:
-                detObj = processDetectedPoints(byteBuffer, idX, configParameters)
+                if sdkMajorVersion(version) >= 3:
+                    sideInfo = tlvs.get(MMWDEMO_OUTPUT_MSG_DETECTED_POINTS_SIDE_INFO)
+                    detObj = processDetectedPointsV3(
+                        byteBuffer,
+                        tlvIdX,
+                        tlv_length,
+                        sideInfo[0] if sideInfo else None,
+                    )
+                else:
+                    detObj = processDetectedPoints(byteBuffer, tlvIdX, subFrame)
                 finalObj.update(detObj)
             elif tlv_type == MMWDEMO_UART_MSG_RANGE_PROFILE:
                 noiseObj = processRangeNoiseProfile(
-                    byteBuffer, idX, detObj, configParameters, isRangeProfile=True
+                    byteBuffer, tlvIdX, detObj, subFrame, isRangeProfile=True
                 )
                 finalObj.update(noiseObj)
             elif tlv_type == MMWDEMO_OUTPUT_MSG_NOISE_PROFILE:
                 noiseObj = processRangeNoiseProfile(
-                    byteBuffer, idX, detObj, configParameters, isRangeProfile=False
+                    byteBuffer, tlvIdX, detObj, subFrame, isRangeProfile=False
                 )
                 finalObj.update(noiseObj)
             elif tlv_type == MMWDEMO_OUTPUT_MSG_AZIMUT_STATIC_HEAT_MAP:
-                heatObj = processAzimuthHeatMap(byteBuffer, idX, configParameters)
+                heatObj = processAzimuthHeatMap(byteBuffer, tlvIdX, subFrame)
                 finalObj.update(heatObj)
             elif tlv_type == MMWDEMO_OUTPUT_MSG_RANGE_DOPPLER_HEAT_MAP:
-                dopplerObj = processRangeDopplerHeatMap(byteBuffer, idX)
+                dopplerObj = processRangeDopplerHeatMap(byteBuffer, tlvIdX, subFrame)
                 finalObj.update(dopplerObj)
             elif tlv_type == MMWDEMO_OUTPUT_MSG_STATS:
-                statisticsObj = processStatistics(byteBuffer, idX)
+                statisticsObj = processStatistics(byteBuffer, tlvIdX)
                 finalObj.update(statisticsObj)
-
-            idX += tlv_length
-            # except Error as e:
-            #     pass
+                for alarm, raised in deviceStats.update(statisticsObj):
+                    print(f"######## {deviceStats.formatAlarm(alarm, raised)} ########")
+            if stageTimer:
+                stageTimer.lap(TLV_NAMES.get(tlv_type, f"tlv{tlv_type}"))
         # Remove already processed data
         with open(filename, "a") as f:
             writer = csv.DictWriter(f, header)
             writer.writerow(finalObj)
-        if 0 < idX < byteBufferLength:
+        if stageTimer:
+            stageTimer.lap("csv")
+        shedTlvs(Dataport)
+        if stageTimer:
+            stageTimer.lap("shed")
+            stageTimer.finish("frame")
+
+        # Ask for another configuration when the scene activity calls for it
+        if scheduler is not None:
+            nextConf = scheduler.update(finalObj, finalObj["arrivalNs"] / 1e9)
+            if nextConf is not None:
+                scheduledConf = nextConf
+                change_conf = True
+        # A packet without padding ends exactly at the end of the buffer when
+        # the read stopped there, it is consumed all the same
+        if 0 < idX <= byteBufferLength:
             shiftSize = totalPacketLen
 
             byteBuffer[: byteBufferLength - shiftSize] = byteBuffer[
@@ -641,10 +573,12 @@ def readAndParseData16xx(Dataport, configParameters, filename):
                 len(byteBuffer[byteBufferLength - shiftSize :]), dtype="uint8"
             )
             byteBufferLength = byteBufferLength - shiftSize
+            readStamps.shift(shiftSize)
 
             # Check that there are no errors with the buffer length
             if byteBufferLength < 0:
                 byteBufferLength = 0
+        dataOK = 1
 
     return dataOK, frameNumber, finalObj
 
@@ -657,6 +591,58 @@ def parseArg():
         default="pointcloud",
         choices=["pointcloud", "macro", "micro"],
     )
+    parser.add_argument(
+        "--cfg",
+        help="Configuration file to use instead of --conf, e.g. one printed by artifacts.py",
+    )
+    parser.add_argument(
+        "--auto",
+        help="Start with the micro configuration and switch to macro while the scene is active",
+        action="store_true",
+    )
+    parser.add_argument(
+        "--sensor",
+        help="Sensor ID of the mapping written by ports.py, needed with several sensors",
+    )
+    parser.add_argument("--sensors", help="Sensor mapping file", default=SENSOR_MAP)
+    parser.add_argument(
+        "--reconnect-timeout",
+        help="Seconds to wait for lost ports to come back before giving up, forever by default",
+        type=float,
+    )
+    parser.add_argument(
+        "--cli-port", help="CLI serial port, e.g. /dev/ttyACM0, instead of discovery"
+    )
+    parser.add_argument(
+        "--data-port", help="Data serial port, e.g. /dev/ttyACM1, instead of discovery"
+    )
+    parser.add_argument(
+        "--metrics",
+        help="Time every stage and write the histograms to this file in Prometheus text format",
+    )
+    parser.add_argument(
+        "--metrics-interval",
+        help="Seconds between two writes of the metrics file",
+        type=float,
+        default=10.0,
+    )
+    parser.add_argument(
+        "--profile-mode",
+        help="Profiler toggled by SIGUSR1, tracemalloc snapshots are toggled by SIGUSR2",
+        choices=PROFILE_MODES,
+        default="cprofile",
+    )
+    parser.add_argument(
+        "--profile-dir",
+        help="Directory for the profiles and tracemalloc diffs",
+        default=PROFILE_DIR,
+    )
+    parser.add_argument(
+        "--tracemalloc-interval",
+        help="Seconds between two tracemalloc snapshots",
+        type=float,
+        default=TRACEMALLOC_INTERVAL,
+    )
     args = parser.parse_args()
     return args
 
@@ -666,11 +652,36 @@ def parseArg():
 # Configurate the serial port
 if __name__ == "__main__":
     args = parseArg()
-    configFileName = configs[args.conf]
+    if args.metrics:
+        stageTimer = StageTimer(args.metrics, args.metrics_interval)
+    profilingHooks = ProfilingHooks(
+        args.profile_dir, args.profile_mode, args.tracemalloc_interval
+    ).install()
+    if args.auto:
+        scheduler = ActivityScheduler()
+        configFileName = configs[scheduler.conf]
+    elif args.cfg:
+        configFileName = args.cfg
+    else:
+        configFileName = configs[args.conf]
+    sensorId = args.sensor
+    sensorMapPath = args.sensors
+    if args.cli_port and args.data_port:
+        portNames = (args.cli_port, args.data_port)
+    portSupervisor.timeout = args.reconnect_timeout
     CLIport, Dataport = serialConfig(configFileName)
+    # Time the decoders of every configuration the scheduler may switch to
+    # now, a live switch then plans from the cached costs
+    if scheduler is not None:
+        for switchFileName in configs.values():
+            planFile(switchFileName)
     # Get the configuration parameters from the configuration file
-    configParameters = parseConfigFile(configFileName)
-    # print(configParameters)
+    radarConfig = loadConfig(configFileName)
+    headerDecoder = HeaderDecoder(radarConfig.platform)
+    clockModel = ClockModel(radarConfig.platform)
+    tlvShedder = TlvShedder(radarConfig)
+    frameTracker.restart(len(radarConfig.subFrames))
+    # print(radarConfig)
 
     # Main loop
     detObj = {}
@@ -688,17 +699,34 @@ if __name__ == "__main__":
 
         try:
             dataOk, frameNumber, finalObj = readAndParseData16xx(
-                Dataport, configParameters, filename
+                Dataport, radarConfig, filename
             )
             if dataOk:
-                # Store the current frame into frameData
-                print(finalObj)
                 currentIndex += 1
+                portSupervisor.packet()
+            else:
+                portSupervisor.check(Dataport, radarConfig.framePeriodicity)
+
+            if change_conf:
+                change_conf_callback(scheduledConf)
+            if stageTimer and time.monotonic() >= stageTimer.nextDump:
+                dumpMetrics()
 
             # time.sleep(0.03)  # Sampling frequency of 30 Hz
 
+        # The USB link of the radar reset, the ports are gone
+        except serial.SerialException as e:
+            reconnect(e)
+
         # Stop the program and close everything if Ctrl + c is pressed
         except KeyboardInterrupt:
+            profilingHooks.stop()
+            print(frameTracker.summary())
+            if portSupervisor.outages:
+                print(portSupervisor.summary())
+            if stageTimer:
+                dumpMetrics()
+                print(stageTimer.summary())
             CLIport.write("sensorStop\n".encode())
             CLIport.close()
             Dataport.close()
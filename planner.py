@@ -0,0 +1,287 @@
+import argparse
+import csv
+import glob
+import os
+import time
+from dataclasses import dataclass
+
+import numpy as np
+
+from config import loadConfig, parseConfig
+from tlv import (
+    MMWDEMO_OUTPUT_MSG_AZIMUT_STATIC_HEAT_MAP,
+    MMWDEMO_OUTPUT_MSG_NOISE_PROFILE,
+    MMWDEMO_OUTPUT_MSG_RANGE_DOPPLER_HEAT_MAP,
+    MMWDEMO_OUTPUT_MSG_STATS,
+    MMWDEMO_UART_MSG_DETECTED_POINTS,
+    MMWDEMO_UART_MSG_RANGE_PROFILE,
+    POINT_DESCRIPTOR_DTYPE,
+    TLV_HEADER,
+    processAzimuthHeatMap,
+    processDetectedPoints,
+    processRangeDopplerHeatMap,
+    processRangeNoiseProfile,
+    processStatistics,
+)
+
+UART_BAUD_RATE = 921600
+# 8N1 framing puts 10 bits on the wire for every byte
+UART_BYTES_PER_SECOND = UART_BAUD_RATE // 10
+# Fraction of the UART and of the frame period the host may use before frames
+# start to back up
+UART_BUDGET = 0.8
+HOST_CPU_BUDGET = 0.5
+# Detected points assumed per frame when sizing the point cloud TLV
+DEFAULT_NUM_OBJ = 32
+# Stage of the host cost spent appending the decoded frame to the csv
+CSV_WRITE = "csv"
+
+TLV_NAMES = {
+    MMWDEMO_UART_MSG_DETECTED_POINTS: "detectedPoints",
+    MMWDEMO_UART_MSG_RANGE_PROFILE: "rangeProfile",
+    MMWDEMO_OUTPUT_MSG_NOISE_PROFILE: "noiseProfile",
+    MMWDEMO_OUTPUT_MSG_AZIMUT_STATIC_HEAT_MAP: "azimuthHeatMap",
+    MMWDEMO_OUTPUT_MSG_RANGE_DOPPLER_HEAT_MAP: "rangeDopplerHeatMap",
+    MMWDEMO_OUTPUT_MSG_STATS: "stats",
+}
+
+DECODERS = {
+    MMWDEMO_UART_MSG_DETECTED_POINTS: processDetectedPoints,
+    MMWDEMO_UART_MSG_RANGE_PROFILE: lambda byteBuffer, idX, subFrame: (
+        processRangeNoiseProfile(byteBuffer, idX, {}, subFrame, isRangeProfile=True)
+    ),
+    MMWDEMO_OUTPUT_MSG_NOISE_PROFILE: lambda byteBuffer, idX, subFrame: (
+        processRangeNoiseProfile(byteBuffer, idX, {}, subFrame, isRangeProfile=False)
+    ),
+    MMWDEMO_OUTPUT_MSG_AZIMUT_STATIC_HEAT_MAP: processAzimuthHeatMap,
+    MMWDEMO_OUTPUT_MSG_RANGE_DOPPLER_HEAT_MAP: processRangeDopplerHeatMap,
+    MMWDEMO_OUTPUT_MSG_STATS: lambda byteBuffer, idX, subFrame: (
+        processStatistics(byteBuffer, idX)
+    ),
+}
+
+
+@dataclass(frozen=True)
+class SubFramePlan:
+    index: int
+    framePeriodicity: float
+    tlvBytes: dict
+    frameBytes: int
+    uartMs: float
+    decodeMs: dict
+
+    @property
+    def hostMs(self):
+        return sum(self.decodeMs.values())
+
+
+@dataclass(frozen=True)
+class Plan:
+    name: str
+    subFrames: tuple
+    bytesPerSecond: float
+    uartLoad: float
+    hostLoad: float
+    problems: tuple
+
+    @property
+    def feasible(self):
+        return not self.problems
+
+
+# ------------------------------------------------------------------
+
+# Decoder and csv costs measured on this host, keyed by (config digest,
+# subframe, numObj)
+_decodeCosts = {}
+
+
+def measureWriteCost(row, repeat=3):
+    # Time appending a decoded frame to a csv, the file is opened for every
+    # row as the collector does, the cost grows with the points and bins
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        with open(os.devnull, "a") as f:
+            csv.DictWriter(f, list(row)).writerow(row)
+        best = min(best, time.perf_counter() - start)
+    return best * 1e3
+
+
+def measureDecoderCosts(subFrame, numObj, repeat=3):
+    # Time every enabled decoder on a random payload of the expected size, and
+    # the csv write of the frame they decode to
+    rng = np.random.default_rng(0)
+    costs = {}
+    row = {}
+    for tlv_type in subFrame.enabledTlvs():
+        if tlv_type == MMWDEMO_UART_MSG_DETECTED_POINTS:
+            numBytes = subFrame.pointBytes(numObj)
+        else:
+            numBytes = subFrame.tlvBytes[tlv_type]
+        byteBuffer = rng.integers(0, 256, numBytes, dtype="uint8")
+        if tlv_type == MMWDEMO_UART_MSG_DETECTED_POINTS:
+            descriptor = byteBuffer[: POINT_DESCRIPTOR_DTYPE.itemsize].view(
+                POINT_DESCRIPTOR_DTYPE
+            )
+            descriptor["numObj"] = numObj
+            descriptor["xyzQFormat"] = 9
+        best = float("inf")
+        for _ in range(repeat):
+            start = time.perf_counter()
+            decoded = DECODERS[tlv_type](byteBuffer, 0, subFrame)
+            best = min(best, time.perf_counter() - start)
+        costs[tlv_type] = best * 1e3
+        row.update(decoded)
+    costs[CSV_WRITE] = measureWriteCost(row, repeat)
+    return costs
+
+
+def decoderCosts(radarConfig, subFrame, numObj):
+    key = (radarConfig.digest, subFrame.index, numObj)
+    if key not in _decodeCosts:
+        _decodeCosts[key] = measureDecoderCosts(subFrame, numObj)
+    return _decodeCosts[key]
+
+
+def plan(radarConfig, name="", numObj=DEFAULT_NUM_OBJ, benchmark=True):
+    subFramePlans = []
+    problems = []
+    for subFrame in radarConfig.subFrames:
+        tlvBytes = {}
+        for tlv_type in subFrame.enabledTlvs():
+            if tlv_type == MMWDEMO_UART_MSG_DETECTED_POINTS:
+                numBytes = subFrame.pointBytes(numObj)
+            else:
+                numBytes = subFrame.tlvBytes[tlv_type]
+            tlvBytes[tlv_type] = TLV_HEADER.size + numBytes
+        frameBytes = subFrame.frameBytes(numObj, radarConfig.platform)
+        uartMs = frameBytes / UART_BYTES_PER_SECOND * 1e3
+        decodeMs = decoderCosts(radarConfig, subFrame, numObj) if benchmark else {}
+        subFramePlan = SubFramePlan(
+            index=subFrame.index,
+            framePeriodicity=subFrame.framePeriodicity,
+            tlvBytes=tlvBytes,
+            frameBytes=frameBytes,
+            uartMs=uartMs,
+            decodeMs=decodeMs,
+        )
+        subFramePlans.append(subFramePlan)
+
+        # The packet of a subframe has to leave before the next one is ready
+        if uartMs > subFrame.framePeriodicity:
+            problems.append(
+                f"subframe {subFrame.index}: {frameBytes} B take {uartMs:.1f} ms "
+                f"on the UART, period is {subFrame.framePeriodicity:g} ms"
+            )
+        if subFramePlan.hostMs > HOST_CPU_BUDGET * subFrame.framePeriodicity:
+            slowest = max(decodeMs, key=decodeMs.get)
+            problems.append(
+                f"subframe {subFrame.index}: decoding and writing take "
+                f"{subFramePlan.hostMs:.1f} ms of a {subFrame.framePeriodicity:g} ms "
+                f"period, mostly {TLV_NAMES.get(slowest, slowest)}"
+            )
+
+    framePeriodicity = radarConfig.framePeriodicity
+    bytesPerSecond = sum(p.frameBytes for p in subFramePlans) / framePeriodicity * 1e3
+    uartLoad = bytesPerSecond / UART_BYTES_PER_SECOND
+    hostLoad = sum(p.hostMs for p in subFramePlans) / framePeriodicity
+    if uartLoad > UART_BUDGET:
+        problems.append(
+            f"{bytesPerSecond:.0f} B/s is {uartLoad:.0%} of the "
+            f"{UART_BYTES_PER_SECOND} B/s a {UART_BAUD_RATE} baud UART carries"
+        )
+    return Plan(
+        name=name,
+        subFrames=tuple(subFramePlans),
+        bytesPerSecond=bytesPerSecond,
+        uartLoad=uartLoad,
+        hostLoad=hostLoad,
+        problems=tuple(problems),
+    )
+
+
+def planFile(configFileName, numObj=DEFAULT_NUM_OBJ, benchmark=True):
+    return plan(loadConfig(configFileName), configFileName, numObj, benchmark)
+
+
+def planTransform(
+    transform, guiMonitor=(1, 1, 0, 0, 0, 1), numObj=DEFAULT_NUM_OBJ, benchmark=True
+):
+    # Only the commands that size the UART output are generated, the lines
+    # already collected by the transform are left untouched
+    lines = transform.P["lines"]
+    transform.P["lines"] = [f"% Platform:{transform.Input['platform']}"]
+    try:
+        transform.generate_ChannelCfg()
+        transform.generate_profileCfg()
+        transform.generate_frameCfg()
+        transform.P["lines"].append(
+            " ".join(["guiMonitor -1"] + [str(flag) for flag in guiMonitor])
+        )
+        text = "\n".join(transform.P["lines"])
+    finally:
+        transform.P["lines"] = lines
+    return plan(parseConfig(text), "Transform", numObj, benchmark)
+
+
+# ------------------------------------------------------------------
+
+
+def formatPlan(p):
+    report = [
+        f"{p.name}: {'ok' if p.feasible else 'INFEASIBLE'}  "
+        f"{p.bytesPerSecond:.0f} B/s (UART {p.uartLoad:.0%}, host {p.hostLoad:.0%})"
+    ]
+    for s in p.subFrames:
+        report.append(
+            f"  subframe {s.index}: {s.frameBytes} B per {s.framePeriodicity:g} ms, "
+            f"UART {s.uartMs:.1f} ms, host {s.hostMs:.2f} ms"
+        )
+        for tlv_type, numBytes in s.tlvBytes.items():
+            decode = s.decodeMs.get(tlv_type)
+            report.append(
+                f"    {TLV_NAMES[tlv_type]:<20} {numBytes:>6} B"
+                + (f"  {decode:.3f} ms" if decode is not None else "")
+            )
+        if CSV_WRITE in s.decodeMs:
+            report.append(
+                f"    {CSV_WRITE:<20} {'':>6}    {s.decodeMs[CSV_WRITE]:.3f} ms"
+            )
+    for problem in p.problems:
+        report.append(f"  ! {problem}")
+    return "\n".join(report)
+
+
+def parseArg():
+    parser = argparse.ArgumentParser(
+        description="UART bandwidth and host budget of radar configurations"
+    )
+    parser.add_argument(
+        "configs",
+        nargs="*",
+        help="Configuration files, every file in Configurations/ by default",
+    )
+    parser.add_argument(
+        "--num-obj",
+        type=int,
+        default=DEFAULT_NUM_OBJ,
+        help="Detected points assumed per frame",
+    )
+    parser.add_argument(
+        "--no-benchmark",
+        action="store_true",
+        help="Skip timing the decoders on this host",
+    )
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parseArg()
+    configFileNames = args.configs or sorted(glob.glob("Configurations/*.cfg"))
+    infeasible = 0
+    for configFileName in configFileNames:
+        p = planFile(configFileName, args.num_obj, not args.no_benchmark)
+        infeasible += not p.feasible
+        print(formatPlan(p))
+    raise SystemExit(1 if infeasible else 0)
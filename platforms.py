@@ -0,0 +1,6 @@
+# Device families of the TI mmWave Demo Visualizer, kept apart from input.py
+# so that the parser does not load the whole visualizer engine
+class Platform:
+    xWR14xx = "xWR14xx"
+    xWR16xx = "xWR16xx"
+    xWR18xx = "xWR18xx"
@@ -0,0 +1,238 @@
+import argparse
+import json
+import os
+import signal
+import subprocess
+import sys
+from dataclasses import dataclass
+
+from serial.tools import list_ports
+
+# Sensor ID -> serial number of its debug probe, or fixed cli and data ports
+SENSOR_MAP = "sensors.json"
+# USB debug probes of the EVMs: the XDS110 of the BOOST boards and the
+# CP2105 bridge of the MMWAVEICBOOST carrier
+PROBES = {
+    (0x0451, 0xBEF3): "XDS110",
+    (0x10C4, 0xEA70): "CP2105",
+}
+# How each probe names its two UARTs, in the interface string on Linux and in
+# the description on Windows
+ROLE_NAMES = {
+    "cli": ("Application/User UART", "Enhanced COM Port"),
+    "data": ("Auxiliary Data Port", "Standard COM Port"),
+}
+# Ports the collectors used before discovery, still tried when no probe is
+# found, keyed by the OS variable of the .env file
+LEGACY_PORTS = {
+    "Ubuntu": ("/dev/ttyACM0", "/dev/ttyACM1"),
+    "Windows_NT": ("COM3", "COM4"),
+}
+
+
+class PortError(RuntimeError):
+    pass
+
+
+@dataclass
+class SensorPorts:
+    serialNumber: str
+    probe: str
+    cli: str = None
+    data: str = None
+
+
+def sensorKey(port):
+    # The probe's serial number, or the USB path it is plugged into when it
+    # has none, both survive a reboot unlike the ttyACM numbering
+    if port.serial_number:
+        return port.serial_number
+    if port.location:
+        return "usb-" + port.location.split(":")[0]
+    return port.device
+
+
+def portRole(port):
+    text = f"{port.interface or ''} {port.description or ''}"
+    for role, names in ROLE_NAMES.items():
+        if any(name in text for name in names):
+            return role
+    return None
+
+
+def discover(ports=None):
+    # Sensors behind the known probes, by sensorKey. A probe whose UARTs
+    # cannot be told apart by name gets its lower port as the CLI.
+    sensors = {}
+    unnamed = {}
+    for port in list_ports.comports() if ports is None else ports:
+        probe = PROBES.get((port.vid, port.pid))
+        if probe is None:
+            continue
+        key = sensorKey(port)
+        sensor = sensors.setdefault(key, SensorPorts(key, probe))
+        role = portRole(port)
+        if role is None or getattr(sensor, role) is not None:
+            unnamed.setdefault(key, []).append(port.device)
+        else:
+            setattr(sensor, role, port.device)
+    for key, devices in unnamed.items():
+        devices = sorted(devices)
+        for role in ("cli", "data"):
+            if getattr(sensors[key], role) is None and devices:
+                setattr(sensors[key], role, devices.pop(0))
+    return {key: s for key, s in sensors.items() if s.cli and s.data}
+
+
+def loadMapping(path=SENSOR_MAP):
+    if not os.path.exists(path):
+        return {}
+    with open(path) as f:
+        return json.load(f)
+
+
+def saveMapping(mapping, path=SENSOR_MAP):
+    # Written aside and renamed, a collector starting meanwhile never reads
+    # half a file
+    tmpPath = path + ".tmp"
+    with open(tmpPath, "w") as f:
+        json.dump(mapping, f, indent=1)
+        f.write("\n")
+    os.replace(tmpPath, path)
+
+
+def assign(mapping, sensors):
+    # Gives every sensor that is not mapped yet the next free radarN ID,
+    # returns the new IDs
+    known = {entry.get("serialNumber") for entry in mapping.values()}
+    added = []
+    n = 0
+    for key in sorted(sensors):
+        if key in known:
+            continue
+        while f"radar{n}" in mapping:
+            n += 1
+        mapping[f"radar{n}"] = {"serialNumber": key}
+        added.append(f"radar{n}")
+    return added
+
+
+def entryPorts(sensorId, entry, sensors):
+    if "cli" in entry and "data" in entry:
+        return entry["cli"], entry["data"]
+    sensor = sensors.get(entry.get("serialNumber"))
+    if sensor is None:
+        raise PortError(
+            f"sensor {sensorId} ({entry.get('serialNumber')}) is not connected"
+        )
+    return sensor.cli, sensor.data
+
+
+def findPorts(sensorId=None, path=SENSOR_MAP):
+    # (cli, data) port names. A sensor ID is looked up in the mapping, without
+    # one the only connected sensor is used, and without any the ports of the
+    # OS variable.
+    mapping = loadMapping(path)
+    if sensorId is not None:
+        if sensorId not in mapping:
+            raise PortError(f"sensor {sensorId} is not in {path}")
+        return entryPorts(sensorId, mapping[sensorId], discover())
+
+    sensors = discover()
+    if len(sensors) == 1:
+        sensor = next(iter(sensors.values()))
+        return sensor.cli, sensor.data
+    if len(sensors) > 1:
+        raise PortError(
+            f"{len(sensors)} sensors connected ({', '.join(sorted(sensors))}), "
+            f"choose one with --sensor after python ports.py --assign"
+        )
+    osName = os.environ.get("OS")
+    if osName not in LEGACY_PORTS:
+        raise PortError(f"no sensor connected and no ports known for OS={osName}")
+    return LEGACY_PORTS[osName]
+
+
+def formatSensors(mapping, sensors):
+    lines = []
+    byKey = {entry.get("serialNumber"): sensorId for sensorId, entry in mapping.items()}
+    for key, sensor in sorted(sensors.items()):
+        sensorId = byKey.get(key, "unmapped")
+        lines.append(
+            f"{sensorId}: {sensor.probe} {key} cli {sensor.cli} data {sensor.data}"
+        )
+    for sensorId, entry in mapping.items():
+        if entry.get("serialNumber") not in sensors and "cli" not in entry:
+            lines.append(f"{sensorId}: {entry.get('serialNumber')} not connected")
+    return lines
+
+
+def launch(mapping, sensors, path, extraArgs):
+    # One collector process per mapped sensor that is connected, each with
+    # its own ports, CSV files and buffers
+    processes = {}
+    for sensorId, entry in mapping.items():
+        try:
+            entryPorts(sensorId, entry, sensors)
+        except PortError as e:
+            print(e)
+            continue
+        command = [
+            sys.executable,
+            os.path.join(os.path.dirname(os.path.abspath(__file__)), "only_read.py"),
+            "--sensor",
+            sensorId,
+            "--sensors",
+            path,
+            *entry.get("args", []),
+            *extraArgs,
+        ]
+        print(f"{sensorId}: {' '.join(command)}")
+        processes[sensorId] = subprocess.Popen(command)
+    try:
+        for sensorId, process in processes.items():
+            process.wait()
+            print(f"{sensorId} exited with {process.returncode}")
+    except KeyboardInterrupt:
+        # The collectors stop their sensor on SIGINT
+        for process in processes.values():
+            if process.poll() is None:
+                process.send_signal(signal.SIGINT)
+        for process in processes.values():
+            process.wait()
+    return processes
+
+
+def parseArg():
+    parser = argparse.ArgumentParser(
+        description="Find the radars by their USB probe and map them to sensor IDs"
+    )
+    parser.add_argument("--sensors", default=SENSOR_MAP, help="Sensor mapping file")
+    parser.add_argument(
+        "--assign",
+        action="store_true",
+        help="Give the connected sensors that are not mapped yet an ID",
+    )
+    parser.add_argument(
+        "--launch",
+        action="store_true",
+        help="Start only_read.py for every mapped sensor, other arguments are passed on",
+    )
+    args, extraArgs = parser.parse_known_args()
+    if extraArgs and not args.launch:
+        parser.error(f"unrecognized arguments: {' '.join(extraArgs)}")
+    return args, extraArgs
+
+
+if __name__ == "__main__":
+    args, extraArgs = parseArg()
+    mapping = loadMapping(args.sensors)
+    sensors = discover()
+    if args.assign:
+        added = assign(mapping, sensors)
+        saveMapping(mapping, args.sensors)
+        print(f"{len(added)} sensors added to {args.sensors}")
+    for line in formatSensors(mapping, sensors):
+        print(line)
+    if args.launch:
+        launch(mapping, sensors, args.sensors, extraArgs)
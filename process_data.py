@@ -4,12 +4,18 @@ import matplotlib.pyplot as plt
 import numpy as np
 import pandas as pd
 
+from clock import SessionClock, readableTimes, sessionPath
+from continuity import lossIntervals
+
 filename = "20220610_213256.csv"
 
 df = pd.read_csv(filename)
 
-timenp = df.Time
+# Arrival times are stored as monotonic ns, dated with the session anchor
+timenp = readableTimes(df.arrivalNs, SessionClock.load(sessionPath(filename)))
 print(timenp)
+# Stretches without data, as opposed to frames without targets
+print(lossIntervals(df))
 numObjnp = df.numObj
 rangeIdxnp = df.rangeIdx
 rangenp = df.range
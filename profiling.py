@@ -0,0 +1,165 @@
+import os
+import signal
+import sys
+import threading
+import time
+import tracemalloc
+from collections import Counter
+
+PROFILE_DIR = "profiles"
+PROFILE_MODES = ("cprofile", "sample")
+# Profiler on SIGUSR1, memory snapshots on SIGUSR2: kill -USR1 <pid>
+PROFILE_SIGNAL = getattr(signal, "SIGUSR1", None)
+MEMORY_SIGNAL = getattr(signal, "SIGUSR2", None)
+
+SAMPLE_INTERVAL = 0.005
+TRACEMALLOC_INTERVAL = 300.0
+TRACEMALLOC_FRAMES = 10
+TRACEMALLOC_TOP = 25
+
+
+def timestamp():
+    return time.strftime("%Y%m%d_%H%M%S")
+
+
+class StackSampler:
+    def __init__(self, interval=SAMPLE_INTERVAL):
+        # Samples the stack of the main thread from a background thread, the
+        # collector itself runs untouched. Written in the collapsed format
+        # that flamegraph.pl and speedscope read.
+        self.interval = interval
+        self.threadId = threading.main_thread().ident
+        self.stacks = Counter()
+        self.stopped = threading.Event()
+        self.thread = None
+
+    def run(self):
+        while not self.stopped.wait(self.interval):
+            frame = sys._current_frames().get(self.threadId)
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(
+                    f"{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})"
+                )
+                frame = frame.f_back
+            if stack:
+                self.stacks[";".join(reversed(stack))] += 1
+
+    def enable(self):
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+
+    def disable(self):
+        self.stopped.set()
+        self.thread.join()
+
+    def dump_stats(self, path):
+        with open(path, "w") as f:
+            for stack, n in self.stacks.most_common():
+                f.write(f"{stack} {n}\n")
+
+
+class MemoryWatch:
+    def __init__(self, directory, interval=TRACEMALLOC_INTERVAL):
+        # tracemalloc snapshots every interval seconds, each one compared
+        # with the previous and with the first, from a background thread
+        self.directory = directory
+        self.interval = interval
+        self.stopped = threading.Event()
+        self.thread = None
+
+    def run(self):
+        first = previous = tracemalloc.take_snapshot()
+        while not self.stopped.wait(self.interval):
+            snapshot = tracemalloc.take_snapshot()
+            path = os.path.join(self.directory, f"tracemalloc_{timestamp()}.txt")
+            current, peak = tracemalloc.get_traced_memory()
+            with open(path, "w") as f:
+                f.write(f"traced {current} B, peak {peak} B\n")
+                for title, base in (("previous", previous), ("first", first)):
+                    f.write(f"\n# Growth since the {title} snapshot\n")
+                    for stat in snapshot.compare_to(base, "lineno")[:TRACEMALLOC_TOP]:
+                        f.write(f"{stat}\n")
+            previous = snapshot
+
+    def start(self):
+        tracemalloc.start(TRACEMALLOC_FRAMES)
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        self.stopped.set()
+        self.thread.join()
+        tracemalloc.stop()
+
+
+class ProfilingHooks:
+    def __init__(
+        self,
+        directory=PROFILE_DIR,
+        mode="cprofile",
+        tracemallocInterval=TRACEMALLOC_INTERVAL,
+    ):
+        # Nothing runs until a signal arrives, the collector loop is not
+        # touched at all while profiling is off. The first signal starts a
+        # profile or the memory watch, the second one stops it and, for the
+        # profiler, writes a timestamped file to directory.
+        if mode not in PROFILE_MODES:
+            raise ValueError(f"profile mode must be one of {PROFILE_MODES}")
+        self.directory = directory
+        self.mode = mode
+        self.tracemallocInterval = tracemallocInterval
+        self.profiler = None
+        self.memoryWatch = None
+
+    def install(self):
+        # Signals are Unix only, elsewhere the hooks stay off
+        if PROFILE_SIGNAL is None:
+            return self
+        signal.signal(PROFILE_SIGNAL, lambda signum, frame: self.toggleProfiler())
+        signal.signal(MEMORY_SIGNAL, lambda signum, frame: self.toggleMemoryWatch())
+        return self
+
+    def toggleProfiler(self):
+        os.makedirs(self.directory, exist_ok=True)
+        if self.profiler is None:
+            if self.mode == "cprofile":
+                # Imported on the first signal, collectors start without it
+                import cProfile
+
+                self.profiler = cProfile.Profile()
+            else:
+                self.profiler = StackSampler()
+            self.profiler.enable()
+            self.started = timestamp()
+            print(f"######## {self.mode} profiling started ########")
+            return
+        self.profiler.disable()
+        suffix = "prof" if self.mode == "cprofile" else "folded"
+        path = os.path.join(
+            self.directory, f"{self.mode}_{self.started}_{timestamp()}.{suffix}"
+        )
+        self.profiler.dump_stats(path)
+        self.profiler = None
+        print(f"######## profile written to {path} ########")
+
+    def toggleMemoryWatch(self):
+        os.makedirs(self.directory, exist_ok=True)
+        if self.memoryWatch is None:
+            self.memoryWatch = MemoryWatch(self.directory, self.tracemallocInterval)
+            self.memoryWatch.start()
+            print(
+                f"######## tracemalloc snapshots every {self.tracemallocInterval} s ########"
+            )
+            return
+        self.memoryWatch.stop()
+        self.memoryWatch = None
+        print("######## tracemalloc stopped ########")
+
+    def stop(self):
+        # Writes out whatever is running, for a clean exit
+        if self.profiler is not None:
+            self.toggleProfiler()
+        if self.memoryWatch is not None:
+            self.toggleMemoryWatch()
@@ -10,9 +10,10 @@ from dotenv import load_dotenv
 from matplotlib import pyplot as plt
 
 import fft
+from ports import findPorts
+from profiling import PROFILE_DIR, ProfilingHooks
 
 load_dotenv(".env")
-os_name = os.environ.get("OS")
 
 # import pyqtgraph as pg
 # from pyqtgraph.Qt import QtGui
@@ -84,13 +85,9 @@ def serialConfig(configFileName):
     global Dataport
     # Open the serial ports for the configuration and the data ports
 
-    if os_name == "Ubuntu":
-        CLIport = serial.Serial("/dev/ttyACM0", 115200)
-        Dataport = serial.Serial("/dev/ttyACM1", 921600)
-
-    elif os_name == "Windows_NT":
-        CLIport = serial.Serial("COM3", 115200)
-        Dataport = serial.Serial("COM4", 921600)
+    cliPortName, dataPortName = findPorts()
+    CLIport = serial.Serial(cliPortName, 115200)
+    Dataport = serial.Serial(dataPortName, 921600)
 
     # Read the configuration file and send it to the board
     config = [line.rstrip("\r\n") for line in open(configFileName)]
@@ -651,6 +648,12 @@ def update(filename):
 
 # -------------------------    MAIN   -----------------------------------------
 
+# Profiling is toggled with SIGUSR1 and SIGUSR2 while the script runs
+profilingHooks = ProfilingHooks(
+    os.environ.get("PROFILE_DIR", PROFILE_DIR),
+    os.environ.get("PROFILE_MODE", "cprofile"),
+).install()
+
 # Configurate the serial port
 CLIport, Dataport = serialConfig(configFileName)
 print("CLIport", CLIport)
@@ -695,6 +698,7 @@ while True:
 
     # Stop the program and close everything if Ctrl + c is pressed
     except KeyboardInterrupt:
+        profilingHooks.stop()
         CLIport.write("sensorStop\n".encode())
         CLIport.close()
         Dataport.close()
@@ -0,0 +1,74 @@
+import time
+
+import numpy as np
+
+
+class ActivityScheduler:
+    def __init__(
+        self,
+        lowConf="micro",
+        highConf="macro",
+        minPoints=3,
+        energyChange=0.05,
+        enterFrames=2,
+        idleSeconds=30.0,
+        minDwellSeconds=10.0,
+    ):
+        # Names are keys of the configs dict in only_read.py. The sensor starts
+        # at the low rate, moves up after enterFrames active frames in a row and
+        # back down after idleSeconds without activity. It stays at least
+        # minDwellSeconds in a configuration either way.
+        self.lowConf = lowConf
+        self.highConf = highConf
+        self.minPoints = minPoints
+        self.energyChange = energyChange
+        self.enterFrames = enterFrames
+        self.idleSeconds = idleSeconds
+        self.minDwellSeconds = minDwellSeconds
+
+        self.conf = lowConf
+        self.activeFrames = 0
+        self.lastSwitch = time.monotonic()
+        self.lastActive = self.lastSwitch
+        self.previousRp = None
+
+    def rangeProfileChange(self, rp):
+        # Mean relative change of the range profile since the previous frame,
+        # the profile length changes with the configuration
+        rp = np.asarray(rp, dtype=np.float64)
+        previousRp = self.previousRp
+        self.previousRp = rp
+        if previousRp is None or previousRp.shape != rp.shape:
+            return 0.0
+        return float(np.mean(np.abs(rp - previousRp)) / (np.mean(previousRp) + 1.0))
+
+    def isActive(self, finalObj):
+        numObj = finalObj.get("numObj", 0)
+        rpChange = self.rangeProfileChange(finalObj["rp"]) if "rp" in finalObj else 0.0
+        return numObj >= self.minPoints or rpChange >= self.energyChange
+
+    def update(self, finalObj, now=None):
+        # Called once per parsed frame, returns the name of the configuration to
+        # switch to, None to stay
+        if now is None:
+            now = time.monotonic()
+        if self.isActive(finalObj):
+            self.activeFrames += 1
+            self.lastActive = now
+        else:
+            self.activeFrames = 0
+
+        if now - self.lastSwitch < self.minDwellSeconds:
+            return None
+        if self.conf == self.lowConf and self.activeFrames >= self.enterFrames:
+            return self.switch(self.highConf, now)
+        if self.conf == self.highConf and now - self.lastActive >= self.idleSeconds:
+            return self.switch(self.lowConf, now)
+        return None
+
+    def switch(self, conf, now):
+        self.conf = conf
+        self.lastSwitch = now
+        self.activeFrames = 0
+        self.previousRp = None
+        return conf
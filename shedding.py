@@ -0,0 +1,97 @@
+from tlv import (
+    MMWDEMO_OUTPUT_MSG_AZIMUT_STATIC_HEAT_MAP,
+    MMWDEMO_OUTPUT_MSG_RANGE_DOPPLER_HEAT_MAP,
+)
+
+# TLVs given up when the UART link falls behind, heaviest first
+SHED_ORDER = (
+    MMWDEMO_OUTPUT_MSG_AZIMUT_STATIC_HEAT_MAP,
+    MMWDEMO_OUTPUT_MSG_RANGE_DOPPLER_HEAT_MAP,
+)
+
+# Position of each TLV flag in a guiMonitor line after its subFrameIdx
+GUI_MONITOR_FLAGS = {
+    MMWDEMO_OUTPUT_MSG_AZIMUT_STATIC_HEAT_MAP: 3,
+    MMWDEMO_OUTPUT_MSG_RANGE_DOPPLER_HEAT_MAP: 4,
+}
+
+
+class TlvShedder:
+    def __init__(
+        self, radarConfig, highWater=2.0, lowWater=0.5, settleFrames=10, restoreAfter=50
+    ):
+        # Backlog thresholds are in packets of the configuration as uploaded
+        self.radarConfig = radarConfig
+        self.highWater = highWater
+        self.lowWater = lowWater
+        self.settleFrames = settleFrames
+        self.restoreAfter = restoreAfter
+
+        # Only the TLVs this configuration actually enables can be shed
+        self.sheddable = [
+            tlv_type
+            for tlv_type in SHED_ORDER
+            if any(tlv_type in s.enabledTlvs() for s in radarConfig.subFrames)
+        ]
+        self.packetBytes = max(
+            s.frameBytes(0, radarConfig.platform) for s in radarConfig.subFrames
+        )
+        self.level = 0
+        self.previousLevel = 0
+        self.calmFrames = 0
+        self.settling = 0
+        self.lastDroppedBytes = 0
+
+    def shedTlvs(self):
+        return self.sheddable[: self.level]
+
+    def guiMonitorLines(self):
+        # The uploaded guiMonitor lines with the shed TLVs switched off, SDK 1.x
+        # lines have no subFrameIdx
+        lines = []
+        for words in self.radarConfig.commands.get("guiMonitor", ()):
+            words = list(words)
+            offset = 1 if len(words) > 6 else 0
+            for tlv_type in self.shedTlvs():
+                words[offset + GUI_MONITOR_FLAGS[tlv_type]] = "0"
+            lines.append(" ".join(["guiMonitor"] + words))
+        return lines
+
+    def commands(self):
+        return ["sensorStop"] + self.guiMonitorLines() + ["sensorStart"]
+
+    def rollback(self):
+        # The radar rejected the commands of the last change and still runs
+        # the previous level, the change is retried once the backlog settled
+        self.level = self.previousLevel
+
+    def update(self, backlogBytes, droppedBytes):
+        # Called once per frame with the bytes waiting to be parsed and the
+        # running count of bytes dropped on overflow. Returns the CLI commands
+        # to send when the shed level changes, None otherwise.
+        dropped = droppedBytes > self.lastDroppedBytes
+        self.lastDroppedBytes = droppedBytes
+
+        # Give the backlog a few frames to drain after every change
+        if self.settling:
+            self.settling -= 1
+            return None
+
+        if dropped or backlogBytes > self.highWater * self.packetBytes:
+            self.calmFrames = 0
+            if self.level < len(self.sheddable):
+                self.previousLevel = self.level
+                self.level += 1
+                self.settling = self.settleFrames
+                return self.commands()
+        elif backlogBytes < self.lowWater * self.packetBytes:
+            self.calmFrames += 1
+            if self.level and self.calmFrames >= self.restoreAfter:
+                self.previousLevel = self.level
+                self.level -= 1
+                self.calmFrames = 0
+                self.settling = self.settleFrames
+                return self.commands()
+        else:
+            self.calmFrames = 0
+        return None
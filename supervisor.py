@@ -0,0 +1,91 @@
+import os
+import time
+
+import serial
+from serial.tools import list_ports
+
+from cli import CliError
+from ports import PortError
+
+# Seconds between two attempts to reopen the ports while the probe enumerates
+RECONNECT_POLL = 0.05
+# Frame periods without a packet before the device node is looked at
+SILENT_PERIODS = 3
+
+
+def portExists(name):
+    # Device nodes are looked up on the filesystem, Windows COM names are not
+    # paths and are looked up among the ports the OS lists
+    if os.path.dirname(name):
+        return os.path.exists(name)
+    return any(port.device == name for port in list_ports.comports())
+
+
+class PortSupervisor:
+    def __init__(self, poll=RECONNECT_POLL, timeout=None):
+        # Keeps a collector running across USB resets of the radar. A port
+        # that fails, or whose device node vanished while no packet came in,
+        # is given up and connect is retried every poll seconds until the
+        # probe is back, for timeout seconds or forever when None. Every
+        # outage is timed from its detection to the first good connect.
+        self.poll = poll
+        self.timeout = timeout
+        self.lastPacketNs = time.monotonic_ns()
+        self.outages = 0
+        self.downtimeNs = 0
+        self.lastDowntimeNs = 0
+
+    def packet(self):
+        self.lastPacketNs = time.monotonic_ns()
+
+    def check(self, port, framePeriodMs):
+        # A read from a tty whose device went away does not always fail, so
+        # once the stream has been quiet for a few frames the node is looked
+        # up, at most once per quiet spell
+        now = time.monotonic_ns()
+        if now - self.lastPacketNs > SILENT_PERIODS * framePeriodMs * 1e6:
+            self.lastPacketNs = now
+            if not portExists(port.port):
+                raise serial.SerialException(f"{port.port} is gone")
+
+    def waitFor(self, connect, log=print):
+        # Calls connect until it returns, the errors of a port that is not
+        # there yet or of a radar still booting are logged once each
+        startNs = time.monotonic_ns()
+        lastError = None
+        while True:
+            try:
+                ports = connect()
+                break
+            except (PortError, CliError, serial.SerialException, OSError) as e:
+                if str(e) != lastError:
+                    log(f"######## waiting for the radar: {e} ########")
+                    lastError = str(e)
+            if self.timeout is not None and (
+                time.monotonic_ns() - startNs > self.timeout * 1e9
+            ):
+                raise PortError(f"radar not back after {self.timeout} s: {lastError}")
+            time.sleep(self.poll)
+        self.packet()
+        return ports, time.monotonic_ns() - startNs
+
+    def connect(self, connect, log=print):
+        # First connection, the probe may still be enumerating at boot
+        return self.waitFor(connect, log)[0]
+
+    def reconnect(self, connect, log=print):
+        ports, self.lastDowntimeNs = self.waitFor(connect, log)
+        self.outages += 1
+        self.downtimeNs += self.lastDowntimeNs
+        return ports
+
+    def summary(self):
+        return (
+            f"{self.outages} port outages, {self.downtimeNs / 1e9:.3f} s down, "
+            f"last {self.lastDowntimeNs / 1e9:.3f} s"
+        )
+
+    def export(self, stageTimer):
+        stageTimer.counter("port_outages_total", self.outages)
+        stageTimer.counter("port_downtime_seconds_total", self.downtimeNs / 1e9)
+        stageTimer.gauge("port_last_downtime_seconds", self.lastDowntimeNs / 1e9)
@@ -0,0 +1,414 @@
+import argparse
+import os
+import time
+
+import numpy as np
+
+from config import PACKET_ALIGNMENT
+from input import Platform, Transform
+from planner import DEFAULT_NUM_OBJ, UART_BUDGET, UART_BYTES_PER_SECOND
+from tlv import POINT_DESCRIPTOR_DTYPE, POINT_DTYPE_V2, TLV_HEADER, headerStruct
+
+PLATFORMS = (Platform.xWR14xx, Platform.xWR16xx, Platform.xWR18xx)
+
+# Same ceiling updateInput starts from before narrowing it for a subprofile
+MAX_SLOPE = 100
+
+# Antenna layout the dashboard offers for every (TX, RX) pair
+AZIMUTH_RESOLUTIONS = {
+    (3, 4): "15 + Elevation",
+    (2, 4): "15",
+    (1, 4): "30",
+    (1, 2): "60",
+    (1, 1): "None (1Rx/1Tx)",
+}
+
+# Column of the guiMonitor flags as in planner.planTransform
+GUI_MONITOR_PLOTS = (
+    "scatterPlot",
+    "rangeProfile",
+    "noiseProfile",
+    "azimuthHeatmap",
+    "dopplerHeatmap",
+    "statistics",
+)
+
+# Figures of merit of the Pareto front, +1 when larger is better
+OBJECTIVES = {
+    "rangeResolution": -1,
+    "maxRange": 1,
+    "maxVelocity": 1,
+    "velocityResolution": -1,
+    "frameRate": 1,
+}
+
+# ------------------------------------------------------------------
+
+_platformLimits = {}
+
+
+def platformLimits(platform):
+    # Device limits exactly as updateInput sets them, read once per platform
+    if platform not in _platformLimits:
+        transform = Transform()
+        transform.setDefaultRangeResConfig()
+        transform.updateInput({"platform": platform})
+        _platformLimits[platform] = {
+            key: transform.Input[key]
+            for key in (
+                "L3_Memory_size",
+                "ADCBuf_memory_size",
+                "CFAR_memory_size",
+                "CFAR_window_memory_size",
+                "Min_Sampling_rate",
+                "Max_Sampling_Rate",
+                "Chirp_Start_Time",
+                "Chirp_end_guard_time",
+                "Min_Interchirp_dur",
+                "chirps_per_interrupt",
+                "ADC_bits",
+                "ADC_samples_type",
+                "max_number_of_tx",
+                "max_number_of_rx",
+                "lightSpeed",
+            )
+        }
+    return _platformLimits[platform]
+
+
+def sweep(
+    platforms=(Platform.xWR16xx,),
+    rampSlopes=np.arange(5, MAX_SLOPE + 1, 5),
+    numAdcSamples=np.arange(64, 1025, 16),
+    samplingRates=(2.5, 5.0, 6.25, 10.0, 12.5),
+    dopplerBins=(16, 32, 64, 128, 256),
+    frameRates=np.arange(1, 31),
+    numTx=(1, 2, 3),
+    numRx=4,
+    frequencyBand=77,
+    guiMonitor=(1, 1, 0, 0, 0, 1),
+    numObj=DEFAULT_NUM_OBJ,
+):
+    # Every combination of the candidate values is evaluated at once. Returns a
+    # dict of equally long arrays, one entry per candidate, with the derived
+    # figures of merit and a "feasible" mask for the checks updateInput makes
+    # one slider at a time.
+    grid = np.meshgrid(
+        np.arange(len(platforms)),
+        np.asarray(rampSlopes, dtype=np.float64),
+        np.asarray(numAdcSamples, dtype=np.int64),
+        np.asarray(samplingRates, dtype=np.float64),
+        np.asarray(dopplerBins, dtype=np.int64),
+        np.asarray(frameRates, dtype=np.float64),
+        np.asarray(numTx, dtype=np.int64),
+        indexing="ij",
+    )
+    platformIdx, slope, N, fs, D, fps, tx = (a.ravel() for a in grid)
+
+    def limit(key):
+        return np.array([platformLimits(p)[key] for p in platforms])[platformIdx]
+
+    rx = numRx
+    c = limit("lightSpeed")
+    chirps = D * tx
+    rangeFftSize = 1 << np.ceil(np.log2(N)).astype(np.int64)
+
+    # Chirp timing in us, bandwidth in MHz
+    adcTime = N / fs
+    sweepBw = slope * adcTime
+    chirpDuration = adcTime + limit("Chirp_Start_Time") + limit("Chirp_end_guard_time")
+    interChirp = limit("Min_Interchirp_dur")
+    chirpPeriod = chirpDuration + interChirp
+    framePeriod = 1000 / fps
+
+    rangeResolution = c / (2 * sweepBw)
+    maxRange = 0.8 * rangeResolution * N
+    maxVelocity = c * 1000 / (4 * frequencyBand * tx * chirpPeriod)
+    velocityResolution = 2 * maxVelocity / D
+
+    # Memory the demo needs for the radar cube and the ADC ping-pong buffers
+    chirpsPerInt = np.maximum(limit("chirps_per_interrupt"), 1)
+    l3Chirps = limit("L3_Memory_size") * 1024 / (4 * rx + 2 / tx) / rangeFftSize
+    adcBufSamples = limit("ADCBuf_memory_size") / (
+        rx * chirpsPerInt * limit("ADC_bits") / 8 * limit("ADC_samples_type")
+    )
+    is14xx = np.array([p == Platform.xWR14xx for p in platforms])[platformIdx]
+    cfarChirps = np.where(
+        is14xx,
+        np.minimum(
+            limit("CFAR_memory_size") * tx / (2 * rangeFftSize),
+            (limit("CFAR_window_memory_size") - rangeFftSize) * tx,
+        ),
+        np.inf,
+    )
+
+    # Packet size as SubFrame.frameBytes computes it for the parsed config
+    headerBytes = np.where(
+        is14xx,
+        headerStruct(Platform.xWR14xx).size,
+        headerStruct(Platform.xWR16xx).size,
+    )
+    tlvBytes = (
+        np.full(
+            N.shape, POINT_DESCRIPTOR_DTYPE.itemsize + numObj * POINT_DTYPE_V2.itemsize
+        ),
+        2 * rangeFftSize,
+        2 * rangeFftSize,
+        4 * rangeFftSize * rx * tx,
+        2 * rangeFftSize * D,
+        np.full(N.shape, 24),
+    )
+    packetBytes = headerBytes
+    for flag, (enabled, numBytes) in enumerate(zip(guiMonitor, tlvBytes)):
+        # The firmware skips the points TLV for empty frames
+        if enabled and (flag or numObj):
+            packetBytes = packetBytes + TLV_HEADER.size + numBytes
+    packetBytes = -(-packetBytes // PACKET_ALIGNMENT) * PACKET_ALIGNMENT
+    uartLoad = packetBytes * fps / UART_BYTES_PER_SECOND
+
+    maxBandwidth = 4000 if frequencyBand == 77 else 1000
+    feasible = (
+        (tx <= limit("max_number_of_tx"))
+        & (rx <= limit("max_number_of_rx"))
+        & (fs >= limit("Min_Sampling_rate"))
+        & (fs <= limit("Max_Sampling_Rate"))
+        & (slope * chirpDuration <= maxBandwidth)
+        & (chirps <= l3Chirps)
+        & (chirps <= cfarChirps)
+        & (chirps <= 255 * tx)
+        & (chirps <= 2 * frequencyBand / (sweepBw / 1000) * tx)
+        & (N <= adcBufSamples)
+        & (chirps * chirpPeriod <= framePeriod * 1000 / 2)
+        & (uartLoad <= UART_BUDGET)
+    )
+    feasible &= np.isin(tx, [t for t, r in AZIMUTH_RESOLUTIONS if r == rx])
+
+    return {
+        "platform": np.asarray(platforms, dtype=object)[platformIdx],
+        "frequencyBand": np.full(N.shape, frequencyBand),
+        "rampSlope": slope,
+        "numAdcSamples": N,
+        "samplingRate": fs,
+        "dopplerBins": D,
+        "numTx": tx,
+        "numRx": np.full(N.shape, rx),
+        "numChirps": chirps,
+        "rangeFftSize": rangeFftSize,
+        "chirpDuration": chirpDuration,
+        "interChirpDuration": np.broadcast_to(interChirp, N.shape),
+        "sweepBandwidth": sweepBw,
+        "frameRate": fps,
+        "framePeriod": framePeriod,
+        "rangeResolution": rangeResolution,
+        "maxRange": maxRange,
+        "maxVelocity": maxVelocity,
+        "velocityResolution": velocityResolution,
+        "packetBytes": packetBytes,
+        "uartLoad": uartLoad,
+        "feasible": feasible,
+    }
+
+
+def meetsTargets(
+    result,
+    rangeResolution=None,
+    maxRange=None,
+    maxVelocity=None,
+    velocityResolution=None,
+    frameRate=None,
+):
+    # Feasible candidates at least as good as every target given
+    mask = result["feasible"].copy()
+    targets = {
+        "rangeResolution": rangeResolution,
+        "maxRange": maxRange,
+        "maxVelocity": maxVelocity,
+        "velocityResolution": velocityResolution,
+        "frameRate": frameRate,
+    }
+    for name, target in targets.items():
+        if target is not None:
+            mask &= OBJECTIVES[name] * result[name] >= OBJECTIVES[name] * target
+    return mask
+
+
+PARETO_BLOCK = 256
+
+
+def dominates(a, b):
+    # dominates(a, b)[i, j] is True when a[i] beats b[j] on every objective
+    notWorse = np.ones((len(a), len(b)), dtype=bool)
+    better = np.zeros((len(a), len(b)), dtype=bool)
+    for k in range(a.shape[1]):
+        notWorse &= a[:, k, None] >= b[None, :, k]
+        better |= a[:, k, None] > b[None, :, k]
+    return notWorse & better
+
+
+def paretoFront(result, mask=None):
+    # Indices of the candidates in mask no other candidate beats on every
+    # objective at once
+    candidates = np.flatnonzero(result["feasible"] if mask is None else mask)
+    if not len(candidates):
+        return candidates
+    values = np.column_stack(
+        [sign * result[name][candidates] for name, sign in OBJECTIVES.items()]
+    )
+    # Candidates that only differ in the last objective, typically the frame
+    # rate, are dominated by the best of them
+    order = np.lexsort((-values[:, -1],) + tuple(values[:, :-1].T))
+    values = values[order]
+    first = np.ones(len(values), dtype=bool)
+    first[1:] = np.any(values[1:, :-1] != values[:-1, :-1], axis=1)
+    candidates = candidates[order][first]
+    values = values[first]
+
+    # A candidate can only be dominated by one with a larger normalized sum, so
+    # in that order each block is checked against the front found so far and
+    # against itself
+    span = np.ptp(values, axis=0)
+    score = ((values - values.min(axis=0)) / np.where(span, span, 1)).sum(axis=1)
+    order = np.argsort(-score, kind="stable")
+    candidates = candidates[order]
+    values = values[order]
+
+    front = []
+    frontValues = values[:0]
+    for start in range(0, len(values), PARETO_BLOCK):
+        block = values[start : start + PARETO_BLOCK]
+        keep = ~dominates(frontValues, block).any(axis=0)
+        keep &= ~dominates(block, block).any(axis=0)
+        front.append(candidates[start : start + PARETO_BLOCK][keep])
+        frontValues = np.concatenate([frontValues, block[keep]])
+    return np.concatenate(front)
+
+
+def candidate(result, index):
+    return {
+        name: column[index].item() if hasattr(column[index], "item") else column[index]
+        for name, column in result.items()
+    }
+
+
+def generateCandidateCfg(result, index, guiMonitor=(1, 1, 0, 0, 0, 1)):
+    # Configuration lines of one candidate, generated by the same Transform the
+    # dashboard uses with the swept values in place of the slider choices
+    point = candidate(result, index)
+    transform = Transform()
+    transform.setDefaultRangeResConfig()
+    transform.updateInput(
+        {
+            "platform": point["platform"],
+            "Frequency_band": point["frequencyBand"],
+            "Azimuth_Resolution": AZIMUTH_RESOLUTIONS[(point["numTx"], point["numRx"])],
+        }
+    )
+    transform.Input.update(
+        {
+            "Ramp_Slope": point["rampSlope"],
+            "Num_ADC_Samples": point["numAdcSamples"],
+            "ADC_Sampling_Rate": point["samplingRate"],
+            "Chirp_duration": transform.toCeil(point["chirpDuration"], 2),
+            "Inter_chirp_duration": point["interChirpDuration"],
+            "Number_of_chirps": point["numChirps"],
+            "Range_FFT_size": point["rangeFftSize"],
+            "Doppler_FFT_size": point["dopplerBins"],
+            "N_fft2d": point["dopplerBins"],
+            "Frame_duration": round(point["framePeriod"], 3),
+            "Sweep_BW": point["sweepBandwidth"],
+            "Range_Resolution": round(point["rangeResolution"], 4),
+            "Maximum_range": round(point["maxRange"], 2),
+            "Maximum_radial_velocity": round(point["maxVelocity"], 2),
+            "Radial_velocity_Resolution": round(point["velocityResolution"], 2),
+        }
+    )
+    return transform.generateCfg(
+        plots=dict(zip(GUI_MONITOR_PLOTS, map(bool, guiMonitor)))
+    )
+
+
+def formatCandidate(point):
+    return (
+        f"{point['platform']} {point['numTx']}Tx{point['numRx']}Rx "
+        f"{point['rampSlope']:g} MHz/us x {point['numAdcSamples']} @ "
+        f"{point['samplingRate']:g} Msps, {point['numChirps']} chirps, "
+        f"{point['frameRate']:g} fps: "
+        f"res {point['rangeResolution']:.3f} m, range {point['maxRange']:.1f} m, "
+        f"vmax {point['maxVelocity']:.2f} m/s, vres {point['velocityResolution']:.3f} m/s, "
+        f"UART {point['uartLoad']:.0%}"
+    )
+
+
+# ------------------------------------------------------------------
+
+
+def parseArg():
+    parser = argparse.ArgumentParser(
+        description="Pareto-optimal radar configurations meeting the given targets"
+    )
+    parser.add_argument(
+        "--platform",
+        nargs="+",
+        default=[Platform.xWR16xx],
+        choices=PLATFORMS,
+    )
+    parser.add_argument("--band", type=int, default=77, choices=(76, 77))
+    parser.add_argument("--num-rx", type=int, default=4)
+    parser.add_argument("--range-res", type=float, help="Largest range resolution, m")
+    parser.add_argument("--max-range", type=float, help="Smallest maximum range, m")
+    parser.add_argument(
+        "--max-velocity", type=float, help="Smallest maximum velocity, m/s"
+    )
+    parser.add_argument(
+        "--velocity-res", type=float, help="Largest velocity resolution, m/s"
+    )
+    parser.add_argument("--fps", type=float, help="Smallest frame rate")
+    parser.add_argument(
+        "--num-obj",
+        type=int,
+        default=DEFAULT_NUM_OBJ,
+        help="Detected points assumed per frame",
+    )
+    parser.add_argument(
+        "--emit",
+        metavar="DIR",
+        help="Write the configuration of every front member into DIR",
+    )
+    parser.add_argument(
+        "--top", type=int, default=20, help="Front members to print and emit"
+    )
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parseArg()
+    start = time.perf_counter()
+    result = sweep(
+        platforms=tuple(args.platform),
+        numRx=args.num_rx,
+        frequencyBand=args.band,
+        numObj=args.num_obj,
+    )
+    mask = meetsTargets(
+        result,
+        rangeResolution=args.range_res,
+        maxRange=args.max_range,
+        maxVelocity=args.max_velocity,
+        velocityResolution=args.velocity_res,
+        frameRate=args.fps,
+    )
+    front = paretoFront(result, mask)
+    elapsed = time.perf_counter() - start
+    print(
+        f"{len(result['feasible'])} candidates, {np.count_nonzero(result['feasible'])} "
+        f"feasible, {np.count_nonzero(mask)} on target, {len(front)} on the front "
+        f"({elapsed:.2f} s)"
+    )
+    front = front[np.argsort(result["rangeResolution"][front], kind="stable")]
+    for n, index in enumerate(front[: args.top]):
+        print(f"{n:3}  {formatCandidate(candidate(result, index))}")
+        if args.emit:
+            os.makedirs(args.emit, exist_ok=True)
+            with open(os.path.join(args.emit, f"sweep_{n}.cfg"), "w") as f:
+                f.write("\n".join(generateCandidateCfg(result, index)) + "\n")
+    raise SystemExit(0 if len(front) else 1)
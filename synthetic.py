@@ -0,0 +1,303 @@
+import argparse
+import math
+
+import numpy as np
+
+from clock import CYCLE_COUNTER_WRAP, platformClockHz
+from config import PACKET_ALIGNMENT, loadConfig
+from planner import DEFAULT_NUM_OBJ
+from tlv import (
+    MMWDEMO_OUTPUT_MSG_AZIMUT_STATIC_HEAT_MAP,
+    MMWDEMO_OUTPUT_MSG_DETECTED_POINTS_SIDE_INFO,
+    MMWDEMO_OUTPUT_MSG_NOISE_PROFILE,
+    MMWDEMO_OUTPUT_MSG_RANGE_DOPPLER_HEAT_MAP,
+    MMWDEMO_OUTPUT_MSG_STATS,
+    MMWDEMO_UART_MSG_DETECTED_POINTS,
+    MMWDEMO_UART_MSG_RANGE_PROFILE,
+    PLATFORM_IDS,
+    POINT_DESCRIPTOR_DTYPE,
+    POINT_DTYPE_V2,
+    POINT_DTYPE_V3,
+    SIDE_INFO_DTYPE,
+    STATS_STRUCT,
+    TLV_HEADER,
+    headerStruct,
+)
+
+MAGIC_WORD = bytes([2, 1, 4, 3, 6, 5, 8, 7])
+PLATFORM_WORDS = {platform: platformId for platformId, platform in PLATFORM_IDS.items()}
+# Fraction bits of the x, y, z of SDK 2.x points
+XYZ_Q_FORMAT = 9
+# Range profiles and the range-Doppler map are log2 magnitudes in Q9
+LOG_MAGNITUDE_Q_FORMAT = 9
+NOISE_FLOOR_LOG2 = 12.0
+TARGET_GAIN_LOG2 = 6.0
+
+CORRUPTIONS = ("drop", "duplicate", "truncate", "bitflip", "garbage")
+
+
+def sdkVersionWord(sdkVersion):
+    # "02.00" as the header writes it, 0x02000004
+    major, minor = (int(part) for part in (sdkVersion or "02.00").split(".")[:2])
+    return (major << 24) | (minor << 16) | 0x0004
+
+
+class PacketGenerator:
+    def __init__(
+        self,
+        radarConfig,
+        numObj=DEFAULT_NUM_OBJ,
+        noise=0.5,
+        seed=0,
+        cpuClockHz=None,
+        sdkVersion=None,
+    ):
+        # Byte-exact UART packets of the out-of-box demo for a configuration,
+        # one per subframe and frame. Targets are placed at random within the
+        # field of view and show up consistently in every enabled TLV: as
+        # points, as peaks of the range profile and of both heatmaps. noise is
+        # the standard deviation of the log2 magnitudes. The cycle counter
+        # runs at cpuClockHz, the rate of the platform by default. The same
+        # seed gives the same bytes.
+        self.radarConfig = radarConfig
+        self.numObj = numObj
+        self.noise = noise
+        self.version = sdkVersionWord(sdkVersion or radarConfig.sdkVersion)
+        self.platform = radarConfig.platform
+        if cpuClockHz is None:
+            cpuClockHz = platformClockHz(self.platform)
+        self.cpuClockHz = cpuClockHz
+        self.header = headerStruct(self.platform)
+        self.rng = np.random.default_rng(seed)
+        self.frameNumber = 0
+        self.lastTargets = None
+
+    @property
+    def sdkMajorVersion(self):
+        return self.version >> 24
+
+    def targets(self, subFrame, numObj):
+        rng = self.rng
+        rangeIdx = rng.integers(1, subFrame.numRangeBins, numObj)
+        dopplerIdx = rng.integers(
+            -(subFrame.numDopplerBins // 2), subFrame.numDopplerBins // 2, numObj
+        )
+        azimuth = rng.uniform(-math.pi / 3, math.pi / 3, numObj)
+        elevation = rng.uniform(-math.pi / 12, math.pi / 12, numObj)
+        r = rangeIdx * subFrame.rangeIdxToMeters
+        return {
+            "rangeIdx": rangeIdx,
+            "dopplerIdx": dopplerIdx,
+            "azimuth": azimuth,
+            "x": r * np.cos(elevation) * np.sin(azimuth),
+            "y": r * np.cos(elevation) * np.cos(azimuth),
+            "z": r * np.sin(elevation),
+            "velocity": dopplerIdx * subFrame.dopplerResolutionMps,
+            "peakVal": rng.integers(200, 4000, numObj),
+            "snr": rng.integers(100, 300, numObj),
+            "noise": rng.integers(50, 150, numObj),
+        }
+
+    def logMagnitude(self, shape, peaks=None):
+        # Noise floor with targets on top, as Q9 uint16
+        values = NOISE_FLOOR_LOG2 + self.noise * self.rng.standard_normal(shape)
+        if peaks is not None:
+            values[peaks] += TARGET_GAIN_LOG2
+        values = np.clip(values * 2**LOG_MAGNITUDE_Q_FORMAT, 0, 2**16 - 1)
+        return values.astype("<u2")
+
+    def pointsTlv(self, targets):
+        numObj = len(targets["rangeIdx"])
+        if self.sdkMajorVersion >= 3:
+            points = np.zeros(numObj, POINT_DTYPE_V3)
+            for name in ("x", "y", "z", "velocity"):
+                points[name] = targets[name]
+            sideInfo = np.zeros(numObj, SIDE_INFO_DTYPE)
+            sideInfo["snr"] = targets["snr"]
+            sideInfo["noise"] = targets["noise"]
+            return points.tobytes(), sideInfo.tobytes()
+
+        descriptor = np.zeros(1, POINT_DESCRIPTOR_DTYPE)
+        descriptor["numObj"] = numObj
+        descriptor["xyzQFormat"] = XYZ_Q_FORMAT
+        points = np.zeros(numObj, POINT_DTYPE_V2)
+        points["rangeIdx"] = targets["rangeIdx"]
+        points["dopplerIdx"] = targets["dopplerIdx"]
+        points["peakVal"] = targets["peakVal"]
+        for name in ("x", "y", "z"):
+            points[name] = np.round(targets[name] * 2**XYZ_Q_FORMAT)
+        return descriptor.tobytes() + points.tobytes(), None
+
+    def azimuthTlv(self, subFrame, targets):
+        # int16 {real, imag} per range bin and virtual antenna, each target a
+        # plane wave across the virtual array
+        numVirtualAnt = subFrame.numVirtualAnt
+        amplitude = 2**NOISE_FLOOR_LOG2 / 64
+        q = self.rng.normal(0, amplitude, (subFrame.numRangeBins, numVirtualAnt, 2))
+        antennas = np.arange(numVirtualAnt)
+        for rangeIdx, azimuth in zip(targets["rangeIdx"], targets["azimuth"]):
+            phase = math.pi * antennas * math.sin(azimuth)
+            gain = amplitude * 2**TARGET_GAIN_LOG2
+            q[rangeIdx, :, 0] += gain * np.cos(phase)
+            q[rangeIdx, :, 1] += gain * np.sin(phase)
+        return np.clip(np.round(q), -(2**15), 2**15 - 1).astype("<i2").tobytes()
+
+    def statsTlv(self, subFrame, numObj):
+        # Processing time grows with the number of points, the margin is what
+        # is left of the frame period
+        processingUs = int(2000 + 15 * numObj + abs(self.rng.normal(0, 50)))
+        transmitUs = int(300 + 2 * numObj)
+        marginUs = int(subFrame.framePeriodicity * 1e3) - processingUs - transmitUs
+        activeLoad = min(99, 20 + numObj // 4)
+        return STATS_STRUCT.pack(
+            processingUs, transmitUs, marginUs, 0, activeLoad, activeLoad // 2
+        )
+
+    def packet(self, subFrameNumber=0, numObj=None):
+        # Next packet of the given subframe. The frame number moves on with
+        # subframe 0.
+        if subFrameNumber == 0:
+            self.frameNumber += 1
+        subFrame = self.radarConfig.subFrame(subFrameNumber)
+        numObj = self.numObj if numObj is None else numObj
+        targets = self.targets(subFrame, numObj)
+        self.lastTargets = targets
+        peaks = targets["rangeIdx"]
+        rangeDopplerPeaks = (peaks, targets["dopplerIdx"] % subFrame.numDopplerBins)
+
+        tlvs = []
+        for tlv_type in subFrame.enabledTlvs():
+            if tlv_type == MMWDEMO_UART_MSG_DETECTED_POINTS:
+                # The firmware skips the points TLV for empty frames
+                if numObj:
+                    points, sideInfo = self.pointsTlv(targets)
+                    tlvs.append((tlv_type, points))
+                    if sideInfo is not None:
+                        tlvs.append(
+                            (MMWDEMO_OUTPUT_MSG_DETECTED_POINTS_SIDE_INFO, sideInfo)
+                        )
+            elif tlv_type == MMWDEMO_UART_MSG_RANGE_PROFILE:
+                tlvs.append(
+                    (
+                        tlv_type,
+                        self.logMagnitude(subFrame.numRangeBins, peaks).tobytes(),
+                    )
+                )
+            elif tlv_type == MMWDEMO_OUTPUT_MSG_NOISE_PROFILE:
+                tlvs.append(
+                    (tlv_type, self.logMagnitude(subFrame.numRangeBins).tobytes())
+                )
+            elif tlv_type == MMWDEMO_OUTPUT_MSG_AZIMUT_STATIC_HEAT_MAP:
+                tlvs.append((tlv_type, self.azimuthTlv(subFrame, targets)))
+            elif tlv_type == MMWDEMO_OUTPUT_MSG_RANGE_DOPPLER_HEAT_MAP:
+                # Range-major, the Doppler bins of one range bin are contiguous
+                shape = (subFrame.numRangeBins, subFrame.numDopplerBins)
+                tlvs.append(
+                    (tlv_type, self.logMagnitude(shape, rangeDopplerPeaks).tobytes())
+                )
+            elif tlv_type == MMWDEMO_OUTPUT_MSG_STATS:
+                tlvs.append((tlv_type, self.statsTlv(subFrame, numObj)))
+
+        payload = b"".join(
+            TLV_HEADER.pack(tlv_type, len(data)) + data for tlv_type, data in tlvs
+        )
+        totalPacketLen = -(-(self.header.size + len(payload)) // PACKET_ALIGNMENT)
+        totalPacketLen *= PACKET_ALIGNMENT
+        # The cycle counter runs at the CPU clock from the first frame on, the
+        # subframes of a frame follow each other
+        elapsedMs = (self.frameNumber - 1) * self.radarConfig.framePeriodicity
+        elapsedMs += sum(
+            s.framePeriodicity for s in self.radarConfig.subFrames[:subFrameNumber]
+        )
+        timeCpuCycles = int(elapsedMs * 1e-3 * self.cpuClockHz) % CYCLE_COUNTER_WRAP
+        fields = [
+            MAGIC_WORD,
+            self.version,
+            totalPacketLen,
+            PLATFORM_WORDS.get(self.platform, PLATFORM_WORDS["xWR16xx"]),
+            self.frameNumber,
+            timeCpuCycles,
+            numObj,
+            len(tlvs),
+        ]
+        if self.header.size > 36:
+            fields.append(subFrameNumber)
+        packet = self.header.pack(*fields) + payload
+        return packet.ljust(totalPacketLen, b"\0")
+
+    def frames(self, count):
+        # Packets of count frames, every subframe in order
+        for _ in range(count):
+            for subFrameNumber in range(len(self.radarConfig.subFrames)):
+                yield self.packet(subFrameNumber)
+
+
+def corrupt(packets, rate, kinds=CORRUPTIONS, seed=0):
+    # Damages a fraction rate of the packets with one of kinds each, as the
+    # UART does: whole packets lost or repeated, packets cut short, flipped
+    # bits and stray bytes between packets
+    rng = np.random.default_rng(seed)
+    for packet in packets:
+        if rng.random() >= rate:
+            yield packet
+            continue
+        kind = kinds[rng.integers(len(kinds))]
+        if kind == "duplicate":
+            yield packet
+            yield packet
+        elif kind == "truncate":
+            yield packet[: rng.integers(1, len(packet))]
+        elif kind == "bitflip":
+            damaged = bytearray(packet)
+            for idX in rng.integers(0, len(packet), 4):
+                damaged[idX] ^= 1 << int(rng.integers(8))
+            yield bytes(damaged)
+        elif kind == "garbage":
+            yield rng.integers(0, 256, rng.integers(1, 256), dtype="uint8").tobytes()
+            yield packet
+
+
+def stream(radarConfig, count, rate=0.0, kinds=CORRUPTIONS, seed=0, **kwargs):
+    # Bytes of count frames, as they come out of the data port
+    packets = PacketGenerator(radarConfig, seed=seed, **kwargs).frames(count)
+    if rate:
+        packets = corrupt(packets, rate, kinds, seed)
+    return b"".join(packets)
+
+
+# ------------------------------------------------------------------
+
+
+def parseArg():
+    parser = argparse.ArgumentParser(
+        description="Write a synthetic data port stream for a configuration"
+    )
+    parser.add_argument("cfg", help="Configuration file")
+    parser.add_argument("out", help="Output file, raw bytes")
+    parser.add_argument("--frames", type=int, default=1000)
+    parser.add_argument("--num-obj", type=int, default=DEFAULT_NUM_OBJ)
+    parser.add_argument("--noise", type=float, default=0.5)
+    parser.add_argument(
+        "--corrupt", type=float, default=0.0, help="Fraction of damaged packets"
+    )
+    parser.add_argument("--kinds", nargs="+", choices=CORRUPTIONS, default=CORRUPTIONS)
+    parser.add_argument("--sdk", help="SDK version of the packets, e.g. 03.05")
+    parser.add_argument("--seed", type=int, default=0)
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parseArg()
+    data = stream(
+        loadConfig(args.cfg),
+        args.frames,
+        args.corrupt,
+        tuple(args.kinds),
+        args.seed,
+        numObj=args.num_obj,
+        noise=args.noise,
+        sdkVersion=args.sdk,
+    )
+    with open(args.out, "wb") as f:
+        f.write(data)
+    print(f"{args.out}: {len(data)} B, {args.frames} frames")
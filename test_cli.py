@@ -0,0 +1,78 @@
+import pytest
+
+from cli import CliError, reconfigurationCommands, switchConfig
+from config import loadConfig
+from shedding import TlvShedder
+from tlv import MMWDEMO_OUTPUT_MSG_RANGE_DOPPLER_HEAT_MAP
+
+
+def test_switch_restores_shed_tlvs():
+    # The range-Doppler TLV shed under macro_7fps comes back with micro_2fps,
+    # although both upload the same guiMonitor line
+    current = loadConfig("Configurations/macro_7fps.cfg")
+    target = loadConfig("Configurations/micro_2fps.cfg")
+    shedder = TlvShedder(current)
+    while MMWDEMO_OUTPUT_MSG_RANGE_DOPPLER_HEAT_MAP not in shedder.shedTlvs():
+        shedder.settling = 0
+        shedder.update(float("inf"), 0)
+    assert "guiMonitor -1 1 1 1 0 0 1" in shedder.guiMonitorLines()
+
+    commands = reconfigurationCommands(current, target, shedder.guiMonitorLines())
+    assert "guiMonitor -1 1 1 1 0 1 1" in commands
+    assert MMWDEMO_OUTPUT_MSG_RANGE_DOPPLER_HEAT_MAP in target.subFrame(0).enabledTlvs()
+
+
+def test_switch_without_running_lines_sends_differences_only():
+    current = loadConfig("Configurations/macro_7fps.cfg")
+    commands = reconfigurationCommands(current, current)
+    assert commands == ["sensorStop", "sensorStart"]
+
+
+class StubCli:
+    # Acknowledges every command, except each of rejected once
+    def __init__(self, rejected=()):
+        self.rejected = set(rejected)
+        self.timeout = None
+        self.sent = []
+        self.responses = []
+
+    def reset_input_buffer(self):
+        self.responses.clear()
+
+    def write(self, data):
+        command = data.decode().strip()
+        self.sent.append(command)
+        if command in self.rejected:
+            self.rejected.discard(command)
+            self.responses.append(b"Error -1\n")
+        else:
+            self.responses.append(b"Done\n")
+
+    def readline(self):
+        return self.responses.pop(0) if self.responses else b""
+
+
+def test_rejected_difference_falls_back_to_the_target():
+    current = loadConfig("Configurations/macro_7fps.cfg")
+    target = loadConfig("Configurations/micro_2fps.cfg")
+    commands = reconfigurationCommands(current, target)
+    cli = StubCli(rejected=[commands[1]])
+    stops = []
+    latencies = switchConfig(
+        cli, current, target, stopped=lambda: stops.append(1), log=lambda e: None
+    )
+    assert stops == [1]
+    assert [command for command, _ in latencies] == [
+        line for line in target.lines if not line.startswith("%")
+    ]
+
+
+def test_rejected_stop_raises_before_the_stream_is_touched():
+    current = loadConfig("Configurations/macro_7fps.cfg")
+    target = loadConfig("Configurations/micro_2fps.cfg")
+    cli = StubCli(rejected=["sensorStop"])
+    stops = []
+    with pytest.raises(CliError):
+        switchConfig(cli, current, target, stopped=lambda: stops.append(1))
+    assert stops == []
+    assert cli.sent == ["sensorStop"]
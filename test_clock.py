@@ -0,0 +1,53 @@
+import numpy as np
+
+from clock import CYCLE_COUNTER_WRAP, ClockModel
+from config import loadConfig
+from platforms import Platform
+from synthetic import PacketGenerator
+from tlv import HeaderDecoder
+
+LATENCY_NS = 2_000_000
+
+
+def feed(clockModel, cpuClockHz, periodMs, frames, skip=()):
+    # Arrivals at a fixed latency after a counter running at cpuClockHz
+    for frame in range(frames):
+        if frame in skip:
+            continue
+        elapsedNs = int(frame * periodMs * 1e6)
+        timeCpuCycles = int(elapsedNs * cpuClockHz / 1e9) % CYCLE_COUNTER_WRAP
+        clockModel.update(timeCpuCycles, 10**12 + elapsedNs + LATENCY_NS)
+
+
+def test_xwr16xx_counter_runs_at_600_mhz():
+    clockModel = ClockModel(Platform.xWR16xx)
+    feed(clockModel, 600e6, 100, 500)
+    assert abs(clockModel.driftPpm) < 1
+    assert clockModel.resets == 0
+
+
+def test_xwr16xx_wraps_across_a_long_gap():
+    # 20 s without packets, the counter wraps about three times meanwhile
+    clockModel = ClockModel(Platform.xWR16xx)
+    feed(clockModel, 600e6, 100, 500, skip=range(100, 300))
+    assert abs(clockModel.driftPpm) < 1
+    assert clockModel.resets == 0
+
+
+def test_xwr14xx_counter_runs_at_200_mhz():
+    clockModel = ClockModel(Platform.xWR14xx)
+    feed(clockModel, 200e6, 100, 500)
+    assert abs(clockModel.driftPpm) < 1
+
+
+def test_synthetic_packets_count_at_the_platform_rate():
+    radarConfig = loadConfig("Configurations/pointcloud_configuration.cfg")
+    generator = PacketGenerator(radarConfig, numObj=4)
+    headerDecoder = HeaderDecoder(radarConfig.platform)
+    clockModel = ClockModel(radarConfig.platform)
+    for frame in range(100):
+        byteBuffer = np.frombuffer(generator.packet(), dtype="uint8")
+        timeCpuCycles = headerDecoder.decode(byteBuffer)[5]
+        elapsedNs = int(frame * radarConfig.framePeriodicity * 1e6)
+        clockModel.update(timeCpuCycles, 10**12 + elapsedNs + LATENCY_NS)
+    assert abs(clockModel.driftPpm) < 1
@@ -0,0 +1,317 @@
+import math
+import struct
+from functools import lru_cache
+
+import numpy as np
+
+import fft
+from platforms import Platform
+
+# TLV message types sent by the mmWave SDK out-of-box demo
+MMWDEMO_UART_MSG_DETECTED_POINTS = 1
+MMWDEMO_UART_MSG_RANGE_PROFILE = 2
+MMWDEMO_OUTPUT_MSG_NOISE_PROFILE = 3
+MMWDEMO_OUTPUT_MSG_AZIMUT_STATIC_HEAT_MAP = 4
+MMWDEMO_OUTPUT_MSG_RANGE_DOPPLER_HEAT_MAP = 5
+MMWDEMO_OUTPUT_MSG_STATS = 6
+MMWDEMO_OUTPUT_MSG_DETECTED_POINTS_SIDE_INFO = 7
+
+# SDK 1.x/2.x: a {numObj, xyzQFormat} descriptor followed by int16 Q-format points
+POINT_DESCRIPTOR_DTYPE = np.dtype([("numObj", "<u2"), ("xyzQFormat", "<u2")])
+POINT_DTYPE_V2 = np.dtype(
+    [
+        ("rangeIdx", "<u2"),
+        ("dopplerIdx", "<i2"),
+        ("peakVal", "<u2"),
+        ("x", "<i2"),
+        ("y", "<i2"),
+        ("z", "<i2"),
+    ]
+)
+
+# SDK 3.x: float32 cartesian points, with SNR/noise (0.1 dB steps) in TLV 7
+POINT_DTYPE_V3 = np.dtype(
+    [("x", "<f4"), ("y", "<f4"), ("z", "<f4"), ("velocity", "<f4")]
+)
+SIDE_INFO_DTYPE = np.dtype([("snr", "<i2"), ("noise", "<i2")])
+
+
+# Frame header: magic word, version, totalPacketLen, platform, frameNumber,
+# timeCpuCycles, numDetectedObj, numTLVs and, except on xWR14xx, subFrameNumber
+HEADER_PLATFORM_OFFSET = 16
+PLATFORM_IDS = {
+    0xA1443: Platform.xWR14xx,
+    0xA1642: Platform.xWR16xx,
+    0xA1843: Platform.xWR18xx,
+}
+TLV_HEADER = struct.Struct("<2I")
+# Statistics TLV, times and margins in us, CPU loads in percent
+STATS_STRUCT = struct.Struct("<2I2i2I")
+STATS_FIELDS = (
+    "interFrameProcessingTime",
+    "transmitOutputTime",
+    "interFrameProcessingMargin",
+    "interChirpProcessingMargin",
+    "activeFrameCPULoad",
+    "interFrameCPULoad",
+)
+
+# Azimuth heatmap grid, built on the first heatmap
+rangeAzimuthHeatMapGridInit = 0
+xlin, ylin = [], []
+NUM_ANGLE_BINS = 64
+range_depth = 10
+range_width = 5
+
+
+@lru_cache(maxsize=None)
+def headerStruct(platform):
+    if platform == Platform.xWR14xx:
+        return struct.Struct("<8s7I")
+    return struct.Struct("<8s8I")
+
+
+class HeaderDecoder:
+    def __init__(self, platform=None):
+        # platform comes from the configuration when known, otherwise it is
+        # detected from the first packet and kept for the rest of the session
+        self.platform = None
+        self.struct = None
+        self.size = 0
+        if platform is not None:
+            self.select(platform)
+
+    def select(self, platform):
+        self.platform = platform
+        self.struct = headerStruct(platform)
+        self.size = self.struct.size
+
+    def decode(self, byteBuffer):
+        # Returns (magicNumber, version, totalPacketLen, platform, frameNumber,
+        # timeCpuCycles, numDetectedObj, numTLVs, subFrameNumber)
+        if self.struct is None:
+            (platformId,) = struct.unpack_from("<I", byteBuffer, HEADER_PLATFORM_OFFSET)
+            self.select(PLATFORM_IDS.get(platformId, Platform.xWR16xx))
+        header = self.struct.unpack_from(byteBuffer, 0)
+        if self.platform == Platform.xWR14xx:
+            header += (0,)
+        return header
+
+
+def sdkMajorVersion(version):
+    # The header version is 0xMMmmbbdd, e.g. 0x03050004 for SDK 3.5.0.4
+    return (int(version) >> 24) & 0xFF
+
+
+def structView(byteBuffer, idX, dtype, count):
+    # Zero-copy view of `count` records starting at byteBuffer[idX]
+    return byteBuffer[idX : idX + count * dtype.itemsize].view(dtype)
+
+
+# ------------------------------------------------------------------
+
+
+# Function to process detected points tlvtype=1 (SDK 1.x/2.x layout)
+def processDetectedPoints(byteBuffer, idX, subFrame):
+    descriptor = structView(byteBuffer, idX, POINT_DESCRIPTOR_DTYPE, 1)[0]
+    tlv_numObj = int(descriptor["numObj"])
+    tlv_xyzQFormat = 2 ** int(descriptor["xyzQFormat"])
+    idX += POINT_DESCRIPTOR_DTYPE.itemsize
+
+    points = structView(byteBuffer, idX, POINT_DTYPE_V2, tlv_numObj)
+
+    # Older firmware sends the Doppler index unsigned, wrap it around zero
+    numDopplerBins = subFrame.numDopplerBins
+    dopplerIdx = points["dopplerIdx"].astype(np.int32)
+    dopplerIdx[dopplerIdx > (numDopplerBins // 2 - 1)] -= numDopplerBins
+
+    rangeIdx = points["rangeIdx"]
+    detObj = {
+        "numObj": tlv_numObj,
+        "rangeIdx": rangeIdx.tolist(),
+        "range": (rangeIdx * subFrame.rangeIdxToMeters).tolist(),
+        "dopplerIdx": dopplerIdx.tolist(),
+        "doppler": (dopplerIdx * subFrame.dopplerResolutionMps).tolist(),
+        "peakVal": points["peakVal"].tolist(),
+        "x": (points["x"] / tlv_xyzQFormat).tolist(),
+        "y": (points["y"] / tlv_xyzQFormat).tolist(),
+        "z": (points["z"] / tlv_xyzQFormat).tolist(),
+    }
+    return detObj
+
+
+# Function to process detected points tlvtype=1 together with their side
+# info tlvtype=7 (SDK 3.x layout). sideIdX is None when TLV 7 is disabled.
+def processDetectedPointsV3(byteBuffer, idX, tlv_length, sideIdX=None):
+    tlv_numObj = tlv_length // POINT_DTYPE_V3.itemsize
+    points = structView(byteBuffer, idX, POINT_DTYPE_V3, tlv_numObj)
+
+    x = points["x"]
+    y = points["y"]
+    z = points["z"]
+    detObj = {
+        "numObj": tlv_numObj,
+        "range": np.sqrt(x * x + y * y + z * z).tolist(),
+        "doppler": points["velocity"].tolist(),
+        "x": x.tolist(),
+        "y": y.tolist(),
+        "z": z.tolist(),
+    }
+    if sideIdX is not None:
+        sideInfo = structView(byteBuffer, sideIdX, SIDE_INFO_DTYPE, tlv_numObj)
+        detObj["snr"] = (sideInfo["snr"] * 0.1).tolist()
+        detObj["noise"] = (sideInfo["noise"] * 0.1).tolist()
+    return detObj
+
+
+# ------------------------------------------------------------------
+
+# Helper methods for processing
+
+
+def tensor_f(vec1, vec2):
+    t = []
+    for r in range(0, len(vec1)):
+        t.append(np.multiply(np.array(vec2), vec1[r]))
+    return t
+
+
+def meshgrid(xvec, yvec):
+    x = []
+    y = []
+    for r in range(0, len(yvec)):
+        for c in range(0, len(xvec)):
+            x.append(xvec[c])
+            y.append(yvec[r])
+    return [x, y]
+
+
+def reshape_rowbased(vec, rows, cols):
+    t = []
+    start = 0
+    for r in range(0, rows):
+        row = vec[start : start + cols]
+        t.append(row)
+        start += cols
+    return t
+
+
+def processRangeNoiseProfile(byteBuffer, idX, detObj, subFrame, isRangeProfile):
+    traceidX = 0
+    if isRangeProfile:
+        traceidX = 0
+    else:
+        traceidX = 2
+    numrp = 2 * subFrame.numRangeBins
+    rp = byteBuffer[idX : idX + numrp].view("<u2").tolist()
+    rp_x = subFrame.rangeArray
+    idX += numrp
+    if traceidX == 0:
+        noiseObj = {"rp": rp}
+        return noiseObj
+    elif traceidX == 2:
+        noiseObj = {"noiserp": rp}
+        return noiseObj
+
+
+def processAzimuthHeatMap(byteBuffer, idX, subFrame):
+    numTxAnt = subFrame.numTxAnt
+    numRxAnt = subFrame.numRxAnt
+    numBytes = subFrame.tlvBytes[MMWDEMO_OUTPUT_MSG_AZIMUT_STATIC_HEAT_MAP]
+    q_rows = numTxAnt * numRxAnt
+    q_cols = subFrame.numRangeBins
+    # One int16 {real, imag} pair per virtual antenna and range bin
+    q = byteBuffer[idX : idX + numBytes].view("<i2").reshape(q_cols, q_rows, 2)
+    idX += numBytes
+    QQ = []
+    NUM_ANGLE_BINS = 64
+    for i in range(0, q_cols):
+        real = np.zeros(NUM_ANGLE_BINS)
+        img = np.zeros(NUM_ANGLE_BINS)
+        real[:q_rows] = q[i, :, 0]
+        img[:q_rows] = q[i, :, 1]
+        fft.transform(real, img)
+        for ri in range(0, NUM_ANGLE_BINS):
+            real[ri] = int(math.sqrt(real[ri] * real[ri] + img[ri] * img[ri]))
+
+        QQ.append(
+            [
+                y
+                for x in [
+                    real[int(NUM_ANGLE_BINS / 2) :],
+                    real[0 : int(NUM_ANGLE_BINS / 2)],
+                ]
+                for y in x
+            ]
+        )
+    fliplrQQ = []
+    for tmpr in range(0, len(QQ)):
+        fliplrQQ.append(QQ[tmpr][1:].reverse())
+    global rangeAzimuthHeatMapGridInit
+    if rangeAzimuthHeatMapGridInit == 0:
+        angles_rad = np.multiply(
+            np.arange(-NUM_ANGLE_BINS / 2 + 1, NUM_ANGLE_BINS / 2, 1),
+            2 / NUM_ANGLE_BINS,
+        )
+        theta = []
+        for ang in angles_rad:
+            theta.append(math.asin(ang))
+        range_val = subFrame.rangeArray
+        sin_theta = []
+        cos_theta = []
+        for t in theta:
+            sin_theta.append(math.sin(t))
+            cos_theta.append(math.cos(t))
+        posX = tensor_f(range_val, sin_theta)
+        posY = tensor_f(range_val, cos_theta)
+
+        global xlin, ylin
+        xlin = np.arange(-range_width, range_width, 2 * range_width / 99)
+        if len(xlin) < 100:
+            xlin = np.append(xlin, range_width)
+        ylin = np.arange(0, range_depth, 1.0 * range_depth / 99)
+        if len(ylin) < 100:
+            ylin = np.append(ylin, range_depth)
+
+        xiyi = meshgrid(xlin, ylin)
+        rangeAzimuthHeatMapGridInit = 1
+
+    zi = fliplrQQ
+    zi = reshape_rowbased(zi, len(ylin), len(xlin))
+    heatObj = {"zi": zi}
+    return heatObj
+
+
+def processRangeDopplerHeatMap(byteBuffer, idX, subFrame):
+    numDopplerBins = subFrame.numDopplerBins
+    numRangeBins = subFrame.numRangeBins
+    # Get the number of bytes to read
+    numBytes = subFrame.tlvBytes[MMWDEMO_OUTPUT_MSG_RANGE_DOPPLER_HEAT_MAP]
+    # The payload is range-major uint16, i.e. a Fortran-like (doppler, range) matrix
+    payload = byteBuffer[idX : idX + numBytes].view("<u2")
+    idX += numBytes
+    rangeDoppler = payload.reshape(numRangeBins, numDopplerBins).T
+
+    # Some frames have strange values, skip those frames
+    # TO DO: Find why those strange frames happen
+    # if np.max(rangeDoppler) > 10000:
+    #     return 0
+
+    # Swap the two Doppler halves into the subframe's preallocated buffer
+    half = numDopplerBins // 2
+    dopplerM = subFrame.rangeDopplerBuffer
+    dopplerM[: numDopplerBins - half] = rangeDoppler[half:]
+    dopplerM[numDopplerBins - half :] = rangeDoppler[:half]
+
+    dopplerObj = {
+        "rangeDoppler": dopplerM.tolist(),
+        "rangeArray": subFrame.rangeArray.tolist(),
+        "dopplerArray": subFrame.dopplerArray.tolist(),
+    }
+    return dopplerObj
+
+
+def processStatistics(byteBuffer, idX):
+    # One unpack for the whole TLV. The margins are signed, a frame that
+    # overruns its budget shows up as a negative margin instead of a huge one.
+    return dict(zip(STATS_FIELDS, STATS_STRUCT.unpack_from(byteBuffer, idX)))